@@ -1,7 +1,10 @@
-from flask import Blueprint, render_template, redirect, url_for, flash
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from models import db, User, Team
 from flask_login import login_required, current_user
 from rbac import role_required, can_approve_user
+import provisioning
+import refdata
+import rosters
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -35,6 +38,7 @@ def approve_user(user_id):
     
     user.approved = True
     db.session.commit()
+    rosters.invalidate()
     flash(f'User {user.name} has been approved.')
     return redirect(url_for('admin.pending_users'))
 
@@ -54,5 +58,43 @@ def disapprove_user(user_id):
     # Remove user from DB to hide request
     db.session.delete(user)
     db.session.commit()
+    rosters.invalidate()
     flash(f'User {user.name} registration request has been disapproved and removed.')
     return redirect(url_for('admin.pending_users'))
+
+@admin_bp.route('/provision', methods=['GET', 'POST'])
+@login_required
+@role_required('admin')
+def provision_users():
+    if request.method == 'GET':
+        return render_template('provision_users.html', teams=sorted(refdata.teams(), key=lambda team: team.name),
+                               max_rows=current_app.config['PROVISION_MAX_ROWS'])
+    
+    # Either a multipart upload or the document itself as the request body
+    upload = request.files.get('file')
+    if upload:
+        text = upload.read().decode('utf-8-sig')
+        fmt = request.form.get('format') or provisioning.format_for(upload.filename, upload.mimetype)
+    else:
+        text = request.get_data(as_text=True)
+        fmt = request.args.get('format') or provisioning.format_for(mimetype=request.mimetype)
+    approved = request.values.get('approved', '1') != '0'
+    try:
+        rows = provisioning.parse(text, fmt)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    max_rows = current_app.config['PROVISION_MAX_ROWS']
+    if len(rows) > max_rows:
+        return jsonify({"status": "error",
+                        "message": f"At most {max_rows} rows per upload; use 'flask provision-users' for more"}), 400
+    # Hashing thousands of passwords would hold this worker for a long time; the job queue does it
+    users, result = provisioning.prepare(rows, approved=approved)
+    if not users:
+        return jsonify({"status": "success", "queued": 0, **result})
+    spool = provisioning.enqueue(users)
+    try:
+        db.session.commit()
+    except Exception:
+        provisioning.discard(spool)
+        raise
+    return jsonify({"status": "queued", "queued": len(users), **result}), 202
@@ -0,0 +1,159 @@
+"""
+Admission control for expensive endpoints.
+
+A few pages (search, the summary, the admin ticket list) scan a lot of
+rows, so one user reloading them in a loop could tie up every Gunicorn
+worker. Two checks run before such a request does any work:
+
+* a per-user token bucket, refilled at the rate ``RATE_LIMITS`` sets for
+  the user's role, answers 429 when the user's burst is used up;
+* a per-endpoint concurrency limit from ``ADMISSION_ENDPOINTS`` answers
+  503 at once when that many of its requests are already running in any
+  worker, instead of letting the request queue behind them.
+
+Both carry ``Retry-After``. Nothing outside the host is needed: the
+concurrency slots are ``flock``-ed files under ``ADMISSION_DIR``, which
+the kernel releases if a worker dies, and the buckets live in a small
+SQLite database in the same folder, shared by all workers.
+"""
+import fcntl
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app, g, jsonify, request
+from flask_login import current_user
+
+_local = threading.local()
+_slots_lock = threading.Lock()
+# (path, fd) of the slot files this process has open, and which are in use
+_slot_fds = {}
+_held = set()
+
+
+class _Rejected(Exception):
+    def __init__(self, status, message, retry_after):
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
+
+
+def _directory():
+    return current_app.config['ADMISSION_DIR']
+
+def _buckets():
+    """This thread's connection to the bucket database."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        os.makedirs(_directory(), exist_ok=True)
+        # Autocommit mode, so BEGIN IMMEDIATE below is ours to issue
+        conn = sqlite3.connect(os.path.join(_directory(), 'buckets.db'), timeout=1, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # Losing the last few refills in a crash is harmless
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute('CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+        _local.conn, _local.pid = conn, os.getpid()
+    return conn
+
+def take(key, per_minute, burst):
+    """Take one token from bucket ``key``; returns 0 if granted, else seconds until one is available."""
+    rate = per_minute / 60.0
+    conn = _buckets()
+    now = time.time()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        row = conn.execute('SELECT tokens, updated FROM bucket WHERE key = ?', (key,)).fetchone()
+        tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        conn.execute('INSERT INTO bucket (key, tokens, updated) VALUES (?, ?, ?) '
+                     'ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+                     (key, tokens, now))
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    return wait
+
+def _slot_fd(path):
+    fd = _slot_fds.get(path)
+    if fd is None:
+        fd = _slot_fds[path] = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    return fd
+
+def acquire(endpoint, limit):
+    """Claim one of ``limit`` slots for ``endpoint`` across all workers; returns the slot or None."""
+    directory = os.path.join(_directory(), 'slots')
+    os.makedirs(directory, exist_ok=True)
+    with _slots_lock:
+        for number in range(limit):
+            path = os.path.join(directory, f'{endpoint}.{number}')
+            # flock is per open file, so threads of one process must not share a slot
+            if path in _held:
+                continue
+            fd = _slot_fd(path)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue
+            _held.add(path)
+            return path
+    return None
+
+def release(path):
+    with _slots_lock:
+        fcntl.flock(_slot_fds[path], fcntl.LOCK_UN)
+        _held.discard(path)
+
+def _check_rate(endpoint):
+    if not current_user.is_authenticated:
+        return  # login_required sends them to the login page
+    limit = current_app.config['RATE_LIMITS'].get(current_user.role)
+    if limit is None:
+        return
+    try:
+        wait = take(f'{current_user.id}:{endpoint}', *limit)
+    except sqlite3.OperationalError as e:
+        # A busy bucket database must not take the page down with it
+        current_app.logger.warning('Rate limit check skipped: %s', e)
+        return
+    if wait:
+        raise _Rejected(429, 'Too many requests; slow down.', wait)
+
+def _admit():
+    limit = current_app.config['ADMISSION_ENDPOINTS'].get(request.endpoint)
+    if limit is None:
+        return None
+    try:
+        _check_rate(request.endpoint)
+        slot = acquire(request.endpoint, limit)
+        if slot is None:
+            raise _Rejected(503, 'The server is busy with this page; try again shortly.',
+                            current_app.config['ADMISSION_RETRY_AFTER'])
+    except _Rejected as rejected:
+        if request.path.startswith('/api/') or request.accept_mimetypes.best == 'application/json':
+            response = jsonify({"status": "error", "message": rejected.message})
+        else:
+            response = current_app.response_class(rejected.message, mimetype='text/plain')
+        response.status_code = rejected.status
+        response.headers['Retry-After'] = str(max(1, math.ceil(rejected.retry_after)))
+        return response
+    g.admission_slot = slot
+    return None
+
+def _release(exc):
+    slot = g.pop('admission_slot', None)
+    if slot is not None:
+        release(slot)
+
+
+def init_app(app):
+    if not app.config.get('ADMISSION_ENDPOINTS'):
+        return
+    app.before_request(_admit)
+    app.teardown_request(_release)
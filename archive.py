@@ -0,0 +1,162 @@
+"""
+Ticket archive.
+
+Done tickets whose status last changed more than ``ARCHIVE_AFTER_DAYS``
+ago are moved from ``ticket`` into ``ticket_archive`` (the same columns
+plus ``archived_at``), ``ARCHIVE_BATCH_SIZE`` per transaction, so boards,
+the dashboard and the summary only ever scan active work. Search and the
+admin ticket list include the archive when asked to (``archived=1``), and
+restoring a ticket moves it back with the same id.
+
+Run it from cron with ``flask archive-tickets``, or queue a run from the
+archive page. Tickets that still have children in ``ticket`` stay put
+until their children are archived; tickets without a status change date
+fall back to their end date, and are kept if they have neither.
+"""
+from datetime import datetime, timedelta
+
+import click
+import sqlalchemy as sa
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
+from flask.cli import with_appcontext
+from flask_login import current_user, login_required
+from sqlalchemy.orm import aliased, joinedload
+
+import autocomplete
+import jobs
+import public_board
+import workload
+from models import db, Ticket, TicketArchive
+from rbac import can_edit_ticket, role_required, visible_tickets_clause
+
+archive_bp = Blueprint('archive', __name__, url_prefix='/archive')
+
+DONE = 'Done'
+ARCHIVED_PER_PAGE = 50
+TICKET_COLUMNS = [column.name for column in Ticket.__table__.columns]
+
+
+def _candidates(cutoff, limit):
+    child = aliased(Ticket)
+    has_children = sa.select(child.id).where(child.parent_id == Ticket.id).exists()
+    last_change = sa.func.coalesce(Ticket.status_changed_at, Ticket.end_date)
+    # Keep the newest ticket: SQLite would hand its id out again to the next new ticket
+    newest = sa.select(sa.func.max(Ticket.id)).scalar_subquery()
+    rows = (db.session.query(Ticket.id)
+            .filter(Ticket.status == DONE, last_change < cutoff, ~has_children, Ticket.id < newest)
+            .order_by(Ticket.id)
+            .limit(limit))
+    return [ticket_id for (ticket_id,) in rows]
+
+def _states(model, ids):
+    rows = (db.session.query(model.assignee, model.status, model.priority, model.start_date, model.end_date)
+            .filter(model.id.in_(ids)))
+    return [workload.snapshot(row) for row in rows]
+
+def archive_done(days=None, batch_size=None):
+    """Move Done tickets untouched for ``days`` into the archive; returns how many moved."""
+    days = current_app.config['ARCHIVE_AFTER_DAYS'] if days is None else days
+    batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+    cutoff = datetime.now() - timedelta(days=days)
+    hot, archive = Ticket.__table__, TicketArchive.__table__
+    moved = 0
+    while True:
+        ids = _candidates(cutoff, batch_size)
+        if not ids:
+            return moved
+        states = _states(Ticket, ids)
+        columns = [hot.c[name] for name in TICKET_COLUMNS]
+        db.session.execute(archive.insert().from_select(
+            TICKET_COLUMNS + ['archived_at'],
+            sa.select(*columns, sa.literal(datetime.now(), sa.DateTime)).where(hot.c.id.in_(ids))))
+        db.session.execute(hot.delete().where(hot.c.id.in_(ids)))
+        workload.tickets_changed([(state, None) for state in states])
+        public_board.changed()
+        db.session.commit()
+        autocomplete.tickets_changed(ids)
+        moved += len(ids)
+
+def restore(ticket_id):
+    """Move an archived ticket back into ``ticket``, together with any archived
+    ancestors so its parent link still resolves. Returns the restored ids."""
+    ids = []
+    archived = db.session.get(TicketArchive, ticket_id)
+    while archived is not None and archived.id not in ids:
+        ids.append(archived.id)
+        archived = db.session.get(TicketArchive, archived.parent_id) if archived.parent_id else None
+    if not ids:
+        return ids
+    hot, archive = Ticket.__table__, TicketArchive.__table__
+    states = _states(TicketArchive, ids)
+    # A fresh status date, or the next run would archive it straight away
+    columns = [sa.func.current_timestamp() if name == 'status_changed_at' else archive.c[name]
+               for name in TICKET_COLUMNS]
+    db.session.execute(hot.insert().from_select(TICKET_COLUMNS, sa.select(*columns).where(archive.c.id.in_(ids))))
+    db.session.execute(archive.delete().where(archive.c.id.in_(ids)))
+    workload.tickets_changed([(None, state) for state in states])
+    public_board.changed()
+    db.session.commit()
+    autocomplete.tickets_changed(ids)
+    return ids
+
+def search_archive(query, user):
+    """Archived tickets visible to ``user`` matching ``query`` like the live search does."""
+    pattern = f'%{query}%'
+    return (TicketArchive.query
+            .filter(visible_tickets_clause(user, TicketArchive))
+            .filter(sa.or_(TicketArchive.title.ilike(pattern), TicketArchive.description.ilike(pattern),
+                           TicketArchive.assignee.ilike(pattern), TicketArchive.type.ilike(pattern)))
+            .order_by(TicketArchive.archived_at.desc())
+            .all())
+
+@jobs.task('archive_tickets')
+def _archive_job(payload):
+    archive_done(payload.get('days'))
+
+
+@click.command('archive-tickets')
+@click.option('--days', type=int, help='Archive Done tickets unchanged for this many days (default ARCHIVE_AFTER_DAYS).')
+@click.option('--batch-size', type=int, help='Tickets moved per transaction (default ARCHIVE_BATCH_SIZE).')
+@with_appcontext
+def archive_tickets_command(days, batch_size):
+    """Move old Done tickets into the archive table."""
+    moved = archive_done(days, batch_size)
+    click.echo(f'Archived {moved} tickets; {Ticket.query.count()} remain active, '
+               f'{TicketArchive.query.count()} archived.')
+
+
+@archive_bp.route('/')
+@login_required
+def archive_page():
+    query = request.args.get('q', '').strip()
+    archived = TicketArchive.query.filter(visible_tickets_clause(current_user, TicketArchive))
+    if query:
+        pattern = f'%{query}%'
+        archived = archived.filter(sa.or_(TicketArchive.title.ilike(pattern), TicketArchive.assignee.ilike(pattern)))
+    page = (archived.options(joinedload(TicketArchive.project))
+            .order_by(TicketArchive.archived_at.desc(), TicketArchive.id.desc())
+            .paginate(page=request.args.get('page', 1, type=int), per_page=ARCHIVED_PER_PAGE, error_out=False))
+    return render_template('archive.html', tickets=page, query=query,
+                           archive_after_days=current_app.config['ARCHIVE_AFTER_DAYS'])
+
+@archive_bp.route('/<int:ticket_id>/restore', methods=['POST'])
+@login_required
+def restore_ticket(ticket_id):
+    archived = TicketArchive.query.get_or_404(ticket_id)
+    if not can_edit_ticket(archived, current_user):
+        flash('You do not have permission to restore this ticket.')
+        return redirect(request.referrer or url_for('archive.archive_page'))
+    title = archived.title
+    restored = restore(ticket_id)
+    extra = f' along with {len(restored) - 1} parent tickets' if len(restored) > 1 else ''
+    flash(f'Ticket "{title}" restored{extra}.')
+    return redirect(request.referrer or url_for('archive.archive_page'))
+
+@archive_bp.route('/run', methods=['POST'])
+@login_required
+@role_required('admin')
+def run_archive():
+    jobs.enqueue('archive_tickets')
+    db.session.commit()
+    flash('Archiving queued; it runs in the background worker.')
+    return redirect(url_for('archive.archive_page'))
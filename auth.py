@@ -1,10 +1,12 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required
 from werkzeug.security import generate_password_hash, check_password_hash
+import refdata
 from models import db, User, Team
 
 auth_bp = Blueprint('auth', __name__)
 
+@auth_bp.route('/', methods=['GET', 'POST'])
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
@@ -14,7 +16,7 @@ def login():
                 flash('Your account is pending approval by admin.')
                 return redirect(url_for('auth.login'))
             login_user(user)
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('dashboard.dashboard'))
         flash('Invalid credentials')
     return render_template('login.html')
 
@@ -64,7 +66,7 @@ def register():
             return redirect(url_for('auth.register'))
     
     # Get all teams for the dropdown
-    teams = Team.query.all()
+    teams = refdata.teams()
     return render_template('register.html', teams=teams)
 
 @auth_bp.route('/logout')
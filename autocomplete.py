@@ -0,0 +1,323 @@
+"""
+Typeahead suggestions for tickets, users, projects and teams.
+
+``GET /api/autocomplete?kind=ticket|user|project|team&q=...`` answers
+from an in-memory trigram index per kind and process, so pickers can ask
+for the few matches a user is typing towards instead of shipping every
+option with the page. Every word of the query must start a word of the
+entry (``"log rep"`` matches "Login report page"). Results are filtered
+with the same rules as rbac.py.
+
+The ticket index is built at startup by ``build()`` (from wsgi.py, so
+under ``preload_app`` once in the Gunicorn master, and workers fork with
+it) or else on first use, and then picks up newer tickets with one
+primary-key range query per lookup. Titles, types, projects and
+the public flag never change after creation. Code that reassigns,
+archives or restores tickets calls ``tickets_changed(ids)`` after
+committing, which appends the ids to a journal file under the instance
+folder; on its next lookup every Gunicorn worker reads the lines it has
+not seen yet and reloads just those tickets. ``invalidate()`` starts a
+new journal, which makes every worker rebuild. The user, project and
+team indexes are rebuilt from refdata.py whenever its lists change.
+"""
+import contextlib
+import os
+import re
+import threading
+from array import array
+
+from flask import Blueprint, current_app, jsonify, request
+from flask_login import current_user, login_required
+
+import refdata
+from models import db, Ticket
+
+autocomplete_bp = Blueprint('autocomplete', __name__)
+
+KINDS = ('ticket', 'user', 'project', 'team')
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+JOURNAL_FILE = 'autocomplete-tickets.log'
+# Past this the journal is replaced by an empty one, which makes every worker rebuild
+JOURNAL_MAX_BYTES = 1 << 20
+
+_WORD = re.compile(r'\w+')
+
+
+def _words(text):
+    return _WORD.findall(text.lower())
+
+def _matches(words, text):
+    """Whether every query word starts some word of ``text``."""
+    text = ' ' + ' '.join(_words(text))
+    return all(' ' + word in text for word in words)
+
+def _grams(word):
+    """Trigrams of a word padded on the left, so a prefix's grams are a subset of the word's."""
+    padded = '  ' + word
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Index:
+    """Word-prefix search over entries kept in insertion order."""
+
+    def __init__(self):
+        self.keys = []
+        self.texts = []
+        self.postings = {}
+        self.positions = {}
+
+    def add(self, key, text):
+        position = len(self.keys)
+        words = _words(text)
+        self.keys.append(key)
+        self.positions[key] = position
+        # Leading space so ' ' + word finds word prefixes only
+        self.texts.append(' ' + ' '.join(words))
+        # Every word's grams in one pass; the grams spanning two words are never looked up
+        padded = '  ' + '  '.join(words)
+        for gram in {padded[i:i + 3] for i in range(len(padded) - 2)}:
+            posting = self.postings.get(gram)
+            if posting is None:
+                posting = self.postings[gram] = array('i')
+            posting.append(position)
+
+    def remove(self, key):
+        # The postings keep the position; an empty text never matches
+        position = self.positions.pop(key)
+        self.keys[position] = None
+        self.texts[position] = ''
+
+    def search(self, query, accept=None, limit=DEFAULT_LIMIT, newest_first=False):
+        """Keys of up to ``limit`` entries matching ``query`` that ``accept(key)`` allows."""
+        words = _words(query)
+        if not words:
+            return []
+        postings = [self.postings.get(gram) for word in words for gram in _grams(word)]
+        if not all(postings):
+            return []
+        # Walk the rarest gram's entries and check the whole query on each
+        candidates = min(postings, key=len)
+        needles = [' ' + word for word in words]
+        found = []
+        for position in (reversed(candidates) if newest_first else candidates):
+            text = self.texts[position]
+            if all(needle in text for needle in needles):
+                key = self.keys[position]
+                if accept is None or accept(key):
+                    found.append(key)
+                    if len(found) == limit:
+                        break
+        return found
+
+
+_lock = threading.Lock()
+_tickets = {'journal': None, 'offset': 0, 'index': None, 'last_id': 0, 'by_id': {}}
+_lists = {}
+
+
+def _journal_path():
+    return os.path.join(current_app.instance_path, JOURNAL_FILE)
+
+def _ticket_rows():
+    return db.session.query(Ticket.id, Ticket.title, Ticket.type, Ticket.public, Ticket.project_id, Ticket.assignee)
+
+def _add_tickets(after_id):
+    for row in _ticket_rows().filter(Ticket.id > after_id).order_by(Ticket.id):
+        _tickets['index'].add(row.id, row.title)
+        _tickets['by_id'][row.id] = row
+        _tickets['last_id'] = row.id
+
+def _refresh_tickets(ids):
+    index, by_id = _tickets['index'], _tickets['by_id']
+    rows = {row.id: row for row in _ticket_rows().filter(Ticket.id.in_(ids))}
+    for ticket_id in ids:
+        row = rows.get(ticket_id)
+        if row is None:
+            # Archived
+            if by_id.pop(ticket_id, None) is not None:
+                index.remove(ticket_id)
+        else:
+            if ticket_id not in by_id:
+                # Restored from the archive
+                index.add(ticket_id, row.title)
+            by_id[ticket_id] = row
+
+def _ticket_index():
+    with _lock:
+        try:
+            journal = open(_journal_path(), 'rb')
+        except FileNotFoundError:
+            journal = None
+        with journal or contextlib.nullcontext():
+            stat = os.fstat(journal.fileno()) if journal else None
+            identity = (stat.st_dev, stat.st_ino) if stat else None
+            size = stat.st_size if stat else 0
+            if _tickets['index'] is None or _tickets['journal'] != identity or size < _tickets['offset']:
+                # Lines written from here on are replayed by the next lookup
+                _tickets.update(journal=identity, offset=size, index=Index(), last_id=0, by_id={})
+                _add_tickets(0)
+            else:
+                # New tickets only ever get higher ids; changes to older ones come through the journal
+                _add_tickets(_tickets['last_id'])
+                if size > _tickets['offset']:
+                    journal.seek(_tickets['offset'])
+                    written = journal.read(size - _tickets['offset'])
+                    # A line still being appended is picked up next time
+                    written = written[:written.rfind(b'\n') + 1]
+                    _tickets['offset'] += len(written)
+                    ids = {int(line) for line in written.split()}
+                    if ids:
+                        _refresh_tickets(ids)
+        return _tickets['index'], _tickets['by_id']
+
+def build():
+    """Build the ticket index now instead of on the first lookup; returns how many tickets it holds."""
+    index, by_id = _ticket_index()
+    return len(by_id)
+
+def _list_index(kind, source, text):
+    """Index over one of refdata's lists, rebuilt when refdata hands out a new one."""
+    with _lock:
+        cached = _lists.get(kind)
+        if cached is None or cached[0] is not source:
+            index = Index()
+            for item in source:
+                index.add(item.id, text(item))
+            cached = _lists[kind] = (source, index, {item.id: item for item in source})
+        return cached[1], cached[2]
+
+def _new_journal(path):
+    # A new file, not a truncated one: readers notice the inode change and rebuild
+    scratch = f'{path}.{os.getpid()}'
+    open(scratch, 'wb').close()
+    os.replace(scratch, path)
+
+def tickets_changed(ticket_ids):
+    """After committing, note that tickets were reassigned, archived or restored.
+
+    Every worker re-reads just these tickets on its next lookup.
+    """
+    if not ticket_ids:
+        return
+    path = _journal_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        if os.path.getsize(path) > JOURNAL_MAX_BYTES:
+            _new_journal(path)
+            return
+    except FileNotFoundError:
+        pass
+    # One O_APPEND write, so lines from concurrent workers never interleave
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, ''.join(f'{ticket_id}\n' for ticket_id in ticket_ids).encode())
+    finally:
+        os.close(fd)
+
+def invalidate():
+    """Make every worker rebuild its ticket index, e.g. after a database restore."""
+    path = _journal_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _new_journal(path)
+    with _lock:
+        _tickets.update(journal=None, index=None)
+
+def _ticket_filter(user):
+    """In-memory equivalent of visible_tickets_clause."""
+    if user.role == 'admin':
+        return None
+    if user.role == 'visitor':
+        return lambda ticket: ticket.public
+    projects = refdata.projects()
+    if user.role == 'manager':
+        own = {project.id for project in projects
+               if project.team_lead_id == user.id or (user.team_id is not None and project.team_id == user.team_id)}
+        return lambda ticket: ticket.public or ticket.project_id in own
+    if user.role == 'developer':
+        team = {project.id for project in projects if user.team_id is not None and project.team_id == user.team_id}
+        return lambda ticket: ticket.assignee == user.name or (ticket.public and ticket.project_id in team)
+    return lambda ticket: False
+
+def suggest_tickets(query, user, limit=DEFAULT_LIMIT, types=None):
+    """Newest visible tickets whose title matches ``query``."""
+    index, by_id = _ticket_index()
+    visible = _ticket_filter(user)
+
+    def accept(ticket_id):
+        ticket = by_id[ticket_id]
+        return (types is None or ticket.type in types) and (visible is None or visible(ticket))
+
+    found = [by_id[ticket_id] for ticket_id in index.search(query, accept, limit, newest_first=True)]
+    # Restored tickets sit at the end of the index until the next rebuild
+    found.sort(key=lambda ticket: ticket.id, reverse=True)
+    return [{'id': ticket.id, 'label': ticket.title, 'type': ticket.type} for ticket in found]
+
+def suggest_users(query, user, limit=DEFAULT_LIMIT, team_id=None):
+    """Approved users ``user`` may assign work to, matched on name or email."""
+    if user.role == 'admin':
+        scope = None
+    elif user.role == 'manager':
+        scope = user.team_id
+    elif user.role == 'developer':
+        # Developers only ever assign work to themselves
+        if not _matches(_words(query), user.name):
+            return []
+        return [{'id': user.id, 'label': user.name, 'role': user.role, 'team_id': user.team_id}]
+    else:
+        return []
+    index, by_id = _list_index('user', refdata.users(), lambda item: f'{item.name} {item.email}')
+
+    def accept(user_id):
+        candidate = by_id[user_id]
+        return (scope is None or candidate.team_id == scope) and (team_id is None or candidate.team_id == team_id)
+
+    return [{'id': user_id, 'label': by_id[user_id].name, 'role': by_id[user_id].role,
+             'team_id': by_id[user_id].team_id}
+            for user_id in index.search(query, accept, limit)]
+
+def suggest_projects(query, user, limit=DEFAULT_LIMIT):
+    index, by_id = _list_index('project', refdata.projects(), lambda item: item.name)
+
+    def accept(project_id):
+        project = by_id[project_id]
+        if user.role in ('admin', 'visitor'):
+            return True
+        in_team = user.team_id is not None and project.team_id == user.team_id
+        return in_team or (user.role == 'manager' and project.team_lead_id == user.id)
+
+    return [{'id': project_id, 'label': by_id[project_id].name, 'team_id': by_id[project_id].team_id}
+            for project_id in index.search(query, accept, limit)]
+
+def suggest_teams(query, user, limit=DEFAULT_LIMIT):
+    # Every team is listed on the teams page for everyone
+    index, by_id = _list_index('team', refdata.teams(), lambda item: item.name)
+    return [{'id': team_id, 'label': by_id[team_id].name} for team_id in index.search(query, limit=limit)]
+
+
+@autocomplete_bp.route('/api/autocomplete')
+@login_required
+def api_autocomplete():
+    """Suggestions for a picker.
+
+    Query: kind (ticket, user, project or team), q, limit (default 10, at
+    most 50); for tickets ``types`` (comma-separated, e.g. epic,feature),
+    for users ``team_id``. Returns {"kind": ..., "results": [{"id", "label", ...}]}.
+    """
+    kind = request.args.get('kind')
+    if kind not in KINDS:
+        return jsonify({"status": "error", "message": f"kind must be one of {', '.join(KINDS)}"}), 400
+    query = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', DEFAULT_LIMIT, type=int), 1), MAX_LIMIT)
+    if not query:
+        return jsonify({"kind": kind, "results": []})
+    if kind == 'ticket':
+        types = request.args.get('types')
+        results = suggest_tickets(query, current_user, limit, set(types.split(',')) if types else None)
+    elif kind == 'user':
+        results = suggest_users(query, current_user, limit, request.args.get('team_id', type=int))
+    elif kind == 'project':
+        results = suggest_projects(query, current_user, limit)
+    else:
+        results = suggest_teams(query, current_user, limit)
+    return jsonify({"kind": kind, "results": results})
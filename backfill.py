@@ -0,0 +1,145 @@
+"""
+Chunked, resumable data backfills for migrations.
+
+A migration that fills in a new column over a big table should not do it
+in one statement: that holds the write lock for the whole table and
+blocks every request until it finishes. ``backfill()`` walks the table in
+primary-key order, ``BACKFILL_CHUNK_SIZE`` rows per transaction, pausing
+``BACKFILL_PAUSE`` seconds between chunks so the app's writers get their
+turn. After each chunk it records the last key in ``backfill_checkpoint``
+in the same transaction, so an interrupted ``flask db upgrade`` picks up
+where it stopped when it is run again.
+
+Put the backfill in its own revision, after the one that changes the
+schema, so a rerun only repeats the backfill::
+
+    import backfill
+
+    def upgrade():
+        backfill.backfill('ticket_status_changed_at', 'ticket',
+                          "UPDATE ticket SET status_changed_at = end_date "
+                          "WHERE id BETWEEN :first AND :last AND status_changed_at IS NULL")
+
+    def downgrade():
+        backfill.reset('ticket_status_changed_at')
+
+The walk stops at the highest key present when the backfill first
+started; later rows are not visited, so the app must already write the
+new column itself by the time the backfill runs.
+``flask backfill-status`` shows the progress of running and finished
+backfills.
+"""
+import logging
+import time
+from datetime import datetime
+
+import click
+import sqlalchemy as sa
+from alembic import op
+from flask import current_app
+from flask.cli import with_appcontext
+
+from models import BackfillCheckpoint
+
+logger = logging.getLogger('alembic.backfill')
+
+checkpoints = BackfillCheckpoint.__table__
+
+
+def _chunk(conn, table, key, after, end, size):
+    """First and last key of the next ``size`` rows after ``after`` up to
+    ``end``, or (None, None)."""
+    if end is None:
+        # The table was empty when the backfill started
+        return None, None
+    column = sa.column(key)
+    keys = sa.select(column).select_from(sa.table(table, column)).where(column <= end)
+    if after is not None:
+        keys = keys.where(column > after)
+    keys = keys.order_by(column).limit(size).subquery()
+    return conn.execute(sa.select(sa.func.min(keys.c[key]), sa.func.max(keys.c[key]))).one()
+
+def run(engine, name, table, work, key='id', chunk_size=None, pause=None):
+    """Backfill ``table`` on ``engine``; see ``backfill()``. Returns the rows reported by ``work``."""
+    config = current_app.config
+    chunk_size = chunk_size or config['BACKFILL_CHUNK_SIZE']
+    pause = config['BACKFILL_PAUSE'] if pause is None else pause
+    if isinstance(work, str):
+        statement = sa.text(work)
+
+        def work(conn, first, last):
+            return conn.execute(statement, {'first': first, 'last': last}).rowcount
+
+    with engine.connect() as conn:
+        with conn.begin():
+            state = conn.execute(sa.select(checkpoints).where(checkpoints.c.name == name)).first()
+            if state is None:
+                now = datetime.now()
+                column = sa.column(key)
+                end = conn.execute(sa.select(sa.func.max(column)).select_from(sa.table(table, column))).scalar()
+                conn.execute(checkpoints.insert().values(name=name, table_name=table, end_key=end, rows=0,
+                                                         chunks=0, started_at=now, updated_at=now))
+                state = conn.execute(sa.select(checkpoints).where(checkpoints.c.name == name)).one()
+        if state.finished_at is not None:
+            logger.info('Backfill %s already finished at %s', name, state.finished_at)
+            return state.rows
+        if state.last_key is not None:
+            logger.info('Resuming backfill %s after %s %s (%d rows so far)', name, key, state.last_key, state.rows)
+        last_key, rows, chunks = state.last_key, state.rows, state.chunks
+        while True:
+            with conn.begin():
+                first, last = _chunk(conn, table, key, last_key, state.end_key, chunk_size)
+                now = datetime.now()
+                progress = checkpoints.update().where(checkpoints.c.name == name)
+                if first is None:
+                    conn.execute(progress.values(updated_at=now, finished_at=now))
+                    break
+                rows += work(conn, first, last) or 0
+                chunks += 1
+                conn.execute(progress.values(last_key=last, rows=rows, chunks=chunks, updated_at=now))
+            last_key = last
+            if chunks % 10 == 0:
+                logger.info('Backfill %s: %d chunks, up to %s %s', name, chunks, key, last_key)
+            if pause:
+                # No lock is held between chunks, so the app's writers get their turn
+                time.sleep(pause)
+    logger.info('Backfill %s finished: %d rows in %d chunks', name, rows, chunks)
+    return rows
+
+def backfill(name, table, work, key='id', chunk_size=None, pause=None):
+    """From a migration's ``upgrade()``: run ``work`` over ``table`` in
+    ``key`` order, one chunk per transaction, resuming from the checkpoint
+    called ``name``.
+
+    ``work`` is an SQL string using the ``:first`` and ``:last`` parameters
+    (the chunk's inclusive key range), or ``work(conn, first, last)``
+    returning the number of rows it changed. ``key`` must be an integer
+    column, normally the primary key.
+    """
+    context = op.get_context()
+    if context.as_sql:
+        raise RuntimeError(f'Backfill {name} needs a live database; it cannot be rendered as SQL')
+    engine = op.get_bind().engine
+    # Commits the migrations so far and leaves the migration connection
+    # outside any transaction, so the chunks can commit on their own
+    with context.autocommit_block():
+        return run(engine, name, table, work, key, chunk_size, pause)
+
+def reset(name):
+    """From a migration's ``downgrade()``: forget the checkpoint so a later upgrade runs again."""
+    op.execute(checkpoints.delete().where(checkpoints.c.name == name))
+
+
+@click.command('backfill-status')
+@with_appcontext
+def backfill_status_command():
+    """Show the progress of migration backfills."""
+    states = BackfillCheckpoint.query.order_by(BackfillCheckpoint.started_at).all()
+    if not states:
+        click.echo('No backfills have run.')
+    for state in states:
+        if state.finished_at:
+            status = f'finished {state.finished_at:%Y-%m-%d %H:%M}'
+        else:
+            status = f'up to key {state.last_key} of {state.end_key}, last progress {state.updated_at:%Y-%m-%d %H:%M}'
+        click.echo(f'{state.name} ({state.table_name}): {state.rows} rows in {state.chunks} chunks, {status}')
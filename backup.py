@@ -0,0 +1,226 @@
+"""
+Online backup and restore of the SQLite database.
+
+``flask db-backup`` copies the live database with SQLite's online backup
+API, ``BACKUP_PAGES`` pages per step with a short pause in between, so a
+writer waits for at most one step instead of the whole copy. A write from
+another connection makes SQLite restart the copy; after
+``BACKUP_MAX_RESTARTS`` restarts the rest is copied in one step rather
+than chasing a busy writer forever. The copy must pass ``PRAGMA
+integrity_check`` before it is kept, optionally gzip-compressed.
+
+``flask db-restore`` checks a backup's integrity and its Alembic revision
+against the head of ``migrations/`` before copying it over the live
+database, again through the backup API so open connections see either the
+old or the new database and never a half-written file.
+"""
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+import click
+from alembic.script import ScriptDirectory
+from flask import current_app
+from flask.cli import with_appcontext
+
+import autocomplete
+import public_board
+import refdata
+import rosters
+from models import db
+
+
+class BackupError(Exception):
+    pass
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def database_path():
+    url = db.engine.url
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        raise BackupError('Online backups are only supported for file-based SQLite databases')
+    return url.database
+
+def integrity_errors(path):
+    """Problems reported by ``PRAGMA integrity_check``; empty when the file is sound."""
+    conn = sqlite3.connect(path)
+    try:
+        rows = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+    except sqlite3.DatabaseError as e:
+        return [str(e)]
+    finally:
+        conn.close()
+    return [] if rows == ['ok'] else rows
+
+def _copy(source, target, pages, pause, max_restarts):
+    """Copy ``source`` into ``target`` in steps; returns (steps, restarts)."""
+    stats = {'steps': 0, 'restarts': 0, 'remaining': None}
+
+    def progress(status, remaining, total):
+        stats['steps'] += 1
+        if stats['remaining'] is not None and remaining >= stats['remaining']:
+            stats['restarts'] += 1
+            if stats['restarts'] > max_restarts:
+                raise _TooManyRestarts()
+        stats['remaining'] = remaining
+        if remaining and pause:
+            # Between steps no lock is held, so waiting writers get their turn
+            time.sleep(pause)
+
+    try:
+        source.backup(target, pages=pages, progress=progress)
+    except _TooManyRestarts:
+        source.backup(target)
+        stats['steps'] += 1
+    return stats['steps'], stats['restarts']
+
+def backup(dest=None, compress=False, pages=None, pause=None):
+    """Write a consistent copy of the live database to ``dest`` (default a
+    timestamped file in ``BACKUP_DIR``) and return a summary dict."""
+    config = current_app.config
+    source_path = database_path()
+    if dest is None:
+        name = f"app-{datetime.now():%Y%m%d-%H%M%S}.db" + ('.gz' if compress else '')
+        dest = os.path.join(config['BACKUP_DIR'], name)
+    os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+    pages = pages or config['BACKUP_PAGES']
+    pause = config['BACKUP_STEP_SLEEP'] if pause is None else pause
+
+    started = time.perf_counter()
+    # Written next to the destination and renamed into place once verified
+    fd, work_path = tempfile.mkstemp(prefix='.backup-', dir=os.path.dirname(os.path.abspath(dest)))
+    os.close(fd)
+    try:
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(work_path)
+        try:
+            steps, restarts = _copy(source, target, pages, pause, config['BACKUP_MAX_RESTARTS'])
+        finally:
+            target.close()
+            source.close()
+        errors = integrity_errors(work_path)
+        if errors:
+            raise BackupError(f'Backup failed the integrity check: {errors[0]}')
+        if compress:
+            with open(work_path, 'rb') as raw, gzip.open(dest, 'wb', compresslevel=6) as packed:
+                shutil.copyfileobj(raw, packed, 1024 * 1024)
+            os.remove(work_path)
+        else:
+            os.replace(work_path, dest)
+    finally:
+        if os.path.exists(work_path):
+            os.remove(work_path)
+    return {'path': dest, 'bytes': os.path.getsize(dest), 'steps': steps, 'restarts': restarts,
+            'seconds': time.perf_counter() - started}
+
+def _script():
+    migrate = current_app.extensions['migrate']
+    return ScriptDirectory.from_config(migrate.migrate.get_config(migrate.directory))
+
+def check_revision(path):
+    """Compare a database file's Alembic revision with the code's head.
+    Returns (revisions, status) where status is 'current', 'older' or 'unknown'."""
+    conn = sqlite3.connect(path)
+    try:
+        revisions = {row[0] for row in conn.execute('SELECT version_num FROM alembic_version')}
+    except sqlite3.DatabaseError:
+        revisions = set()
+    finally:
+        conn.close()
+    script = _script()
+    if revisions == set(script.get_heads()):
+        return revisions, 'current'
+    known = {revision.revision for revision in script.walk_revisions()}
+    if revisions and revisions <= known:
+        return revisions, 'older'
+    return revisions, 'unknown'
+
+def restore(path, allow_older=False):
+    """Replace the live database with the backup at ``path`` after checking it."""
+    live_path = database_path()
+    work_path = None
+    if path.endswith('.gz'):
+        fd, work_path = tempfile.mkstemp(prefix='.restore-', dir=os.path.dirname(os.path.abspath(live_path)))
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.open(path, 'rb') as packed:
+                shutil.copyfileobj(packed, raw, 1024 * 1024)
+        except (OSError, EOFError) as e:
+            os.remove(work_path)
+            raise BackupError(f'Cannot decompress {path}: {e}')
+        source_path = work_path
+    else:
+        source_path = path
+    try:
+        errors = integrity_errors(source_path)
+        if errors:
+            raise BackupError(f'Backup failed the integrity check: {errors[0]}')
+        revisions, status = check_revision(source_path)
+        shown = ', '.join(sorted(revisions)) or 'none'
+        if status == 'unknown':
+            raise BackupError(f'Backup is at revision {shown}, which this code does not know; '
+                              'it was probably made by a newer version')
+        if status == 'older' and not allow_older:
+            raise BackupError(f'Backup is at revision {shown}, behind the code; pass --allow-older '
+                              "and run 'flask db upgrade' after restoring")
+        # Release the app's own pooled connections before overwriting
+        db.session.remove()
+        db.engine.dispose()
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(live_path, timeout=30)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+    finally:
+        if work_path and os.path.exists(work_path):
+            os.remove(work_path)
+    # Cached rosters, dropdowns, typeahead indexes and the public board belong to the old database
+    rosters.invalidate()
+    refdata.invalidate()
+    autocomplete.invalidate()
+    public_board.discard()
+    return revisions, status
+
+
+@click.command('db-backup')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='Default: a timestamped file in BACKUP_DIR.')
+@click.option('--compress', is_flag=True, help='Gzip the backup.')
+@click.option('--pages', type=int, help='Pages copied per step (default BACKUP_PAGES).')
+@click.option('--sleep', 'pause', type=float, help='Seconds to pause between steps (default BACKUP_STEP_SLEEP).')
+@with_appcontext
+def db_backup_command(output, compress, pages, pause):
+    """Back up the live SQLite database without stopping the app."""
+    if output and compress and not output.endswith('.gz'):
+        output += '.gz'
+    try:
+        result = backup(output, compress=compress, pages=pages, pause=pause)
+    except BackupError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Backed up to {result['path']} ({result['bytes'] / 1024:.0f} KiB) in {result['seconds']:.2f}s, "
+               f"{result['steps']} steps, {result['restarts']} restarts; integrity check passed.")
+
+
+@click.command('db-restore')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--allow-older', is_flag=True, help='Accept a backup from an older schema revision.')
+@click.option('--yes', is_flag=True, help='Do not ask for confirmation.')
+@with_appcontext
+def db_restore_command(path, allow_older, yes):
+    """Replace the live SQLite database with a backup."""
+    try:
+        if not yes:
+            click.confirm(f'Replace {database_path()} with {path}?', abort=True)
+        revisions, status = restore(path, allow_older=allow_older)
+    except BackupError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Restored {path} (revision {', '.join(sorted(revisions)) or 'none'}, {status}).")
+    if status == 'older':
+        click.echo("Run 'flask db upgrade' to bring the schema up to date.")
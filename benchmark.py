@@ -0,0 +1,448 @@
+"""
+Benchmark harness for the main pages and APIs.
+
+Seeds a synthetic dataset into a throwaway SQLite database, drives the
+Flask test client as an admin, a manager, a developer and a visitor, and
+reports p50/p95 latency, SQL statement count and peak memory per endpoint.
+
+    python benchmark.py run --tickets 10000 --output bench.json
+    python benchmark.py compare baseline.json bench.json --threshold 0.25
+
+``run --during-backup`` takes online backups back to back while measuring,
+so comparing it with a plain run shows what a backup costs requests.
+
+``writes`` measures write throughput under contention: several processes
+of several threads each move tickets between columns as fast as they
+can, once committing every operation on its own and once with group
+commit (``WRITE_COALESCING``).
+
+    python benchmark.py writes --processes 4 --threads 8 --ops 50
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from sqlalchemy import event, insert
+from werkzeug.security import generate_password_hash
+
+import backup
+import workload
+from app import create_app
+from config import Config
+from models import db, Team, User, Project, Ticket
+
+ROLES = ['admin', 'manager', 'developer', 'visitor']
+STATUSES = ['To Do', 'In Progress', 'In Review', 'Done']
+PRIORITIES = ['Low', 'Medium', 'High', 'Critical']
+LEAF_TYPES = ['story', 'task', 'bug']
+PASSWORD = 'benchmark'
+
+# (name, method, path); {ticket_id} is filled in per role
+ENDPOINTS = [
+    ('dashboard', 'GET', '/dashboard'),
+    ('board', 'GET', '/board'),
+    ('summary', 'GET', '/summary'),
+    ('search', 'GET', '/search?q=login'),
+    ('hierarchy', 'GET', '/hierarchy'),
+    ('autocomplete', 'GET', '/api/autocomplete?kind=ticket&q=log'),
+    ('ticket_status', 'POST', '/api/ticket/{ticket_id}/status'),
+]
+
+CHUNK_SIZE = 5000
+
+
+def make_config(db_path, **settings):
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+        # Repeated requests would only measure the rate limiter
+        ADMISSION_ENDPOINTS = {}
+    for name, value in settings.items():
+        setattr(BenchmarkConfig, name, value)
+    return BenchmarkConfig
+
+
+def _bulk_insert(model, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(insert(model), rows[start:start + CHUNK_SIZE])
+    db.session.commit()
+
+
+def seed_dataset(teams=5, users_per_team=10, projects_per_team=4, tickets=1000, seed=1):
+    """Bulk-insert a synthetic dataset. Must run inside an app context."""
+    if users_per_team < 3:
+        raise ValueError('users_per_team must be at least 3 (manager, developer, visitor)')
+    rng = random.Random(seed)
+    db.create_all()
+    # Cheap hash so logging in does not dominate the run
+    password = generate_password_hash(PASSWORD, method='pbkdf2:sha256:1000')
+
+    _bulk_insert(Team, [{'name': f'team-{t}'} for t in range(teams)])
+    team_ids = [tid for (tid,) in db.session.query(Team.id).order_by(Team.id)]
+
+    users = [{'name': 'Bench Admin', 'email': 'bench-admin@example.com', 'password': password,
+              'role': 'admin', 'approved': True, 'team_id': None}]
+    for t, team_id in enumerate(team_ids):
+        for u in range(users_per_team):
+            # First member of each team manages it, the last one is a visitor
+            role = 'manager' if u == 0 else 'visitor' if u == users_per_team - 1 else 'developer'
+            users.append({'name': f'user-{t}-{u}', 'email': f'user-{t}-{u}@example.com',
+                          'password': password, 'role': role, 'approved': True, 'team_id': team_id})
+    _bulk_insert(User, users)
+
+    members = {}
+    for user_id, name, role, team_id in db.session.query(User.id, User.name, User.role, User.team_id):
+        if team_id is not None:
+            members.setdefault(team_id, []).append((user_id, name, role))
+    for team_id in team_ids:
+        manager_id = next(uid for uid, _, role in members[team_id] if role == 'manager')
+        db.session.query(Team).filter_by(id=team_id).update({'manager_id': manager_id})
+    db.session.commit()
+
+    today = date.today()
+    project_rows = []
+    for t, team_id in enumerate(team_ids):
+        manager_id = next(uid for uid, _, role in members[team_id] if role == 'manager')
+        for p in range(projects_per_team):
+            project_rows.append({'name': f'project-{t}-{p}', 'description': f'Synthetic project {p} of team {t}',
+                                 'team_lead_id': manager_id, 'team_id': team_id, 'status': 'Active',
+                                 'start_date': today - timedelta(days=90), 'deadline': today + timedelta(days=90)})
+    _bulk_insert(Project, project_rows)
+    projects = db.session.query(Project.id, Project.team_id).all()
+
+    # One epic per 100 tickets and one feature per 10; the rest are leaves.
+    # Tickets are inserted level by level so parents always exist first.
+    n_epics = max(1, tickets // 100)
+    n_features = max(1, tickets // 10)
+    n_leaves = max(0, tickets - n_epics - n_features)
+
+    def ticket_row(type_, parent_id=None):
+        project_id, team_id = rng.choice(projects)
+        _, assignee, _ = rng.choice(members[team_id])
+        start = today - timedelta(days=rng.randint(0, 60))
+        return {'title': f'{type_} {rng.choice(["login", "report", "billing", "search"])} {rng.randint(0, 10**6)}',
+                'description': 'Synthetic benchmark ticket', 'type': type_,
+                'priority': rng.choice(PRIORITIES), 'assignee': assignee,
+                'status': rng.choice(STATUSES), 'public': rng.random() < 0.5,
+                'project_id': project_id, 'parent_id': parent_id,
+                'start_date': start, 'end_date': start + timedelta(days=rng.randint(1, 30))}
+
+    _bulk_insert(Ticket, [ticket_row('epic') for _ in range(n_epics)])
+    epic_ids = [tid for (tid,) in db.session.query(Ticket.id).filter_by(type='epic')]
+    _bulk_insert(Ticket, [ticket_row('feature', rng.choice(epic_ids)) for _ in range(n_features)])
+    feature_ids = [tid for (tid,) in db.session.query(Ticket.id).filter_by(type='feature')]
+    for start in range(0, n_leaves, CHUNK_SIZE):
+        rows = [ticket_row(rng.choice(LEAF_TYPES), rng.choice(feature_ids))
+                for _ in range(min(CHUNK_SIZE, n_leaves - start))]
+        db.session.execute(insert(Ticket), rows)
+    db.session.commit()
+    # Bulk inserts bypass the routes that keep the workload index current
+    workload.rebuild()
+
+
+@contextmanager
+def count_statements(engine):
+    """Count SQL statements executed on ``engine`` inside the block."""
+    counter = {'statements': 0}
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        counter['statements'] += 1
+
+    event.listen(engine, 'before_cursor_execute', on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', on_execute)
+
+
+@contextmanager
+def backups_running(app, directory):
+    """Take online backups back to back in a thread for the duration of the block."""
+    stop = threading.Event()
+    runs = []
+
+    def loop():
+        with app.app_context():
+            while not stop.is_set():
+                runs.append(backup.backup(os.path.join(directory, 'bench-backup.db')))
+
+    thread = threading.Thread(target=loop, name='bench-backup', daemon=True)
+    thread.start()
+    try:
+        yield runs
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _role_users():
+    """Pick one user of every role, plus a ticket each of them can edit."""
+    picked = {}
+    for role in ROLES:
+        user = User.query.filter_by(role=role, approved=True).order_by(User.id).first()
+        if role == 'admin' or role == 'visitor':
+            ticket = Ticket.query.order_by(Ticket.id).first()
+        elif role == 'manager':
+            ticket = (Ticket.query.join(Project, Ticket.project_id == Project.id)
+                      .filter(Project.team_lead_id == user.id).order_by(Ticket.id).first())
+        else:
+            ticket = Ticket.query.filter_by(assignee=user.name).order_by(Ticket.id).first()
+        picked[role] = (user.email, ticket.id if ticket else 0)
+    return picked
+
+
+def run_benchmark(app, iterations=10, warmup=2, roles=ROLES):
+    """Time every endpoint for every role and return a results dict."""
+    with app.app_context():
+        users = _role_users()
+        engine = db.engine
+    results = {}
+    for role in roles:
+        email, ticket_id = users[role]
+        client = app.test_client()
+        response = client.post('/login', data={'email': email, 'password': PASSWORD})
+        if response.status_code != 302:
+            raise RuntimeError(f'Could not log in as {role} ({email})')
+        for name, method, path in ENDPOINTS:
+            url = path.format(ticket_id=ticket_id)
+            timings, statements, codes = [], [], set()
+            for i in range(warmup + iterations):
+                kwargs = {'json': {'status': STATUSES[i % len(STATUSES)]}} if method == 'POST' else {}
+                with count_statements(engine) as counter:
+                    started = time.perf_counter()
+                    response = client.open(url, method=method, **kwargs)
+                    elapsed = time.perf_counter() - started
+                if i < warmup:
+                    continue
+                timings.append(elapsed * 1000)
+                statements.append(counter['statements'])
+                codes.add(response.status_code)
+            # tracemalloc slows execution down considerably, so peak memory
+            # comes from one extra request instead of the timed ones
+            tracemalloc.start()
+            client.open(url, method=method, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[f'{role} {name}'] = {
+                'role': role,
+                'endpoint': name,
+                'url': url,
+                'status_codes': sorted(codes),
+                'p50_ms': round(statistics.median(timings), 3),
+                'p95_ms': round(_percentile(timings, 95), 3),
+                'sql_statements': max(statements),
+                'peak_memory_kb': round(peak / 1024, 1),
+            }
+    return results
+
+
+def _write_process(db_path, coalescing, threads, ops, email, ticket_ids, ready, results):
+    """One process of the write benchmark: ``threads`` clients each making ``ops`` status moves."""
+    app = create_app(make_config(db_path, WRITE_COALESCING=coalescing))
+    latencies, errors = [], []
+
+    def client_loop(seed):
+        rng = random.Random(seed)
+        client = app.test_client()
+        client.post('/login', data={'email': email, 'password': PASSWORD})
+        ready.wait()
+        for _ in range(ops):
+            started = time.perf_counter()
+            response = client.post(f'/api/ticket/{rng.choice(ticket_ids)}/status', json={'status': rng.choice(STATUSES)})
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors.append(response.get_data(as_text=True)[:500])
+
+    clients = [threading.Thread(target=client_loop, args=(f'{os.getpid()}-{n}',)) for n in range(threads)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    results.put((latencies, errors))
+
+def run_write_benchmark(db_path, coalescing, processes=4, threads=8, ops=50):
+    """Ticket moves per second, latency and failures with or without group commit."""
+    app = create_app(make_config(db_path))
+    with app.app_context():
+        email = User.query.filter_by(role='admin').order_by(User.id).first().email
+        ticket_ids = [ticket_id for (ticket_id,) in db.session.query(Ticket.id).limit(5000)]
+        db.engine.dispose()
+    context = multiprocessing.get_context('fork')
+    ready = context.Barrier(processes * threads + 1)
+    results = context.Queue()
+    workers = [context.Process(target=_write_process,
+                               args=(db_path, coalescing, threads, ops, email, ticket_ids, ready, results))
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    ready.wait()
+    started = time.perf_counter()
+    latencies, errors = [], []
+    for _ in workers:
+        process_latencies, process_errors = results.get()
+        latencies += process_latencies
+        errors += process_errors
+    elapsed = time.perf_counter() - started
+    for worker in workers:
+        worker.join()
+    return {
+        'mode': 'group commit' if coalescing else 'commit per operation',
+        'operations': len(latencies),
+        'ops_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies), 2),
+        'p95_ms': round(_percentile(latencies, 95), 2),
+        'p99_ms': round(_percentile(latencies, 99), 2),
+        'failed': len(errors),
+        'locked': sum('locked' in error for error in errors),
+    }
+
+
+def compare(baseline, current, threshold=0.2, min_delta_ms=1.0):
+    """Return a list of regressions of ``current`` against ``baseline``.
+
+    A timing regresses when it is more than ``threshold`` (a fraction) and
+    more than ``min_delta_ms`` slower; statement counts and peak memory
+    regress when they grow by more than ``threshold``.
+    """
+    regressions = []
+    for key, base in baseline['results'].items():
+        cur = current['results'].get(key)
+        if cur is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if cur[metric] > base[metric] * (1 + threshold) and cur[metric] - base[metric] > min_delta_ms:
+                regressions.append(f'{key}: {metric} {base[metric]} -> {cur[metric]}')
+        for metric in ('sql_statements', 'peak_memory_kb'):
+            if cur[metric] > base[metric] * (1 + threshold):
+                regressions.append(f'{key}: {metric} {base[metric]} -> {cur[metric]}')
+    return regressions
+
+
+def print_table(results):
+    print(f"{'endpoint':<28}{'codes':>10}{'p50 ms':>10}{'p95 ms':>10}{'sql':>8}{'peak KB':>10}")
+    for key, r in results.items():
+        codes = ','.join(str(c) for c in r['status_codes'])
+        print(f"{key:<28}{codes:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['sql_statements']:>8}{r['peak_memory_kb']:>10}")
+
+
+def cmd_run(args):
+    workdir = tempfile.mkdtemp(prefix='jira-bench-')
+    app = create_app(make_config(os.path.join(workdir, 'bench.db')))
+    with app.app_context():
+        started = time.perf_counter()
+        seed_dataset(teams=args.teams, users_per_team=args.users_per_team,
+                     projects_per_team=args.projects_per_team, tickets=args.tickets, seed=args.seed)
+        print(f'Seeded {args.tickets} tickets in {time.perf_counter() - started:.1f}s')
+    if args.during_backup:
+        with backups_running(app, workdir) as runs:
+            results = run_benchmark(app, iterations=args.iterations, warmup=args.warmup)
+    else:
+        results = run_benchmark(app, iterations=args.iterations, warmup=args.warmup)
+    print_table(results)
+    report = {'dataset': {'teams': args.teams, 'users_per_team': args.users_per_team,
+                          'projects_per_team': args.projects_per_team, 'tickets': args.tickets,
+                          'seed': args.seed},
+              'iterations': args.iterations,
+              'python': sys.version.split()[0],
+              'results': results}
+    if args.during_backup:
+        report['backups'] = {'count': len(runs),
+                             'avg_seconds': round(statistics.mean(r['seconds'] for r in runs), 3) if runs else None,
+                             'restarts': sum(r['restarts'] for r in runs)}
+        print(f"{len(runs)} backups ran during the benchmark "
+              f"(avg {report['backups']['avg_seconds']}s, {report['backups']['restarts']} restarts)")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Results written to {args.output}')
+    return 0
+
+
+def cmd_writes(args):
+    workdir = tempfile.mkdtemp(prefix='jira-bench-')
+    seeded = os.path.join(workdir, 'seeded.db')
+    app = create_app(make_config(seeded))
+    with app.app_context():
+        seed_dataset(tickets=args.tickets, seed=args.seed)
+        db.engine.dispose()
+    print(f'{args.processes} processes x {args.threads} threads x {args.ops} status moves')
+    print(f"{'mode':<24}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'failed':>8}{'locked':>8}")
+    for coalescing in (False, True):
+        # Both modes start from the same data
+        db_path = os.path.join(workdir, f'writes-{int(coalescing)}.db')
+        shutil.copy(seeded, db_path)
+        r = run_write_benchmark(db_path, coalescing, args.processes, args.threads, args.ops)
+        print(f"{r['mode']:<24}{r['ops_per_second']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}"
+              f"{r['failed']:>8}{r['locked']:>8}")
+    return 0
+
+
+def cmd_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if baseline.get('dataset') != current.get('dataset'):
+        print('Warning: baseline and current runs used different datasets')
+    regressions = compare(baseline, current, args.threshold, args.min_delta_ms)
+    for line in regressions:
+        print(f'REGRESSION {line}')
+    if regressions:
+        return 1
+    print('No regressions')
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='seed a dataset and benchmark the endpoints')
+    run.add_argument('--teams', type=int, default=5)
+    run.add_argument('--users-per-team', type=int, default=10)
+    run.add_argument('--projects-per-team', type=int, default=4)
+    run.add_argument('--tickets', type=int, default=1000)
+    run.add_argument('--iterations', type=int, default=10)
+    run.add_argument('--warmup', type=int, default=2)
+    run.add_argument('--seed', type=int, default=1)
+    run.add_argument('--output', help='write results as JSON to this path')
+    run.add_argument('--during-backup', action='store_true', help='run online backups continuously while measuring')
+    run.set_defaults(func=cmd_run)
+
+    writes = sub.add_parser('writes', help='compare write throughput with and without group commit')
+    writes.add_argument('--tickets', type=int, default=1000)
+    writes.add_argument('--processes', type=int, default=4, help='like Gunicorn workers')
+    writes.add_argument('--threads', type=int, default=8, help='concurrent clients per process')
+    writes.add_argument('--ops', type=int, default=50, help='status moves per client')
+    writes.add_argument('--seed', type=int, default=1)
+    writes.set_defaults(func=cmd_writes)
+
+    cmp = sub.add_parser('compare', help='fail if CURRENT regressed against BASELINE')
+    cmp.add_argument('baseline')
+    cmp.add_argument('current')
+    cmp.add_argument('--threshold', type=float, default=0.2, help='allowed relative slowdown (default 0.2)')
+    cmp.add_argument('--min-delta-ms', type=float, default=1.0, help='ignore timing changes smaller than this')
+    cmp.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
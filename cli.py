@@ -0,0 +1,57 @@
+import click
+from flask.cli import with_appcontext
+from werkzeug.security import generate_password_hash
+
+import rosters
+from models import db, User, Team
+from archive import archive_tickets_command
+from backfill import backfill_status_command
+from backup import db_backup_command, db_restore_command
+from jobs import worker_command
+from provisioning import provision_users_command
+from public_board import public_snapshot_command
+from slow_queries import slow_queries_command
+from snapshots import snapshot_command
+from workload import rebuild_workload_command
+
+DEFAULT_TEAMS = ['alpha', 'beta', 'gamma']
+
+@click.command('seed')
+@with_appcontext
+def seed_command():
+    """Create the tables, the default admin and the default teams."""
+    db.create_all()
+    admin_user = User.query.filter_by(role='admin').first()
+    if not admin_user:
+        admin_user = User(
+            name='Default Admin',
+            email='admin@example.com',
+            password=generate_password_hash('adminpassword'),
+            role='admin',
+            approved=True
+        )
+        db.session.add(admin_user)
+        db.session.commit()
+    # Initialize default teams alpha, beta, gamma with managers
+    existing = {name for (name,) in db.session.query(Team.name).filter(Team.name.in_(DEFAULT_TEAMS))}
+    for team_name in DEFAULT_TEAMS:
+        if team_name not in existing:
+            # Assign manager for each team (for now assign admin as manager)
+            db.session.add(Team(name=team_name, manager_id=admin_user.id))
+    db.session.commit()
+    rosters.invalidate()
+    teams = Team.query.all()
+    click.echo(f"Teams in DB: {[team.name for team in teams]}")
+
+def register_commands(app):
+    app.cli.add_command(seed_command)
+    app.cli.add_command(slow_queries_command)
+    app.cli.add_command(snapshot_command)
+    app.cli.add_command(rebuild_workload_command)
+    app.cli.add_command(worker_command)
+    app.cli.add_command(provision_users_command)
+    app.cli.add_command(archive_tickets_command)
+    app.cli.add_command(db_backup_command)
+    app.cli.add_command(db_restore_command)
+    app.cli.add_command(backfill_status_command)
+    app.cli.add_command(public_snapshot_command)
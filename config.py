@@ -6,3 +6,102 @@ class Config:
     SECRET_KEY = 'this-is-secret'
     SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(BASE_DIR, 'instance', 'app.db')}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Per-request SQL statistics (see query_stats.py)
+    SQL_STATS_ENABLED = True
+    SQL_STATS_HISTORY = 100
+    # Statement shapes repeated this many times in one request are logged as probable N+1s
+    SQL_N_PLUS_ONE_THRESHOLD = 5
+    # Maximum statements per endpoint, e.g. {'teams.teams_page': 10}
+    SQL_QUERY_BUDGETS = {}
+    # Raise QueryBudgetExceeded instead of logging (useful in tests)
+    SQL_QUERY_BUDGET_RAISE = False
+
+    # Prometheus metrics (see metrics.py); workers share METRICS_DIR
+    METRICS_ENABLED = True
+    METRICS_DIR = os.path.join(BASE_DIR, 'instance', 'metrics')
+    METRICS_FLUSH_INTERVAL = 5  # seconds
+    METRICS_TABLE_COUNTS_TTL = 30  # seconds a scrape reuses the table row counts
+    # When set, /metrics requires "Authorization: Bearer <token>"
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Compiled Jinja templates kept across restarts (see templating.py); None disables
+    TEMPLATE_CACHE_DIR = os.path.join(BASE_DIR, 'instance', 'jinja-cache')
+
+    # Admission control for expensive endpoints (see admission.py): the
+    # requests of each endpoint running at once across all workers; more get a 503
+    ADMISSION_ENDPOINTS = {'dashboard.search': 2, 'dashboard.summary_page': 2, 'tickets.all_tickets': 1}
+    # Per-user token buckets for those endpoints: role -> (requests per minute, burst); None is unlimited
+    RATE_LIMITS = {'admin': None, 'manager': (30, 10), 'developer': (30, 10), 'visitor': (12, 5)}
+    ADMISSION_RETRY_AFTER = 1  # seconds suggested to clients turned away with a 503
+    ADMISSION_DIR = os.path.join(BASE_DIR, 'instance', 'admission')
+
+    # Admin-triggered request profiles (see profiler.py)
+    PROFILES_DIR = os.path.join(BASE_DIR, 'instance', 'profiles')
+    PROFILES_KEEP = 50  # saved profiles kept; older ones are removed when a new one is saved
+    PROFILES_MAX_AGE_DAYS = 7
+
+    # Statements slower than this many milliseconds go to the slow-query log
+    # (see slow_queries.py); None disables it
+    SLOW_QUERY_MS = 200
+    SLOW_QUERY_EXPLAIN = True
+    SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'instance', 'logs', 'slow_queries.ndjson')
+    SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+    SLOW_QUERY_LOG_BACKUPS = 5
+
+    # Hour of the day (0-23) at which one worker records project snapshots
+    # in-process; None leaves it to 'flask snapshot-projects' (e.g. from cron)
+    SNAPSHOT_HOUR = None
+
+    # Compression and conditional GETs (see http_cache.py); brotli is used
+    # when the optional 'brotli' package is installed, gzip otherwise
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = 1024  # bytes
+    COMPRESS_LEVEL = 6
+    # Cache lifetime for static URLs carrying a content hash
+    STATIC_MAX_AGE = 365 * 24 * 3600
+
+    # Background jobs (see jobs.py); run them with 'flask worker'
+    JOBS_THREADS = 4
+    JOBS_POLL_INTERVAL = 1.0  # seconds between polls of an empty queue
+    JOBS_VISIBILITY_TIMEOUT = 300  # seconds before a claimed job may be retried elsewhere
+    JOBS_MAX_ATTEMPTS = 5
+    JOBS_BACKOFF_BASE = 2  # seconds; doubles with every failed attempt
+    JOBS_BACKOFF_MAX = 600
+    JOBS_RETENTION_HOURS = 24
+    # Run due jobs at the end of each request instead of in a worker
+    JOBS_INLINE = os.environ.get('JOBS_INLINE') == '1'
+
+    # Bulk user provisioning (see provisioning.py)
+    PROVISION_HASH_WORKERS = None  # password hashing processes; None means one per CPU
+    PROVISION_CHUNK_SIZE = 500  # users inserted per transaction
+    PROVISION_MAX_ROWS = 2000  # per web upload; the CLI has no limit
+    # Uploads waiting for the provision_users job (plain passwords until it hashes them)
+    PROVISION_SPOOL_DIR = os.path.join(BASE_DIR, 'instance', 'provisioning')
+
+    # Ticket archive (see archive.py); run it with 'flask archive-tickets'
+    ARCHIVE_AFTER_DAYS = 90  # Done tickets whose status is older than this move out of 'ticket'
+    ARCHIVE_BATCH_SIZE = 500  # tickets moved per transaction
+
+    # Online SQLite backups (see backup.py)
+    BACKUP_DIR = os.path.join(BASE_DIR, 'instance', 'backups')
+    BACKUP_PAGES = 256  # pages copied per step; a writer waits for at most one step
+    BACKUP_STEP_SLEEP = 0.005  # seconds between steps
+    # Copies restarted by concurrent writes before the rest is copied in one step
+    BACKUP_MAX_RESTARTS = 20
+
+    # Data backfills in migrations (see backfill.py)
+    BACKFILL_CHUNK_SIZE = 1000  # rows per transaction
+    BACKFILL_PAUSE = 0.05  # seconds between chunks, for the app's writers
+
+    # Pre-rendered public board for visitors (see public_board.py)
+    PUBLIC_SNAPSHOT_DIR = os.path.join(BASE_DIR, 'instance', 'public')
+    PUBLIC_SNAPSHOT_DEBOUNCE = 10  # seconds; changes within one window cost one render
+
+    # Group commit of short writes (see writer.py): one writer thread per
+    # process commits the writes of concurrent requests and job threads together
+    WRITE_COALESCING = os.environ.get('WRITE_COALESCING') == '1'
+    WRITE_BATCH_MAX = 64  # operations per commit
+    # Seconds the writer waits for more operations; 0 batches whatever queued up during the last commit
+    WRITE_BATCH_WAIT = 0.0
+    WRITE_TIMEOUT = 30  # seconds a write may wait for the writer before it is withdrawn (503)
@@ -1,8 +1,279 @@
-from flask import Blueprint, render_template
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from flask import Blueprint, render_template, request
 from flask_login import login_required, current_user
 
+import archive
+import public_board
+from models import db, Ticket, Project, User, Team
+from rbac import can_see_ticket, can_see_project
+
 dashboard_bp = Blueprint('dashboard', __name__)
 
-@dashboard_bp.route('/')
-def index():
-    return render_template('index.html')
+@dashboard_bp.route('/dashboard')
+@login_required
+def dashboard():
+    
+    if current_user.role == 'visitor':
+        # Public tickets come from the pre-rendered snapshot, without scanning the table
+        tickets = public_board.tickets_by_status()
+        if tickets is not None:
+            return render_template('index.html', tickets=tickets)
+    
+    # Get tickets for the dashboard
+    try:
+        # Try to get all tickets with parent_id column
+        all_tickets = Ticket.query.all()
+    except Exception as e:
+        # If parent_id column doesn't exist, use a custom query
+        stmt = sa.text("SELECT id, title, description, type, priority, assignee, status, public, project_id, start_date, end_date FROM ticket")
+        result = db.session.execute(stmt)
+        all_tickets = []
+        for row in result:
+            ticket = Ticket(
+                id=row.id,
+                title=row.title,
+                description=row.description,
+                type=row.type,
+                priority=row.priority,
+                assignee=row.assignee,
+                status=row.status,
+                public=row.public,
+                project_id=row.project_id,
+                start_date=row.start_date,
+                end_date=row.end_date
+            )
+            all_tickets.append(ticket)
+    
+    # Filter tickets based on user role
+    if current_user.role == 'admin':
+        # Admin can see all tickets
+        visible_tickets = all_tickets
+    elif current_user.role == 'manager':
+        # Manager can see all tickets (public and private) from their team's projects
+        visible_tickets = []
+        for ticket in all_tickets:
+            # Check if ticket belongs to a project where the manager is team lead
+            if ticket.project and ticket.project.team_lead_id == current_user.id:
+                visible_tickets.append(ticket)
+            # Check if ticket belongs to a project in the manager's team
+            elif ticket.project and ticket.project.team_id == current_user.team_id:
+                visible_tickets.append(ticket)
+    elif current_user.role == 'developer':
+        # Developers can only see their own tickets and public tickets in their team's projects
+        visible_tickets = []
+        for ticket in all_tickets:
+            if ticket.assignee == current_user.name:  # Their own tickets
+                visible_tickets.append(ticket)
+            elif ticket.public and ticket.project and ticket.project.team_id == current_user.team_id:  # Public tickets in their team
+                visible_tickets.append(ticket)
+    else:  # Visitor
+        # Visitors can see all public tickets
+        visible_tickets = [ticket for ticket in all_tickets if ticket.public]
+    
+    # Organize tickets by status
+    tickets = {'To Do': [], 'In Progress': [], 'In Review': [], 'Done': []}
+    for t in visible_tickets:
+        tickets.setdefault(t.status, []).append(t)
+    
+    return render_template('index.html', tickets=tickets)
+
+@dashboard_bp.route('/summary')
+@login_required
+def summary_page():
+    
+    user = current_user
+    
+    # Use a raw SQL query to avoid the parent_id column
+    try:
+        # Try to get all tickets with parent_id column
+        tickets = Ticket.query.all()
+    except Exception as e:
+        # If parent_id column doesn't exist, use a custom query
+        stmt = sa.text("SELECT id, title, description, type, priority, assignee, status, public, project_id, start_date, end_date FROM ticket")
+        result = db.session.execute(stmt)
+        tickets = []
+        for row in result:
+            ticket = Ticket(
+                id=row.id,
+                title=row.title,
+                description=row.description,
+                type=row.type,
+                priority=row.priority,
+                assignee=row.assignee,
+                status=row.status,
+                public=row.public,
+                project_id=row.project_id,
+                start_date=row.start_date,
+                end_date=row.end_date
+            )
+            tickets.append(ticket)
+    
+    # Filter tickets based on user role
+    if user.role == 'admin':
+        # Admin can see all tickets
+        filtered = tickets
+    elif user.role == 'manager':
+        # Manager can see all tickets from their team's projects
+        filtered = []
+        for ticket in tickets:
+            # Check if ticket belongs to a project where the manager is team lead
+            if ticket.project and ticket.project.team_lead_id == user.id:
+                filtered.append(ticket)
+            # Check if ticket belongs to a project in the manager's team
+            elif ticket.project and ticket.project.team_id == user.team_id:
+                filtered.append(ticket)
+    else:
+        # Developers can only see their own tickets and public tickets in their team's projects
+        filtered = []
+        for ticket in tickets:
+            if ticket.assignee == user.name:  # Their own tickets
+                filtered.append(ticket)
+            elif ticket.public and ticket.project and ticket.project.team_id == user.team_id:  # Public tickets in their team
+                filtered.append(ticket)
+    
+    # Basic ticket counts
+    total_tickets = len(filtered)
+    completed_tickets = len([t for t in filtered if t.status == 'Done'])
+    
+    # Status distribution
+    status_data = defaultdict(int)
+    for t in filtered:
+        status_data[t.status] += 1
+    
+    # Priority distribution
+    priority_data = defaultdict(int)
+    for t in filtered:
+        priority_data[t.priority] += 1
+    
+    # Type distribution
+    type_data = defaultdict(int)
+    for t in filtered:
+        type_data[t.type] += 1
+    
+    # Team data (for admin and managers)
+    team_data = {}
+    timeline_data = {'labels': [], 'completed': [], 'created': []}
+    
+    if user.role in ['admin', 'manager']:
+        # Team performance data
+        teams = Team.query.all()
+        for team in teams:
+            team_tickets = [t for t in filtered if t.project and t.project.team_id == team.id]
+            if team_tickets:
+                team_data[team.name] = {
+                    'total': len(team_tickets),
+                    'completed': len([t for t in team_tickets if t.status == 'Done'])
+                }
+        
+        # Timeline data (last 7 days)
+        today = datetime.now().date()
+        for i in range(7):
+            day = today - timedelta(days=i)
+            day_str = day.strftime('%Y-%m-%d')
+            timeline_data['labels'].insert(0, day_str)
+            
+            # This is simplified - in a real app you'd track creation/completion dates
+            # For demo purposes, we'll use random data
+            timeline_data['completed'].insert(0, random.randint(0, 5))
+            timeline_data['created'].insert(0, random.randint(1, 8))
+    
+    # Projects offered in the burndown chart
+    burndown_projects = [p for p in Project.query.order_by(Project.name).all() if can_see_project(p, user)]
+    
+    return render_template('summary.html', 
+                           total_tickets=total_tickets, 
+                           completed_tickets=completed_tickets,
+                           status_data=dict(status_data),
+                           priority_data=dict(priority_data),
+                           type_data=dict(type_data),
+                           team_data=team_data,
+                           timeline_data=timeline_data,
+                           burndown_projects=burndown_projects)
+
+@dashboard_bp.route('/search')
+@login_required
+def search():
+    
+    query = request.args.get('q', '').strip()
+    include_archived = request.args.get('archived') == '1'
+    if not query:
+        return render_template('search_results.html', results=[], query='', include_archived=include_archived)
+    
+    # Search results containers
+    tickets = []
+    projects = []
+    users = []
+    teams = []
+    
+    # Search tickets
+    try:
+        # Try with parent_id column
+        ticket_results = Ticket.query.filter(
+            sa.or_(
+                Ticket.title.ilike(f'%{query}%'),
+                Ticket.description.ilike(f'%{query}%'),
+                Ticket.assignee.ilike(f'%{query}%'),
+                Ticket.type.ilike(f'%{query}%')
+            )
+        ).all()
+        tickets = [t for t in ticket_results if can_see_ticket(t, current_user)]
+    except Exception as e:
+        # If parent_id column doesn't exist, use raw SQL
+        stmt = sa.text("SELECT id, title, description, type, priority, assignee, status, public, project_id, start_date, end_date FROM ticket WHERE title LIKE :query OR description LIKE :query OR assignee LIKE :query OR type LIKE :query")
+        result = db.session.execute(stmt, {"query": f'%{query}%'})
+        for row in result:
+            ticket = Ticket(
+                id=row.id,
+                title=row.title,
+                description=row.description,
+                type=row.type,
+                priority=row.priority,
+                assignee=row.assignee,
+                status=row.status,
+                public=row.public,
+                project_id=row.project_id,
+                start_date=row.start_date,
+                end_date=row.end_date
+            )
+            if can_see_ticket(ticket, current_user):
+                tickets.append(ticket)
+    
+    # Search projects
+    projects = Project.query.filter(
+        sa.or_(
+            Project.name.ilike(f'%{query}%'),
+            Project.description.ilike(f'%{query}%'),
+            Project.status.ilike(f'%{query}%')
+        )
+    ).all()
+    
+    # Search users (only for admin and managers)
+    if current_user.role in ['admin', 'manager']:
+        users = User.query.filter(
+            sa.or_(
+                User.name.ilike(f'%{query}%'),
+                User.email.ilike(f'%{query}%'),
+                User.role.ilike(f'%{query}%')
+            )
+        ).all()
+    
+    # Search teams
+    teams = Team.query.filter(Team.name.ilike(f'%{query}%')).all()
+    
+    # Archived tickets only on request
+    archived_tickets = archive.search_archive(query, current_user) if include_archived else []
+    
+    # Combine results
+    results = {
+        'tickets': tickets,
+        'archived_tickets': archived_tickets,
+        'projects': projects,
+        'users': users,
+        'teams': teams
+    }
+    
+    return render_template('search_results.html', results=results, query=query, include_archived=include_archived)
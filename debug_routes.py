@@ -1,7 +1,15 @@
-@app.route('/debug/users')
+from flask import Blueprint, render_template, redirect, url_for, flash, abort
+from flask_login import login_required, current_user
+
+import query_stats
+import rosters
+from models import db, User
+
+debug_bp = Blueprint('debug', __name__)
+
+@debug_bp.route('/debug/users')
 @login_required
 def debug_users():
-    from models import User
     
     # Only admin can access this debug route
     if current_user.role != 'admin':
@@ -9,4 +17,41 @@ def debug_users():
     
     all_users = User.query.all()
     
-    return render_template('debug_users.html', users=all_users)
\ No newline at end of file
+    return render_template('debug_users.html', users=all_users)
+
+@debug_bp.route('/fix-visitors')
+@login_required
+def fix_visitors():
+    
+    # Only admin can access this route
+    if current_user.role != 'admin':
+        abort(403)
+    
+    # Find all users with role containing 'visitor' (case-insensitive)
+    visitors = User.query.filter(User.role.ilike('%visitor%')).all()
+    
+    # Fix any capitalization issues
+    fixed_count = 0
+    for user in visitors:
+        if user.role != 'visitor':
+            print(f"Fixing user {user.name} role from '{user.role}' to 'visitor'")
+            user.role = 'visitor'
+            fixed_count += 1
+    
+    db.session.commit()
+    rosters.invalidate()
+    
+    # Count pending visitors
+    pending_visitors = User.query.filter_by(role='visitor', approved=False).all()
+    
+    flash(f"Fixed {fixed_count} visitor roles. There are now {len(pending_visitors)} pending visitors.")
+    return redirect(url_for('admin.pending_users'))
+
+@debug_bp.route('/debug/sql')
+@login_required
+def debug_sql():
+    # Only admin can access this debug route
+    if current_user.role != 'admin':
+        abort(403)
+    
+    return render_template('debug_sql.html', requests=query_stats.recent_requests())
@@ -0,0 +1,33 @@
+import os
+import time
+
+wsgi_app = 'wsgi:app'
+bind = '0.0.0.0:8000'
+workers = 4
+# Group commit (see writer.py) can only batch the writes of requests a
+# worker handles at the same time, so it needs threaded workers
+threads = int(os.environ.get('GUNICORN_THREADS', 8 if os.environ.get('WRITE_COALESCING') == '1' else 1))
+
+# Import the application once in the master so workers fork from a warm
+# parent instead of each importing Flask, SQLAlchemy and every blueprint.
+preload_app = True
+
+def on_starting(server):
+    # Per-worker metric files from a previous run would be merged into this one
+    import shutil
+    from config import Config
+    shutil.rmtree(Config.METRICS_DIR, ignore_errors=True)
+
+def pre_fork(server, worker):
+    worker.fork_started = time.perf_counter()
+
+def post_worker_init(worker):
+    elapsed = (time.perf_counter() - worker.fork_started) * 1000
+    worker.log.info("Worker %s booted in %.1f ms", worker.pid, elapsed)
+
+def post_fork(server, worker):
+    # SQLite connections must not be shared across a fork.
+    from models import db
+    app = worker.app.wsgi()
+    with app.app_context():
+        db.engine.dispose()
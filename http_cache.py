@@ -0,0 +1,113 @@
+"""
+Response compression, conditional requests and static cache-busting.
+
+Text responses above ``COMPRESS_MIN_SIZE`` bytes are compressed with
+brotli (when the optional ``brotli`` package is installed) or gzip,
+whichever the client accepts. GET responses carry a strong ETag of their
+body so repeat visits and API polling get a bodiless 304 when nothing
+changed. ``url_for('static', ...)`` appends a hash of the file's content,
+and such versioned URLs are served with a far-future Cache-Control.
+"""
+import gzip
+import hashlib
+import os
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+COMPRESSIBLE = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+
+_static_hashes = {}
+
+
+def _compressible(response):
+    return response.mimetype and response.mimetype.startswith(COMPRESSIBLE)
+
+def _choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+def _compress(data, encoding):
+    level = current_app.config['COMPRESS_LEVEL']
+    if encoding == 'br':
+        # Brotli's 0-11 quality scale; mid-range keeps it cheap per request
+        return brotli.compress(data, quality=max(0, min(11, level - 1)))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+def _finish_response(response):
+    if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers:
+        return response
+    if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+        return response
+    compressible = _compressible(response)
+    if compressible:
+        response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    encoding = None
+    if compressible and len(data) >= current_app.config['COMPRESS_MIN_SIZE']:
+        encoding = _choose_encoding()
+
+    # One tag per representation, so a gzip and an identity copy never collide
+    etag = hashlib.md5(data).hexdigest()
+    if encoding:
+        etag = f'{etag}-{encoding}'
+    response.set_etag(etag)
+    if not response.cache_control.max_age and not response.cache_control.no_store:
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    if request.if_none_match.contains(etag):
+        response.status_code = 304
+        response.set_data(b'')
+        response.headers.pop('Content-Length', None)
+        response.headers.pop('Content-Type', None)
+        return response
+
+    if encoding:
+        response.set_data(_compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def static_hash(filename):
+    """Short content hash of a static file, cached until its mtime changes."""
+    path = os.path.join(current_app.static_folder, filename)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _static_hashes.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            cached = _static_hashes[path] = (mtime, hashlib.md5(f.read()).hexdigest()[:12])
+    return cached[1]
+
+def _version_static_urls(endpoint, values):
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        digest = static_hash(values['filename'])
+        if digest:
+            values['v'] = digest
+
+def _cache_static(response):
+    if request.endpoint == 'static' and response.status_code in (200, 304):
+        if request.args.get('v'):
+            # The URL changes with the content, so the old copy can live forever
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = current_app.config['STATIC_MAX_AGE']
+            response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    app.url_defaults(_version_static_urls)
+    app.after_request(_cache_static)
+    if app.config.get('COMPRESS_ENABLED', True):
+        app.after_request(_finish_response)
@@ -0,0 +1,292 @@
+"""
+Durable background jobs stored in the application database.
+
+Request handlers call ``enqueue()``, which only adds a row to the ``job``
+table inside the request's own transaction, so the work is recorded if
+and only if the change that caused it commits. ``flask worker`` claims
+due jobs with a conditional UPDATE, runs them on a thread pool and
+commits the job's own writes together with its ``done`` status. Claims,
+outcomes and quick (``batched``) handlers go through ``writer.run()``,
+so with ``WRITE_COALESCING`` on the threads share commits.
+
+A claimed job is hidden from other workers for ``JOBS_VISIBILITY_TIMEOUT``
+seconds; if its worker dies it becomes claimable again. Failures are
+retried with exponential backoff until ``max_attempts``, then the job is
+marked ``failed``, as is a job whose worker is lost on its last attempt.
+A job with a ``key`` is enqueued at most once while that row exists
+(finished jobs are purged after ``JOBS_RETENTION_HOURS``). With
+``JOBS_INLINE`` set, due jobs run at the end of each request instead,
+which is handy for development without a worker process.
+"""
+import json
+import random
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask import Blueprint, current_app, flash, redirect, render_template, url_for
+from flask.cli import with_appcontext
+from flask_login import login_required
+from sqlalchemy import and_, func, or_
+from sqlalchemy.dialects import postgresql, sqlite
+
+import writer
+from models import db, Job
+from rbac import role_required
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/admin/jobs')
+
+HANDLERS = {}
+# kind -> func(payload, status), called once a job is done or has failed for good
+FINISH_HANDLERS = {}
+# Kinds whose handlers only make a few quick writes (see task())
+BATCHED = set()
+
+
+def task(kind, on_finish=None, batched=False):
+    """Register ``func(payload)`` as the handler for jobs of ``kind``.
+    Handlers must not commit; the worker commits their writes with the job.
+    ``on_finish(payload, status)`` runs after the job's final status is
+    committed, e.g. to clean up files the job was working from. A
+    ``batched`` handler is run through ``writer.run()``, so with
+    ``WRITE_COALESCING`` on its writes share a commit with other short
+    writes; it must be quick and only use its payload."""
+    def decorator(func):
+        HANDLERS[kind] = func
+        if on_finish is not None:
+            FINISH_HANDLERS[kind] = on_finish
+        if batched:
+            BATCHED.add(kind)
+        return func
+    return decorator
+
+def _finished(kind, payload, status):
+    on_finish = FINISH_HANDLERS.get(kind)
+    if on_finish is None:
+        return
+    try:
+        on_finish(json.loads(payload), status)
+    except Exception:
+        current_app.logger.exception('Finish handler for job kind %s failed', kind)
+
+def enqueue(kind, payload=None, key=None, delay=0, max_attempts=None):
+    """Add a job to the current transaction; it runs once the caller commits."""
+    now = datetime.now()
+    dialect = postgresql if db.session.get_bind().dialect.name == 'postgresql' else sqlite
+    stmt = dialect.insert(Job).values(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        key=key,
+        status='queued',
+        attempts=0,
+        max_attempts=max_attempts or current_app.config['JOBS_MAX_ATTEMPTS'],
+        run_at=now + timedelta(seconds=delay),
+        created_at=now,
+    )
+    if key is not None:
+        stmt = stmt.on_conflict_do_nothing(index_elements=['key'])
+    db.session.execute(stmt)
+
+def _claim():
+    """Take the oldest due job as ``(id, kind, payload)``, or None. Safe
+    against other workers and processes."""
+    now = datetime.now()
+    for kind, payload in writer.run(_fail_lost, now):
+        _finished(kind, payload, 'failed')
+    while True:
+        claimed = writer.run(_claim_next, now)
+        if claimed is not False:
+            return claimed
+        # Another worker won the race; look again
+
+def _expired(now):
+    return and_(Job.status == 'running', Job.locked_until < now)
+
+def _fail_lost(now):
+    # A job whose worker died or hung on its last attempt never reached the
+    # except in run_one(), so it is failed here rather than run again
+    lost = db.session.query(Job.id, Job.kind, Job.payload).filter(_expired(now), Job.attempts >= Job.max_attempts).all()
+    if not lost:
+        return []
+    exhausted = (Job.query.filter(Job.id.in_([job.id for job in lost]), _expired(now))
+                 .update({'status': 'failed', 'finished_at': now, 'locked_until': None,
+                          'last_error': 'Worker lost the job on its last attempt (visibility timeout expired)'},
+                         synchronize_session=False))
+    current_app.logger.error('%d job(s) failed for good after their worker was lost', exhausted)
+    return [(job.kind, job.payload) for job in lost]
+
+def _claim_next(now):
+    # One attempt: the job as plain values, None if nothing is due, False if
+    # another worker claimed the candidate first
+    claimable = or_(and_(Job.status == 'queued', Job.run_at <= now),
+                    and_(_expired(now), Job.attempts < Job.max_attempts))
+    candidate = db.session.query(Job.id, Job.kind, Job.payload).filter(claimable).order_by(Job.run_at, Job.id).first()
+    if candidate is None:
+        return None
+    timeout = timedelta(seconds=current_app.config['JOBS_VISIBILITY_TIMEOUT'])
+    claimed = (Job.query.filter(Job.id == candidate.id, claimable)
+               .update({'status': 'running', 'locked_until': now + timeout, 'started_at': now,
+                        'attempts': Job.attempts + 1}, synchronize_session=False))
+    return (candidate.id, candidate.kind, candidate.payload) if claimed else False
+
+def _backoff(attempts):
+    base = current_app.config['JOBS_BACKOFF_BASE']
+    delay = min(base * 2 ** (attempts - 1), current_app.config['JOBS_BACKOFF_MAX'])
+    return delay * random.uniform(0.8, 1.2)
+
+def run_one():
+    """Claim and run a single job; returns False when nothing was due."""
+    claimed = _claim()
+    if claimed is None:
+        return False
+    job_id, kind, payload = claimed
+    handler = HANDLERS.get(kind)
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for job kind {kind!r}')
+        if kind in BATCHED:
+            writer.run(_run_batched, job_id, kind, payload)
+        else:
+            handler(json.loads(payload))
+            _mark_done(job_id)
+            db.session.commit()
+        _finished(kind, payload, 'done')
+    except Exception:
+        error = traceback.format_exc(limit=5)
+        db.session.rollback()
+        if writer.run(_record_failure, job_id, error) == 'failed':
+            _finished(kind, payload, 'failed')
+    return True
+
+def _run_batched(job_id, kind, payload):
+    HANDLERS[kind](json.loads(payload))
+    _mark_done(job_id)
+
+def _mark_done(job_id):
+    Job.query.filter(Job.id == job_id).update({'status': 'done', 'finished_at': datetime.now(), 'locked_until': None,
+                                               'last_error': None}, synchronize_session=False)
+
+def _record_failure(job_id, error):
+    # Queue the job for a retry, or fail it for good; returns its new status
+    job = db.session.get(Job, job_id)
+    job.last_error = error
+    job.locked_until = None
+    if job.attempts >= job.max_attempts:
+        job.status = 'failed'
+        job.finished_at = datetime.now()
+        current_app.logger.error('Job %s (%s) failed for good: %s', job.id, job.kind, error.splitlines()[-1])
+    else:
+        job.status = 'queued'
+        job.run_at = datetime.now() + timedelta(seconds=_backoff(job.attempts))
+    return job.status
+
+def purge():
+    """Delete finished jobs older than the retention period."""
+    cutoff = datetime.now() - timedelta(hours=current_app.config['JOBS_RETENTION_HOURS'])
+    deleted = (Job.query.filter(Job.status.in_(['done', 'failed']), Job.finished_at < cutoff)
+               .delete(synchronize_session=False))
+    db.session.commit()
+    return deleted
+
+def queue_stats():
+    """Depth by status and kind, age of the oldest due job and recent latencies."""
+    now = datetime.now()
+    depth = {}
+    for kind, status, count in db.session.query(Job.kind, Job.status, func.count(Job.id)).group_by(Job.kind, Job.status):
+        depth.setdefault(kind, {})[status] = count
+    oldest = db.session.query(func.min(Job.run_at)).filter(Job.status == 'queued', Job.run_at <= now).scalar()
+    recent = (db.session.query(Job.created_at, Job.run_at, Job.started_at, Job.finished_at)
+              .filter(Job.status == 'done', Job.finished_at >= now - timedelta(hours=1)).all())
+    waits = sorted((started - run_at).total_seconds() for _, run_at, started, _ in recent)
+    runs = sorted((finished - started).total_seconds() for _, _, started, finished in recent)
+
+    def p95(values):
+        return values[int(len(values) * 0.95)] if values else None
+
+    return {
+        'depth': depth,
+        'oldest_due_seconds': (now - oldest).total_seconds() if oldest else None,
+        'done_last_hour': len(recent),
+        'wait_p95': p95(waits),
+        'wait_avg': sum(waits) / len(waits) if waits else None,
+        'run_p95': p95(runs),
+    }
+
+
+@click.command('worker')
+@click.option('--threads', type=int, help='Worker threads (default JOBS_THREADS).')
+@click.option('--once', is_flag=True, help='Run the jobs that are due now, then exit.')
+@with_appcontext
+def worker_command(threads, once):
+    """Process background jobs until interrupted."""
+    app = current_app._get_current_object()
+    threads = threads or app.config['JOBS_THREADS']
+    poll = app.config['JOBS_POLL_INTERVAL']
+    stop = threading.Event()
+
+    def loop():
+        # Each thread gets its own app context and therefore its own session
+        with app.app_context():
+            while not stop.is_set():
+                try:
+                    ran = run_one()
+                except Exception:
+                    app.logger.exception('Job worker error')
+                    db.session.rollback()
+                    ran = False
+                if not ran:
+                    if once:
+                        return
+                    stop.wait(poll)
+
+    click.echo(f'Worker started with {threads} threads.')
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='job-worker') as pool:
+        for _ in range(threads):
+            pool.submit(loop)
+        try:
+            while not once and not stop.is_set():
+                time.sleep(60)
+                with app.app_context():
+                    purge()
+        except KeyboardInterrupt:
+            click.echo('Stopping after the current jobs...')
+            stop.set()
+    with app.app_context():
+        purge()
+
+
+@jobs_bp.route('/')
+@login_required
+@role_required('admin')
+def jobs_page():
+    failed = Job.query.filter_by(status='failed').order_by(Job.finished_at.desc()).limit(20).all()
+    return render_template('jobs.html', stats=queue_stats(), failed=failed)
+
+@jobs_bp.route('/<int:job_id>/retry', methods=['POST'])
+@login_required
+@role_required('admin')
+def retry_job(job_id):
+    job = Job.query.get_or_404(job_id)
+    if job.status == 'failed':
+        job.status = 'queued'
+        job.attempts = 0
+        job.run_at = datetime.now()
+        job.finished_at = None
+        db.session.commit()
+        flash(f'Job {job.id} queued again.')
+    return redirect(url_for('jobs.jobs_page'))
+
+
+def _run_inline(exc):
+    # Development convenience: drain the queue at the end of each request
+    if exc is None:
+        while run_one():
+            pass
+
+def init_app(app):
+    if app.config.get('JOBS_INLINE'):
+        app.teardown_request(_run_inline)
+    app.register_blueprint(jobs_bp)
@@ -0,0 +1,306 @@
+"""
+Prometheus metrics without an external service.
+
+Each process aggregates request metrics in memory and periodically dumps
+them to a file of its own in ``METRICS_DIR``. ``/metrics`` merges the
+files of all workers, so a scrape sees the whole Gunicorn pool no matter
+which worker answers it. When a worker has exited, its counters are
+folded into ``retired.json`` and its file removed, so totals stay
+monotonic while the directory only holds live workers; gauges are only
+reported for live processes.
+"""
+import fcntl
+import json
+import os
+import secrets
+import threading
+import time
+
+from flask import Blueprint, Response, abort, current_app, g, request
+from sqlalchemy import func
+
+import templating
+from models import db, Notification, Ticket
+
+metrics_bp = Blueprint('metrics', __name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'jira_http_requests_total': ('counter', 'HTTP requests handled, by endpoint, method and status.'),
+    'jira_http_request_duration_seconds': ('histogram', 'HTTP request latency, by endpoint and status.'),
+    'jira_http_request_db_seconds_total': ('counter', 'Time spent executing SQL while handling requests.'),
+    'jira_http_request_template_seconds_total': ('counter', 'Time spent rendering templates while handling requests.'),
+    'jira_template_render_seconds': ('histogram', 'Render time of each template, SQL run while rendering included.'),
+    'jira_template_sql_seconds_total': ('counter', 'Time spent executing SQL from inside each template.'),
+    'jira_http_requests_in_flight': ('gauge', 'Requests currently being handled.'),
+    'jira_unread_notifications': ('gauge', 'Unread rows in the notification table.'),
+    'jira_ticket_rows': ('gauge', 'Rows in the ticket table.'),
+}
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_in_flight = 0
+_last_flush = 0.0
+_process = {'pid': None, 'file': None}
+_tables = {'at': None, 'lines': None}
+
+RETIRED_FILE = 'retired.json'
+
+
+def _labels(**labels):
+    return tuple(sorted(labels.items()))
+
+def _inc(name, labels, amount=1.0):
+    _counters[(name, labels)] = _counters.get((name, labels), 0.0) + amount
+
+def _observe(name, labels, value):
+    hist = _histograms.get((name, labels))
+    if hist is None:
+        hist = _histograms[(name, labels)] = [[0] * len(BUCKETS), 0.0, 0]
+    for i, bound in enumerate(BUCKETS):
+        if value <= bound:
+            hist[0][i] += 1
+            break
+    hist[1] += value
+    hist[2] += 1
+
+def _snapshot():
+    with _lock:
+        return {
+            'pid': os.getpid(),
+            'counters': [[name, list(labels), value] for (name, labels), value in _counters.items()],
+            'histograms': [[name, list(labels), list(h[0]), h[1], h[2]] for (name, labels), h in _histograms.items()],
+            'in_flight': _in_flight,
+        }
+
+def _metrics_dir():
+    return current_app.config['METRICS_DIR']
+
+def _process_file():
+    # The token tells this process's file apart from one left by an earlier process with the same pid
+    if _process['pid'] != os.getpid():
+        _process.update(pid=os.getpid(), file=f'{os.getpid()}.{secrets.token_hex(4)}.json')
+    return _process['file']
+
+def _write_json(path, data):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def flush():
+    """Write this process's metrics to the shared directory."""
+    global _last_flush
+    directory = _metrics_dir()
+    os.makedirs(directory, exist_ok=True)
+    _write_json(os.path.join(directory, _process_file()), _snapshot())
+    _last_flush = time.monotonic()
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None  # gone, or being replaced; picked up next scrape
+
+def _merge(counters, histograms, snapshot):
+    for name, labels, value in snapshot['counters']:
+        key = (name, tuple(tuple(pair) for pair in labels))
+        counters[key] = counters.get(key, 0.0) + value
+    for name, labels, buckets, total, count in snapshot['histograms']:
+        key = (name, tuple(tuple(pair) for pair in labels))
+        merged = histograms.setdefault(key, [[0] * len(BUCKETS), 0.0, 0])
+        merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+        merged[1] += total
+        merged[2] += count
+
+def _as_snapshot(counters, histograms):
+    return {
+        'pid': None,
+        'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+        'histograms': [[name, list(labels), *h] for (name, labels), h in histograms.items()],
+        'in_flight': 0,
+    }
+
+def _retire(directory, dead):
+    """Fold the snapshots of exited processes into retired.json and remove their files."""
+    with open(os.path.join(directory, 'retired.lock'), 'a') as lock:
+        # Scrapes in other workers may find the same files
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        path = os.path.join(directory, RETIRED_FILE)
+        retired = _read_json(path) or {'counters': [], 'histograms': [], 'folded': []}
+        # Names folded before but not yet removed, e.g. by a scrape that died in between
+        folded = {name for name in retired['folded'] if os.path.exists(os.path.join(directory, name))}
+        counters, histograms = {}, {}
+        _merge(counters, histograms, retired)
+        for name, snapshot in dead.items():
+            if name not in folded and os.path.exists(os.path.join(directory, name)):
+                _merge(counters, histograms, snapshot)
+                folded.add(name)
+        retired = _as_snapshot(counters, histograms)
+        _write_json(path, dict(retired, folded=sorted(folded)))
+        for name in dead:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+    return retired
+
+def _load_snapshots():
+    own = _process_file()
+    files = {}
+    directory = _metrics_dir()
+    if os.path.isdir(directory):
+        for filename in os.listdir(directory):
+            if filename.endswith('.json') and filename not in (RETIRED_FILE, own):
+                snapshot = _read_json(os.path.join(directory, filename))
+                if snapshot is not None:
+                    files[filename] = snapshot
+    # A pid has one process at a time: of several files for a live pid only the newest is current
+    newest = {}
+    for filename, snapshot in files.items():
+        pid = snapshot['pid']
+        if pid != os.getpid() and _pid_alive(pid):
+            try:
+                mtime = os.path.getmtime(os.path.join(directory, filename))
+            except FileNotFoundError:
+                continue  # retired by another scrape meanwhile
+            if pid not in newest or mtime > newest[pid][0]:
+                newest[pid] = (mtime, filename)
+    live = {filename for _, filename in newest.values()}
+    dead = {filename: snapshot for filename, snapshot in files.items() if filename not in live}
+    if dead:
+        retired = _retire(directory, dead)
+    else:
+        retired = _read_json(os.path.join(directory, RETIRED_FILE))
+    snapshots = [files[filename] for filename in live]
+    if retired is not None:
+        snapshots.append(retired)
+    # Our own numbers are always fresher than our file
+    snapshots.append(_snapshot())
+    return snapshots
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+def render():
+    counters, histograms, in_flight = {}, {}, 0
+    for snapshot in _load_snapshots():
+        _merge(counters, histograms, snapshot)
+        in_flight += snapshot['in_flight']
+
+    lines = []
+    def header(name):
+        kind, text = HELP[name]
+        lines.append(f'# HELP {name} {text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    for name in ('jira_http_requests_total', 'jira_http_request_db_seconds_total',
+                 'jira_http_request_template_seconds_total', 'jira_template_sql_seconds_total'):
+        header(name)
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f'{name}{_format_labels(labels)} {value:g}')
+
+    for name in ('jira_http_request_duration_seconds', 'jira_template_render_seconds'):
+        header(name)
+        for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, n in zip(BUCKETS, buckets):
+                cumulative += n
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", f"{bound:g}")])} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {count}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {total:g}')
+            lines.append(f'{name}_count{_format_labels(labels)} {count}')
+
+    header('jira_http_requests_in_flight')
+    lines.append(f'jira_http_requests_in_flight {in_flight}')
+
+    lines += _table_lines()
+    return '\n'.join(lines) + '\n'
+
+def _table_lines():
+    # Table sizes are single aggregate queries, but not worth repeating on every scrape
+    now = time.monotonic()
+    if _tables['at'] is None or now - _tables['at'] >= current_app.config['METRICS_TABLE_COUNTS_TTL']:
+        unread = db.session.query(func.count(Notification.id)).filter(Notification.read == False).scalar()
+        tickets = db.session.query(func.count(Ticket.id)).scalar()
+        lines = []
+        for name, value in (('jira_unread_notifications', unread), ('jira_ticket_rows', tickets)):
+            kind, text = HELP[name]
+            lines += [f'# HELP {name} {text}', f'# TYPE {name} {kind}', f'{name} {value}']
+        _tables.update(at=now, lines=lines)
+    return _tables['lines']
+
+
+def _start_request():
+    global _in_flight
+    g.metrics_started = time.perf_counter()
+    g.metrics_in_flight = True
+    with _lock:
+        _in_flight += 1
+
+def _record_response(response):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = request.endpoint or 'unmatched'
+    status = str(response.status_code)
+    sql_stats = g.get('sql_stats')
+    with _lock:
+        _inc('jira_http_requests_total', _labels(endpoint=endpoint, method=request.method, status=status))
+        _observe('jira_http_request_duration_seconds', _labels(endpoint=endpoint, status=status), elapsed)
+        if sql_stats is not None:
+            _inc('jira_http_request_db_seconds_total', _labels(endpoint=endpoint), sql_stats.duration)
+        _inc('jira_http_request_template_seconds_total', _labels(endpoint=endpoint), g.get('template_time', 0.0))
+        for template, seconds, sql_seconds in templating.template_timings():
+            _observe('jira_template_render_seconds', _labels(template=template), seconds)
+            if sql_seconds:
+                _inc('jira_template_sql_seconds_total', _labels(template=template), sql_seconds)
+    return response
+
+def _finish_request(exc):
+    global _in_flight
+    if not g.pop('metrics_in_flight', False):
+        return
+    with _lock:
+        _in_flight -= 1
+    if time.monotonic() - _last_flush >= current_app.config['METRICS_FLUSH_INTERVAL']:
+        try:
+            flush()
+        except OSError as e:
+            current_app.logger.warning('Could not write metrics: %s', e)
+
+@metrics_bp.route('/metrics')
+def metrics():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(401)
+    return Response(render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    app.before_request(_start_request)
+    app.after_request(_record_response)
+    app.teardown_request(_finish_request)
+    app.register_blueprint(metrics_bp)
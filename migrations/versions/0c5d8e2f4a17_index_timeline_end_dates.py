@@ -0,0 +1,31 @@
+"""Index project and ticket end dates for timeline windows
+
+Revision ID: 0c5d8e2f4a17
+Revises: e8b4c2d6f713
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0c5d8e2f4a17'
+down_revision = 'e8b4c2d6f713'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('project', schema=None) as batch_op:
+        batch_op.create_index('ix_project_deadline_start', ['deadline', 'start_date'], unique=False)
+
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.create_index('ix_ticket_end_start', ['end_date', 'start_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.drop_index('ix_ticket_end_start')
+
+    with op.batch_alter_table('project', schema=None) as batch_op:
+        batch_op.drop_index('ix_project_deadline_start')
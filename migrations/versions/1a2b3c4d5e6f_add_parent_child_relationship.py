@@ -12,14 +12,24 @@ import sqlalchemy as sa
 revision = '1a2b3c4d5e6f'
 down_revision = None
 branch_labels = None
-depends_on = None
+# The ticket table must exist first
+depends_on = '6224db2a63a5'
+
+def _has_parent_id():
+    columns = sa.inspect(op.get_bind()).get_columns('ticket')
+    return any(column['name'] == 'parent_id' for column in columns)
 
 def upgrade():
+    # update_schema.py (and db.create_all) may already have added the column
+    if _has_parent_id():
+        return
     # Add parent_id column to ticket table
-    op.add_column('ticket', sa.Column('parent_id', sa.Integer(), nullable=True))
-    op.create_foreign_key('fk_ticket_parent', 'ticket', 'ticket', ['parent_id'], ['id'])
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('parent_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_ticket_parent', 'ticket', ['parent_id'], ['id'])
 
 def downgrade():
     # Remove parent_id column from ticket table
-    op.drop_constraint('fk_ticket_parent', 'ticket', type_='foreignkey')
-    op.drop_column('ticket', 'parent_id')
\ No newline at end of file
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_ticket_parent', type_='foreignkey')
+        batch_op.drop_column('parent_id')
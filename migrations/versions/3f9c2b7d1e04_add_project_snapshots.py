@@ -0,0 +1,39 @@
+"""Add project snapshots and ticket status timestamps
+
+Revision ID: 3f9c2b7d1e04
+Revises: 80a904f5c532
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2b7d1e04'
+down_revision = '80a904f5c532'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('status_changed_at', sa.DateTime(), nullable=True))
+
+    op.create_table('project_snapshot',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('status', sa.String(length=50), nullable=False),
+        sa.Column('ticket_count', sa.Integer(), nullable=False),
+        sa.Column('avg_days_in_status', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['project_id'], ['project.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('project_id', 'day', 'status', name='uq_project_snapshot_day_status')
+    )
+
+
+def downgrade():
+    op.drop_table('project_snapshot')
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.drop_column('status_changed_at')
@@ -0,0 +1,35 @@
+"""Index project filter columns and ticket.project_id
+
+Revision ID: 5b8e1f0c7a21
+Revises: 3f9c2b7d1e04
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8e1f0c7a21'
+down_revision = '3f9c2b7d1e04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('project', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_project_team_lead_id'), ['team_lead_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_project_status'), ['status'], unique=False)
+        batch_op.create_index(batch_op.f('ix_project_team_id'), ['team_id'], unique=False)
+
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ticket_project_id'), ['project_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ticket_project_id'))
+
+    with op.batch_alter_table('project', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_project_team_id'))
+        batch_op.drop_index(batch_op.f('ix_project_status'))
+        batch_op.drop_index(batch_op.f('ix_project_team_lead_id'))
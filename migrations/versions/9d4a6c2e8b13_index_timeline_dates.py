@@ -0,0 +1,31 @@
+"""Index project and ticket dates for timeline windows
+
+Revision ID: 9d4a6c2e8b13
+Revises: 5b8e1f0c7a21
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4a6c2e8b13'
+down_revision = '5b8e1f0c7a21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('project', schema=None) as batch_op:
+        batch_op.create_index('ix_project_start_deadline', ['start_date', 'deadline'], unique=False)
+
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.create_index('ix_ticket_start_end', ['start_date', 'end_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.drop_index('ix_ticket_start_end')
+
+    with op.batch_alter_table('project', schema=None) as batch_op:
+        batch_op.drop_index('ix_project_start_deadline')
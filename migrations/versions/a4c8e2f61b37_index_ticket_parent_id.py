@@ -0,0 +1,26 @@
+"""Index ticket.parent_id
+
+Revision ID: a4c8e2f61b37
+Revises: f3a7d1c5e208
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c8e2f61b37'
+down_revision = 'f3a7d1c5e208'
+branch_labels = None
+# parent_id itself comes from the other branch
+depends_on = '1a2b3c4d5e6f'
+
+
+def upgrade():
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ticket_parent_id'), ['parent_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ticket_parent_id'))
@@ -0,0 +1,49 @@
+"""Add ticket archive table
+
+Revision ID: b6d2f0a9c351
+Revises: a4c8e2f61b37
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d2f0a9c351'
+down_revision = 'a4c8e2f61b37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ticket_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('description', sa.Text(), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('priority', sa.String(length=50), nullable=False),
+        sa.Column('assignee', sa.String(length=100), nullable=False),
+        sa.Column('status', sa.String(length=50), nullable=True),
+        sa.Column('public', sa.Boolean(), nullable=False),
+        sa.Column('project_id', sa.Integer(), nullable=True),
+        sa.Column('start_date', sa.Date(), nullable=True),
+        sa.Column('end_date', sa.Date(), nullable=True),
+        sa.Column('parent_id', sa.Integer(), nullable=True),
+        sa.Column('status_changed_at', sa.DateTime(), nullable=True),
+        sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['project_id'], ['project.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('ticket_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ticket_archive_project_id'), ['project_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_ticket_archive_archived_at'), ['archived_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ticket_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ticket_archive_archived_at'))
+        batch_op.drop_index(batch_op.f('ix_ticket_archive_project_id'))
+
+    op.drop_table('ticket_archive')
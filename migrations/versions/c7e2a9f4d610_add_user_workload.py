@@ -0,0 +1,67 @@
+"""Add assignee workload tables
+
+Revision ID: c7e2a9f4d610
+Revises: 9d4a6c2e8b13
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from collections import Counter
+from datetime import date, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e2a9f4d610'
+down_revision = '9d4a6c2e8b13'
+branch_labels = None
+depends_on = None
+
+MAX_WEEKS = 52
+
+
+def upgrade():
+    op.create_table('user_workload',
+        sa.Column('assignee', sa.String(length=100), nullable=False),
+        sa.Column('status', sa.String(length=50), nullable=False),
+        sa.Column('priority', sa.String(length=50), nullable=False),
+        sa.Column('ticket_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('assignee', 'status', 'priority')
+    )
+    user_week_load = op.create_table('user_week_load',
+        sa.Column('assignee', sa.String(length=100), nullable=False),
+        sa.Column('week', sa.Date(), nullable=False),
+        sa.Column('ticket_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('assignee', 'week')
+    )
+
+    # Backfill from the existing tickets (same rules as workload.rebuild)
+    conn = op.get_bind()
+    op.execute(
+        "INSERT INTO user_workload (assignee, status, priority, ticket_count) "
+        "SELECT assignee, COALESCE(status, 'To Do'), priority, COUNT(*) FROM ticket "
+        "GROUP BY assignee, COALESCE(status, 'To Do'), priority"
+    )
+    weeks = Counter()
+    rows = conn.execute(sa.text(
+        "SELECT assignee, start_date, end_date FROM ticket "
+        "WHERE COALESCE(status, 'To Do') != 'Done' AND (start_date IS NOT NULL OR end_date IS NOT NULL)"
+    ))
+    for assignee, start_date, end_date in rows:
+        start_date = date.fromisoformat(str(start_date or end_date))
+        end_date = date.fromisoformat(str(end_date or start_date))
+        week = start_date - timedelta(days=start_date.weekday())
+        for _ in range(MAX_WEEKS):
+            if week > end_date:
+                break
+            weeks[(assignee, week)] += 1
+            week += timedelta(days=7)
+    if weeks:
+        op.bulk_insert(user_week_load, [{'assignee': assignee, 'week': week, 'ticket_count': count}
+                                        for (assignee, week), count in weeks.items()])
+
+
+def downgrade():
+    op.drop_table('user_week_load')
+    op.drop_table('user_workload')
@@ -0,0 +1,26 @@
+"""Merge the parent_id branch into the main history
+
+Revision ID: d7a3e9b1c5f2
+Revises: b6d2f0a9c351, 1a2b3c4d5e6f
+Create Date: 2026-10-19 19:00:00.000000
+
+The parent_id migration was created with no parent, which left two heads;
+'flask db upgrade' refused to run and there was no single head to compare
+database backups against. This revision joins them.
+
+"""
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a3e9b1c5f2'
+down_revision = ('b6d2f0a9c351', '1a2b3c4d5e6f')
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    pass
+
+
+def downgrade():
+    pass
@@ -0,0 +1,35 @@
+"""Add backfill checkpoint table
+
+Revision ID: e8b4c2d6f713
+Revises: d7a3e9b1c5f2
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b4c2d6f713'
+down_revision = 'd7a3e9b1c5f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('backfill_checkpoint',
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('table_name', sa.String(length=100), nullable=False),
+        sa.Column('last_key', sa.Integer(), nullable=True),
+        sa.Column('end_key', sa.Integer(), nullable=True),
+        sa.Column('rows', sa.Integer(), nullable=False),
+        sa.Column('chunks', sa.Integer(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('backfill_checkpoint')
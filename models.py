@@ -23,16 +23,22 @@ class Project(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
     description = db.Column(db.Text, nullable=True)
-    team_lead_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    team_lead_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
     start_date = db.Column(db.Date, nullable=True)
     deadline = db.Column(db.Date, nullable=True)
-    status = db.Column(db.String(50), default='Active')
+    status = db.Column(db.String(50), default='Active', index=True)
     
-    team_id = db.Column(db.Integer, db.ForeignKey('team.id'), nullable=True)  # <-- ADD THIS
+    team_id = db.Column(db.Integer, db.ForeignKey('team.id'), nullable=True, index=True)  # <-- ADD THIS
     team = db.relationship('Team', backref='projects')  # <-- ADD THIS too
 
     team_lead = db.relationship('User', backref='leading_projects', foreign_keys=[team_lead_id])
 
+    __table_args__ = (
+        # Timeline overlap queries range-scan on the start date
+        db.Index('ix_project_start_deadline', 'start_date', 'deadline'),
+        # ... and projects started before a window and still running in it, by deadline
+        db.Index('ix_project_deadline_start', 'deadline', 'start_date'),
+    )
 
 class Ticket(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -43,13 +49,43 @@ class Ticket(db.Model):
     assignee = db.Column(db.String(100), nullable=False)
     status = db.Column(db.String(50), default='To Do')
     public = db.Column(db.Boolean, default=False, nullable=False)
-    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=True, index=True)
     start_date = db.Column(db.Date, nullable=True)
     end_date = db.Column(db.Date, nullable=True)
-    parent_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), nullable=True)
+    parent_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), nullable=True, index=True)
+    status_changed_at = db.Column(db.DateTime, nullable=True, default=db.func.current_timestamp())
+    # Bumped on every change; PATCH /api/ticket/<id> only applies when it still matches
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     children = db.relationship('Ticket', backref=db.backref('parent', remote_side=[id]), lazy='dynamic')
     project = db.relationship('Project', backref='tickets')
 
+    __table_args__ = (
+        # Timeline overlap queries range-scan on the start date
+        db.Index('ix_ticket_start_end', 'start_date', 'end_date'),
+        # ... and tickets started before a window and still running in it, by end date
+        db.Index('ix_ticket_end_start', 'end_date', 'start_date'),
+    )
+
+class TicketArchive(db.Model):
+    """A Done ticket moved out of ``ticket`` by archive.py: the same columns plus ``archived_at``."""
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    type = db.Column(db.String(50), nullable=False)
+    priority = db.Column(db.String(50), nullable=False)
+    assignee = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(50), default='To Do')
+    public = db.Column(db.Boolean, default=False, nullable=False)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=True, index=True)
+    start_date = db.Column(db.Date, nullable=True)
+    end_date = db.Column(db.Date, nullable=True)
+    # No foreign key: the parent may be archived or restored independently
+    parent_id = db.Column(db.Integer, nullable=True)
+    status_changed_at = db.Column(db.DateTime, nullable=True)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    archived_at = db.Column(db.DateTime, nullable=False, index=True)
+    project = db.relationship('Project')
+
 class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -59,3 +95,64 @@ class Notification(db.Model):
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     
     user = db.relationship('User', backref='notifications')
+
+class ProjectSnapshot(db.Model):
+    """Per-project ticket counts for one day and status, written by the snapshot job."""
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(50), nullable=False)
+    ticket_count = db.Column(db.Integer, nullable=False, default=0)
+    avg_days_in_status = db.Column(db.Float, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('project_id', 'day', 'status', name='uq_project_snapshot_day_status'),
+    )
+
+class UserWorkload(db.Model):
+    """Tickets per assignee, status and priority, kept current by workload.py."""
+    assignee = db.Column(db.String(100), primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    priority = db.Column(db.String(50), primary_key=True)
+    ticket_count = db.Column(db.Integer, nullable=False, default=0)
+
+class UserWeekLoad(db.Model):
+    """Open tickets per assignee whose dates overlap a week (keyed by its Monday)."""
+    assignee = db.Column(db.String(100), primary_key=True)
+    week = db.Column(db.Date, primary_key=True)
+    ticket_count = db.Column(db.Integer, nullable=False, default=0)
+
+class Job(db.Model):
+    """A unit of background work, claimed and run by 'flask worker' (see jobs.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    # Optional idempotency key: enqueueing the same key twice is a no-op
+    key = db.Column(db.String(200), unique=True, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+    )
+
+class BackfillCheckpoint(db.Model):
+    """Progress of a chunked data backfill run from a migration (see backfill.py)."""
+    name = db.Column(db.String(100), primary_key=True)
+    table_name = db.Column(db.String(100), nullable=False)
+    # Last key processed; the next chunk starts after it
+    last_key = db.Column(db.Integer, nullable=True)
+    # Highest key when the backfill started; rows added later are left alone
+    end_key = db.Column(db.Integer, nullable=True)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    chunks = db.Column(db.Integer, nullable=False, default=0)
+    started_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
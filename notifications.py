@@ -0,0 +1,114 @@
+from datetime import datetime
+
+from flask import Blueprint, render_template, redirect, url_for, flash, jsonify, abort, g
+from flask_login import login_required, current_user
+from sqlalchemy import insert
+
+import jobs
+from models import db, Notification, User
+
+notifications_bp = Blueprint('notifications', __name__)
+
+def notify(user_ids, message, link=None, key=None):
+    """Queue a notification for each user; written by the job worker once the caller commits."""
+    jobs.enqueue('notify', {'user_ids': list(user_ids), 'message': message, 'link': link}, key=key)
+
+def notify_team(team_id, message, link=None, exclude_user_id=None, key=None):
+    """Queue a notification for every approved member of a team."""
+    jobs.enqueue('notify_team', {'team_id': team_id, 'message': message, 'link': link,
+                                 'exclude_user_id': exclude_user_id}, key=key)
+
+@jobs.task('notify', batched=True)
+def _notify_job(payload):
+    _insert_notifications(payload['user_ids'], payload['message'], payload['link'])
+
+@jobs.task('notify_team', batched=True)
+def _notify_team_job(payload):
+    members = db.session.query(User.id).filter(User.team_id == payload['team_id'], User.approved == True)
+    user_ids = [user_id for (user_id,) in members if user_id != payload['exclude_user_id']]
+    _insert_notifications(user_ids, payload['message'], payload['link'])
+
+def _insert_notifications(user_ids, message, link):
+    if user_ids:
+        now = datetime.now()
+        db.session.execute(insert(Notification), [
+            {'user_id': user_id, 'message': message, 'link': link, 'read': False, 'created_at': now}
+            for user_id in user_ids
+        ])
+
+# Add notifications to all templates
+@notifications_bp.before_app_request
+def load_notifications():
+    if current_user.is_authenticated:
+        # Get recent notifications
+        notifications = Notification.query.filter_by(user_id=current_user.id).order_by(Notification.created_at.desc()).limit(5).all()
+        unread_count = Notification.query.filter_by(user_id=current_user.id, read=False).count()
+        
+        # Add to global context
+        g.notifications = notifications
+        g.unread_notifications_count = unread_count
+
+@notifications_bp.app_context_processor
+def inject_notifications():
+    # Make notifications available to all templates
+    if hasattr(g, 'notifications') and hasattr(g, 'unread_notifications_count'):
+        return {
+            'notifications': g.notifications,
+            'unread_notifications_count': g.unread_notifications_count
+        }
+    return {
+        'notifications': [],
+        'unread_notifications_count': 0
+    }
+
+@notifications_bp.route('/notifications')
+@login_required
+def notifications_page():
+    
+    # Get user's notifications, ordered by newest first
+    notifications = Notification.query.filter_by(user_id=current_user.id).order_by(Notification.created_at.desc()).all()
+    
+    return render_template('notifications.html', notifications=notifications)
+
+@notifications_bp.route('/notifications/mark_all_read')
+@login_required
+def mark_all_read():
+    
+    # Mark all user's notifications as read
+    notifications = Notification.query.filter_by(user_id=current_user.id, read=False).all()
+    for notification in notifications:
+        notification.read = True
+    
+    db.session.commit()
+    flash('All notifications marked as read')
+    
+    return redirect(url_for('notifications.notifications_page'))
+
+@notifications_bp.route('/notifications/<int:notification_id>/read')
+@login_required
+def mark_notification_read(notification_id):
+    
+    # Mark specific notification as read
+    notification = Notification.query.get_or_404(notification_id)
+    
+    # Ensure user can only mark their own notifications
+    if notification.user_id != current_user.id:
+        abort(403)
+    
+    notification.read = True
+    db.session.commit()
+    
+    return redirect(url_for('notifications.notifications_page'))
+
+@notifications_bp.route('/api/notifications/read', methods=['POST'])
+@login_required
+def api_mark_notifications_read():
+    
+    # Mark all user's notifications as read via API
+    notifications = Notification.query.filter_by(user_id=current_user.id, read=False).all()
+    for notification in notifications:
+        notification.read = True
+    
+    db.session.commit()
+    
+    return jsonify({"status": "success", "message": "All notifications marked as read"})
@@ -0,0 +1,274 @@
+"""
+Admin-triggered request profiling.
+
+An admin arms the profiler for the next N requests of a user and/or a
+route. The armed state lives in a small JSON file under PROFILES_DIR so
+every Gunicorn worker sees it; claiming a slot takes a file lock so the
+count is shared. Matching requests run under cProfile and tracemalloc and
+their pstats and allocation snapshots are written next to a metadata file
+holding the top functions and allocation sites. Saving a profile removes
+those beyond the newest ``PROFILES_KEEP`` and any older than
+``PROFILES_MAX_AGE_DAYS``.
+"""
+import cProfile
+import fcntl
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import Blueprint, abort, current_app, flash, g, redirect, render_template, request, send_from_directory, url_for
+from flask_login import current_user, login_required
+
+from models import User
+from rbac import role_required
+
+profiler_bp = Blueprint('profiler', __name__, url_prefix='/admin/profiles')
+
+ARMED_FILE = 'armed.json'
+PROFILE_EXTENSIONS = ('.json', '.pstats', '.tracemalloc')
+TOP_N = 15
+_armed_cache = {'mtime': None, 'state': None}
+# tracemalloc is process-wide: profiled requests on other threads share one trace
+_tracing_lock = threading.Lock()
+_tracing = {'requests': 0, 'started': False}
+
+
+def _profiles_dir():
+    return current_app.config['PROFILES_DIR']
+
+@contextmanager
+def _locked_state():
+    """Yield the armed state (or None) under an exclusive lock; assign
+    ``box['state']`` to change it."""
+    os.makedirs(_profiles_dir(), exist_ok=True)
+    path = os.path.join(_profiles_dir(), ARMED_FILE)
+    with open(os.path.join(_profiles_dir(), '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            state = None
+            if os.path.exists(path):
+                with open(path) as f:
+                    state = json.load(f)
+            box = {'state': state}
+            yield box
+            if box['state'] != state:
+                if box['state'] and box['state']['remaining'] > 0:
+                    with open(f'{path}.tmp', 'w') as f:
+                        json.dump(box['state'], f)
+                    os.replace(f'{path}.tmp', path)
+                elif os.path.exists(path):
+                    os.remove(path)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def armed_state():
+    """The armed state, re-read only when the file changes."""
+    path = os.path.join(_profiles_dir(), ARMED_FILE)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        _armed_cache.update(mtime=None, state=None)
+        return None
+    if mtime != _armed_cache['mtime']:
+        try:
+            with open(path) as f:
+                _armed_cache.update(mtime=mtime, state=json.load(f))
+        except (OSError, ValueError):
+            return None
+    return _armed_cache['state']
+
+def _matches(state):
+    if state['user_id'] and not (current_user.is_authenticated and current_user.id == state['user_id']):
+        return False
+    if state['route'] and not (request.endpoint == state['route'] or request.path.startswith(state['route'])):
+        return False
+    return True
+
+def _claim():
+    """Take one of the remaining slots; False if another worker got there first."""
+    with _locked_state() as box:
+        state = box['state']
+        if not state or state['remaining'] <= 0 or not _matches(state):
+            return False
+        box['state'] = dict(state, remaining=state['remaining'] - 1)
+        return True
+
+
+def _start_profiling():
+    state = armed_state()
+    if state is None or request.blueprint == 'profiler' or not _matches(state) or not _claim():
+        return
+    with _tracing_lock:
+        if _tracing['requests'] == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            _tracing['started'] = True
+        elif _tracing['requests'] == 0:
+            _tracing['started'] = False  # Someone else traces; leave it running
+        _tracing['requests'] += 1
+    g.profile_started_at = time.perf_counter()
+    g.profiler = cProfile.Profile()
+    g.profiler.enable()
+
+def _remember_status(response):
+    if 'profiler' in g:
+        g.profile_status = response.status_code
+    return response
+
+def _stop_profiling(exc):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return
+    profiler.disable()
+    elapsed = time.perf_counter() - g.profile_started_at
+    with _tracing_lock:
+        snapshot = tracemalloc.take_snapshot()
+        _tracing['requests'] -= 1
+        # The last profiled request stops tracing, if profiling started it
+        if _tracing['requests'] == 0 and _tracing['started']:
+            tracemalloc.stop()
+    try:
+        _save_profile(profiler, snapshot, elapsed, exc)
+    except OSError as e:
+        current_app.logger.warning('Could not save profile: %s', e)
+
+def _short_path(filename):
+    if filename.startswith(current_app.root_path):
+        return os.path.relpath(filename, current_app.root_path)
+    return filename.split('site-packages/')[-1]
+
+def _save_profile(profiler, snapshot, elapsed, exc):
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    endpoint = re.sub(r'[^A-Za-z0-9_.-]', '_', request.endpoint or 'unmatched')
+    name = f'{stamp}-{os.getpid()}-{endpoint}'
+    directory = _profiles_dir()
+    profiler.dump_stats(os.path.join(directory, f'{name}.pstats'))
+    snapshot.dump(os.path.join(directory, f'{name}.tracemalloc'))
+
+    stats = pstats.Stats(profiler)
+    stats.sort_stats('cumulative')
+    functions = []
+    for func in stats.fcn_list[:TOP_N]:
+        calls, primitive, total, cumulative, _ = stats.stats[func]
+        filename, line, function = func
+        functions.append({'function': f'{_short_path(filename) if filename != "~" else ""}:{line}({function})',
+                          'calls': calls, 'total_ms': total * 1000, 'cumulative_ms': cumulative * 1000})
+    allocations = []
+    for stat in snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)]).statistics('lineno')[:TOP_N]:
+        frame = stat.traceback[0]
+        allocations.append({'site': f'{_short_path(frame.filename)}:{frame.lineno}',
+                            'size_kb': stat.size / 1024, 'count': stat.count})
+
+    meta = {
+        'name': name,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'endpoint': request.endpoint,
+        'user': current_user.email if current_user.is_authenticated else None,
+        'status': g.get('profile_status', 500 if exc else None),
+        'duration_ms': elapsed * 1000,
+        'functions': functions,
+        'allocations': allocations,
+    }
+    path = os.path.join(directory, f'{name}.json')
+    # Replaced whole, so list_profiles() never reads half a file
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(meta, f)
+    os.replace(f'{path}.tmp', path)
+    _prune(directory)
+
+def _prune(directory):
+    """Remove the profiles beyond the newest PROFILES_KEEP or older than PROFILES_MAX_AGE_DAYS."""
+    names = {}
+    for filename in os.listdir(directory):
+        name, extension = os.path.splitext(filename)
+        if extension in PROFILE_EXTENSIONS and filename != ARMED_FILE:
+            names.setdefault(name, []).append(filename)
+    cutoff = time.time() - current_app.config['PROFILES_MAX_AGE_DAYS'] * 86400
+    # Names start with their timestamp, so they sort oldest first
+    ordered = sorted(names)
+    for position, name in enumerate(ordered):
+        paths = [os.path.join(directory, filename) for filename in names[name]]
+        try:
+            expired = max(os.path.getmtime(path) for path in paths) < cutoff
+        except FileNotFoundError:
+            continue  # pruned by another worker meanwhile
+        if expired or position < len(ordered) - current_app.config['PROFILES_KEEP']:
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+def list_profiles():
+    directory = _profiles_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for filename in sorted(os.listdir(directory), reverse=True):
+        if filename.endswith('.json') and filename != ARMED_FILE:
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # pruned meanwhile
+    return profiles
+
+
+@profiler_bp.route('/')
+@login_required
+@role_required('admin')
+def profiles():
+    return render_template('profiles.html', profiles=list_profiles(), armed=armed_state())
+
+@profiler_bp.route('/arm', methods=['POST'])
+@login_required
+@role_required('admin')
+def arm():
+    email = request.form.get('user_email', '').strip()
+    route = request.form.get('route', '').strip()
+    count = request.form.get('count', type=int) or 1
+    user = None
+    if email:
+        user = User.query.filter_by(email=email).first()
+        if not user:
+            flash(f'No user with email {email}')
+            return redirect(url_for('profiler.profiles'))
+    if not user and not route:
+        flash('Choose a user, a route or both to profile.')
+        return redirect(url_for('profiler.profiles'))
+    with _locked_state() as box:
+        box['state'] = {'user_id': user.id if user else None, 'user_email': email or None,
+                        'route': route or None, 'remaining': min(count, 100)}
+    flash(f'Profiling the next {min(count, 100)} matching requests.')
+    return redirect(url_for('profiler.profiles'))
+
+@profiler_bp.route('/disarm', methods=['POST'])
+@login_required
+@role_required('admin')
+def disarm():
+    with _locked_state() as box:
+        box['state'] = None
+    flash('Profiling stopped.')
+    return redirect(url_for('profiler.profiles'))
+
+@profiler_bp.route('/<name>.<any(pstats, tracemalloc):kind>')
+@login_required
+@role_required('admin')
+def download(name, kind):
+    if not re.fullmatch(r'[A-Za-z0-9_.-]+', name):
+        abort(404)
+    return send_from_directory(_profiles_dir(), f'{name}.{kind}', as_attachment=True)
+
+
+def init_app(app):
+    app.before_request(_start_profiling)
+    app.after_request(_remember_status)
+    app.teardown_request(_stop_profiling)
+    app.register_blueprint(profiler_bp)
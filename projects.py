@@ -0,0 +1,253 @@
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
+from flask_login import login_required, current_user
+
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.orm import joinedload
+
+import refdata
+from models import db, Project, Ticket, User, Team
+from rbac import can_see_project, visible_projects_clause, visible_tickets_clause
+from snapshots import burndown
+
+projects_bp = Blueprint('projects', __name__)
+
+PROJECTS_PER_PAGE = 30
+# Largest window and item count one /api/timeline call returns
+TIMELINE_MAX_DAYS = 366 * 2
+TIMELINE_MAX_ITEMS = 2000
+
+@projects_bp.route('/projects', strict_slashes=False)
+@login_required
+def projects_page():
+    
+    # Get filter parameters
+    selected_lead_id = request.args.get('team_lead', type=int)
+    selected_status = request.args.get('status')
+    selected_team_id = request.args.get('team_id', type=int)
+    search_query = request.args.get('search', '').strip()
+    
+    # Projects visible to the current user
+    visible = Project.query
+    if current_user.role == 'manager':
+        # Managers can only see projects where they are the team lead
+        visible = visible.filter(Project.team_lead_id == current_user.id)
+    elif current_user.role == 'developer':
+        # Developers can see projects for their team
+        visible = visible.filter(Project.team_id == current_user.team_id)
+    # Admins and visitors can see all projects
+    
+    filtered = visible
+    if selected_lead_id:
+        filtered = filtered.filter(Project.team_lead_id == selected_lead_id)
+    if selected_status:
+        filtered = filtered.filter(Project.status == selected_status)
+    if selected_team_id:
+        filtered = filtered.filter(Project.team_id == selected_team_id)
+    if search_query:
+        filtered = filtered.filter(or_(Project.name.icontains(search_query, autoescape=True),
+                                       Project.description.icontains(search_query, autoescape=True)))
+    
+    projects = (filtered
+                .options(joinedload(Project.team_lead), joinedload(Project.team))
+                .order_by(Project.name)
+                .paginate(page=request.args.get('page', 1, type=int), per_page=PROJECTS_PER_PAGE, error_out=False))
+    
+    # Open/done ticket counts for the projects on this page in one aggregate
+    counts = {}
+    if projects.items:
+        counts = {project_id: (open_count, done_count) for project_id, open_count, done_count in
+                  db.session.query(Ticket.project_id,
+                                   func.sum(case((Ticket.status == 'Done', 0), else_=1)),
+                                   func.sum(case((Ticket.status == 'Done', 1), else_=0)))
+                  .filter(Ticket.project_id.in_([project.id for project in projects.items]))
+                  .group_by(Ticket.project_id)}
+    rows = [(project,) + counts.get(project.id, (0, 0)) for project in projects.items]
+    
+    # Get data for filter dropdowns from the visible projects only
+    team_leads = (User.query.filter(User.id.in_(visible.with_entities(Project.team_lead_id)))
+                  .order_by(User.name).all())
+    statuses = [status for (status,) in visible.with_entities(Project.status).filter(Project.status.isnot(None))
+                .distinct().order_by(Project.status)]
+    teams = Team.query.filter(Team.id.in_(visible.with_entities(Project.team_id))).order_by(Team.name).all()
+    
+    # Filters to keep when moving between pages
+    filter_args = {key: value for key, value in request.args.items() if key != 'page' and value}
+    
+    return render_template('projects.html', 
+                          projects=projects, 
+                          rows=rows,
+                          filter_args=filter_args,
+                          team_leads=team_leads, 
+                          selected_lead_id=selected_lead_id,
+                          statuses=statuses,
+                          selected_status=selected_status,
+                          teams=teams,
+                          selected_team_id=selected_team_id,
+                          search_query=search_query,
+                          now=datetime.now)
+
+@projects_bp.route('/create_project', methods=['GET', 'POST'])
+@login_required
+def create_project():
+    
+    # Only admin and manager can create projects
+    if current_user.role not in ['admin', 'manager']:
+        abort(403)
+    if request.method == 'POST':
+        name = request.form.get('name')
+        description = request.form.get('description')
+        team_lead_id = request.form.get('team_lead')
+        team_id = request.form.get('team_id')
+        start_date = request.form.get('start_date')
+        deadline = request.form.get('deadline')
+        status = request.form.get('status', 'Active')
+        
+        if not (name and team_lead_id and team_id and start_date and deadline):
+            flash('Please fill in all required fields.')
+            return redirect(url_for('projects.create_project'))
+            
+        # Validate team_id
+        team = Team.query.get(int(team_id))
+        if not team:
+            flash('Selected team does not exist.')
+            return redirect(url_for('projects.create_project'))
+        
+        # Check for existing project with same name
+        existing_project = Project.query.filter_by(name=name).first()
+        if existing_project:
+            flash('Project with this name already exists.')
+            return redirect(url_for('projects.create_project'))
+        
+        # Create new project
+        new_project = Project(
+            name=name,
+            description=description,
+            team_lead_id=int(team_lead_id),
+            start_date=datetime.strptime(start_date, '%Y-%m-%d').date(),
+            deadline=datetime.strptime(deadline, '%Y-%m-%d').date(),
+            status=status,
+            team_id=int(team_id)
+        )
+        
+        db.session.add(new_project)
+        db.session.commit()
+        refdata.invalidate('projects')
+        flash('Project created successfully!')
+        return redirect(url_for('projects.projects_page'))
+    
+    # Get all teams and team leads for dropdowns
+    teams = refdata.teams()
+    team_leads = refdata.users(role='manager')
+    
+    return render_template('create_project.html', team_leads=team_leads, teams=teams)
+
+@projects_bp.route('/timeline')
+@login_required
+def timeline_page():
+    # Items are fetched window by window from /api/timeline
+    teams = Team.query.order_by(Team.name).all()
+    return render_template('timeline.html', teams=teams)
+
+def _overlaps(start_col, end_col, window_start, window_end):
+    """Intervals intersecting [window_start, window_end]; a missing bound is open-ended.
+    
+    Written as disjoint legs that each range-scan one of the (start, end)
+    and (end, start) indexes, so the lookup is bounded by the window rather
+    than by how far back the table goes.
+    """
+    return or_(
+        # Starts inside the window
+        and_(start_col >= window_start, start_col <= window_end, or_(end_col.is_(None), end_col >= window_start)),
+        # Started before it and is still running at its start
+        and_(end_col >= window_start, start_col < window_start),
+        and_(end_col >= window_start, start_col.is_(None)),
+        and_(end_col.is_(None), start_col < window_start),
+    )
+
+def _window_order(start_col, id_col, window_start):
+    """Items starting inside the window first, then those carried into it, latest first;
+    a truncated result so drops the oldest long-running items rather than the window's own."""
+    inside = start_col >= window_start
+    return case((inside, 0), else_=1), case((inside, start_col)), start_col.desc(), id_col
+
+def _chronological(rows, start):
+    return sorted(rows, key=lambda row: (start(row) or date.min, row.id))
+
+@projects_bp.route('/api/timeline')
+@login_required
+def api_timeline():
+    try:
+        window_start = date.fromisoformat(request.args['start']) if request.args.get('start') else date.today() - timedelta(days=30)
+        window_end = date.fromisoformat(request.args['end']) if request.args.get('end') else window_start + timedelta(days=120)
+    except ValueError:
+        return jsonify({"status": "error", "message": "start and end must be YYYY-MM-DD"}), 400
+    if window_end < window_start or (window_end - window_start).days > TIMELINE_MAX_DAYS:
+        return jsonify({"status": "error", "message": f"Window must be 0-{TIMELINE_MAX_DAYS} days"}), 400
+    team_id = request.args.get('team_id', type=int)
+    project_id = request.args.get('project_id', type=int)
+    
+    projects = (Project.query
+                .filter(visible_projects_clause(current_user),
+                        _overlaps(Project.start_date, Project.deadline, window_start, window_end)))
+    if team_id:
+        projects = projects.filter(Project.team_id == team_id)
+    if project_id:
+        projects = projects.filter(Project.id == project_id)
+    projects = (projects.order_by(*_window_order(Project.start_date, Project.id, window_start))
+                .limit(TIMELINE_MAX_ITEMS + 1).all())
+    
+    tickets = []
+    if request.args.get('tickets', '1') != '0':
+        tickets = (Ticket.query
+                   .filter(visible_tickets_clause(current_user),
+                           _overlaps(Ticket.start_date, Ticket.end_date, window_start, window_end)))
+        if team_id:
+            tickets = tickets.filter(Ticket.project_id.in_(db.session.query(Project.id).filter(Project.team_id == team_id)))
+        if project_id:
+            tickets = tickets.filter(Ticket.project_id == project_id)
+        # Plain rows rather than entities: a window can hold thousands of tickets
+        tickets = (tickets.with_entities(Ticket.id, Ticket.title, Ticket.type, Ticket.status, Ticket.assignee,
+                                         Ticket.project_id, Ticket.parent_id, Ticket.start_date, Ticket.end_date)
+                   .order_by(*_window_order(Ticket.start_date, Ticket.id, window_start))
+                   .limit(TIMELINE_MAX_ITEMS + 1).all())
+    
+    def iso(value):
+        return value.isoformat() if value else None
+    
+    return jsonify({
+        "start": window_start.isoformat(),
+        "end": window_end.isoformat(),
+        "truncated": len(projects) > TIMELINE_MAX_ITEMS or len(tickets) > TIMELINE_MAX_ITEMS,
+        "projects": [{
+            "id": project.id,
+            "name": project.name,
+            "team_id": project.team_id,
+            "start_date": iso(project.start_date),
+            "deadline": iso(project.deadline),
+            "status": project.status
+        } for project in _chronological(projects[:TIMELINE_MAX_ITEMS], lambda project: project.start_date)],
+        "tickets": [{
+            "id": ticket.id,
+            "title": ticket.title,
+            "type": ticket.type,
+            "status": ticket.status,
+            "assignee": ticket.assignee,
+            "project_id": ticket.project_id,
+            "parent_id": ticket.parent_id,
+            "start_date": iso(ticket.start_date),
+            "end_date": iso(ticket.end_date)
+        } for ticket in _chronological(tickets[:TIMELINE_MAX_ITEMS], lambda ticket: ticket.start_date)],
+    })
+
+@projects_bp.route('/api/project/<int:project_id>/burndown')
+@login_required
+def api_project_burndown(project_id):
+    project = Project.query.get_or_404(project_id)
+    if not can_see_project(project, current_user):
+        return jsonify({"status": "error", "message": "Permission denied"}), 403
+    
+    # Served from the nightly snapshot rows, so the cost does not depend on the ticket count
+    days = min(request.args.get('days', 30, type=int), 180)
+    return jsonify(burndown(project.id, days))
@@ -0,0 +1,235 @@
+"""
+Bulk user provisioning.
+
+``provision()`` creates users from rows parsed out of a CSV or NDJSON
+upload (name, email, role and optionally team and password). Teams are
+resolved and emails are checked against existing users with one ``IN``
+query each, passwords are hashed on a process pool, and the users are
+inserted ``PROVISION_CHUNK_SIZE`` at a time, one transaction per chunk.
+Rows without a password get a random one, which is returned so it can be
+handed out. ``flask provision-users`` calls it directly; ``POST
+/admin/provision`` only validates the upload (``prepare()``) and leaves
+the hashing and inserting to the ``provision_users`` job. Plain passwords
+never go into the database: the validated rows wait in a private spool
+file under ``PROVISION_SPOOL_DIR``, the job's payload only names it, and
+the job's first step replaces the passwords there with their hashes. The
+file is removed once the job is done or has failed for good.
+"""
+import csv
+import io
+import json
+import multiprocessing
+import os
+import secrets
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy.dialects import postgresql, sqlite
+from werkzeug.security import generate_password_hash
+
+import jobs
+import rosters
+from models import db, User, Team
+
+ROLES = ('admin', 'manager', 'developer', 'visitor')
+FIELDS = ('name', 'email', 'role', 'team', 'password')
+# Fewer passwords than this are hashed in-process; starting a pool costs more
+POOL_THRESHOLD = 8
+
+
+def format_for(filename=None, mimetype=None):
+    """Guess 'csv' or 'ndjson' from a file name or content type."""
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')) or mimetype in ('application/x-ndjson', 'application/jsonl'):
+        return 'ndjson'
+    if name.endswith('.csv') or mimetype == 'text/csv':
+        return 'csv'
+    return None
+
+def parse(text, fmt):
+    """``(line number, row)`` pairs of a CSV (with a header row) or NDJSON document."""
+    if fmt == 'csv':
+        reader = csv.DictReader(io.StringIO(text))
+        return [(reader.line_num, row) for row in reader]
+    if fmt == 'ndjson':
+        rows = []
+        for line_no, line in enumerate(text.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                rows.append((line_no, json.loads(line)))
+            except ValueError:
+                raise ValueError(f'Line {line_no}: invalid JSON')
+        return rows
+    raise ValueError('Unknown format; expected csv or ndjson')
+
+def _validate(rows, teams):
+    """Split rows into user dicts and ``{'line', 'email', 'error'}`` entries."""
+    users, errors, seen = [], [], set()
+    for line, row in rows:
+        if not isinstance(row, dict):
+            errors.append({'line': line, 'email': None, 'error': 'Expected an object'})
+            continue
+        row = {field: str(row.get(field) or '').strip() for field in FIELDS}
+        role = row['role'].lower()
+        error = None
+        if not row['name'] or not row['email']:
+            error = 'name and email are required'
+        elif '@' not in row['email']:
+            error = 'Invalid email'
+        elif role not in ROLES:
+            error = f"Unknown role {row['role']!r}"
+        elif row['email'] in seen:
+            error = 'Duplicate email in this file'
+        elif row['team'] and role != 'visitor' and row['team'] not in teams:
+            error = f"Unknown team {row['team']!r}"
+        if error:
+            errors.append({'line': line, 'email': row['email'] or None, 'error': error})
+            continue
+        seen.add(row['email'])
+        # Like self-registration, visitors never belong to a team
+        team_id = teams.get(row['team']) if role != 'visitor' else None
+        users.append({'name': row['name'], 'email': row['email'], 'role': role,
+                      'team_id': team_id, 'password': row['password']})
+    return users, errors
+
+def hash_passwords(passwords, workers=None):
+    """Hash with werkzeug's default method, spread over a process pool."""
+    workers = workers or current_app.config['PROVISION_HASH_WORKERS'] or os.cpu_count() or 1
+    if workers == 1 or len(passwords) < POOL_THRESHOLD:
+        return [generate_password_hash(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    # Spawned, not forked: the caller may be a threaded worker holding
+    # database connections and locks the children must not inherit
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return list(pool.map(generate_password_hash, passwords, chunksize=chunksize))
+
+def prepare(rows, approved=True):
+    """Validate ``parse()`` output and give rows without a password one.
+    Returns the users to create (plain passwords) and the emails skipped
+    because they already exist, row errors and the generated passwords."""
+    team_names = {str(row.get('team') or '').strip() for _, row in rows if isinstance(row, dict)} - {''}
+    teams = dict(db.session.query(Team.name, Team.id).filter(Team.name.in_(team_names))) if team_names else {}
+    users, errors = _validate(rows, teams)
+
+    emails = [user['email'] for user in users]
+    existing = {email for (email,) in db.session.query(User.email).filter(User.email.in_(emails))} if emails else set()
+    users = [user for user in users if user['email'] not in existing]
+
+    generated = []
+    for user in users:
+        user['approved'] = approved
+        if not user['password']:
+            user['password'] = secrets.token_urlsafe(12)
+            generated.append({'email': user['email'], 'password': user['password']})
+    return users, {'skipped': sorted(existing), 'errors': errors, 'generated_passwords': generated}
+
+def create(users, workers=None, commit=True, hashed=False):
+    """Hash the passwords of ``prepare()``-d users (unless ``hashed``) and
+    insert them; returns how many were inserted."""
+    if not hashed:
+        hashes = hash_passwords([user['password'] for user in users], workers)
+        users = [dict(user, password=password) for user, password in zip(users, hashes)]
+
+    dialect = postgresql if db.session.get_bind().dialect.name == 'postgresql' else sqlite
+    # A concurrent registration may have taken an email since the check in
+    # prepare(); those rows are skipped and not counted
+    stmt = dialect.insert(User).on_conflict_do_nothing(index_elements=['email'])
+    chunk_size = current_app.config['PROVISION_CHUNK_SIZE']
+    created = 0
+    for start in range(0, len(users), chunk_size):
+        created += db.session.connection().execute(stmt, users[start:start + chunk_size]).rowcount
+        if commit:
+            db.session.commit()
+    if created:
+        rosters.invalidate()
+    return created
+
+def provision(rows, approved=True, workers=None):
+    """Create users from ``parse()`` output. Returns the number created, the
+    emails skipped because they already exist, row errors, and the
+    passwords generated for rows that had none."""
+    users, result = prepare(rows, approved)
+    return {'created': create(users, workers), **result}
+
+def _spool_path(name):
+    return os.path.join(current_app.config['PROVISION_SPOOL_DIR'], f'{name}.json')
+
+def _write_spool(path, users, hashed):
+    scratch = f'{path}.{os.getpid()}'
+    # Readable by the app's user only, and swapped in whole
+    fd = os.open(scratch, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'hashed': hashed, 'users': users}, f)
+    os.replace(scratch, path)
+
+def enqueue(users):
+    """Queue ``prepare()``-d users for the ``provision_users`` job, which
+    runs once the caller commits; returns the spool name."""
+    name = uuid.uuid4().hex
+    os.makedirs(current_app.config['PROVISION_SPOOL_DIR'], mode=0o700, exist_ok=True)
+    _write_spool(_spool_path(name), users, hashed=False)
+    jobs.enqueue('provision_users', {'spool': name}, key=f'provision:{name}')
+    return name
+
+def discard(name):
+    """Remove a spool file, e.g. when the request that wrote it did not commit."""
+    try:
+        os.remove(_spool_path(name))
+    except FileNotFoundError:
+        pass
+
+def _spool_finished(payload, status):
+    discard(payload['spool'])
+
+
+@jobs.task('provision_users', on_finish=_spool_finished)
+def _provision_job(payload):
+    path = _spool_path(payload['spool'])
+    try:
+        with open(path) as f:
+            spool = json.load(f)
+    except FileNotFoundError:
+        raise LookupError('The upload is no longer available; upload the file again') from None
+    if not spool['hashed']:
+        # First step: from here on a retry works from the hashes, and no plain password is left on disk
+        hashes = hash_passwords([user['password'] for user in spool['users']])
+        spool['users'] = [dict(user, password=password) for user, password in zip(spool['users'], hashes)]
+        _write_spool(path, spool['users'], hashed=True)
+    created = create(spool['users'], commit=False, hashed=True)
+    current_app.logger.info('Provisioned %d of %d users from upload %s', created, len(spool['users']), payload['spool'])
+
+
+@click.command('provision-users')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Default: from the file extension.')
+@click.option('--pending', is_flag=True, help='Leave the new accounts waiting for approval.')
+@click.option('--workers', type=int, help='Hashing processes (default PROVISION_HASH_WORKERS or one per CPU).')
+@click.option('--passwords-out', type=click.Path(dir_okay=False),
+              help='Write generated passwords to this CSV file.')
+@with_appcontext
+def provision_users_command(path, fmt, pending, workers, passwords_out):
+    """Create users in bulk from a CSV or NDJSON file."""
+    fmt = fmt or format_for(path)
+    if fmt is None:
+        raise click.UsageError('Cannot tell the format from the file name; pass --format.')
+    with open(path, encoding='utf-8-sig') as f:
+        try:
+            rows = parse(f.read(), fmt)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    if not passwords_out and any(isinstance(row, dict) and not row.get('password') for _, row in rows):
+        raise click.UsageError('Some rows have no password; pass --passwords-out to save the generated ones.')
+    result = provision(rows, approved=not pending, workers=workers)
+    for error in result['errors']:
+        click.echo(f"Line {error['line']}: {error['error']}", err=True)
+    if result['generated_passwords']:
+        with open(passwords_out, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['email', 'password'])
+            writer.writeheader()
+            writer.writerows(result['generated_passwords'])
+    click.echo(f"Created {result['created']} users, skipped {len(result['skipped'])} existing, "
+               f"{len(result['errors'])} rows with errors.")
@@ -0,0 +1,195 @@
+"""
+Pre-rendered snapshots of the public board for visitors.
+
+Visitors see every public ticket and nothing else, so their board is the
+same page for all of them. The ``public_snapshot`` job renders it once,
+together with a JSON list of the public tickets, and writes both
+gzip-compressed to ``PUBLIC_SNAPSHOT_DIR``. Visitor requests are then
+answered from those files without querying tickets; the
+``X-Snapshot-Age`` header (and ``Last-Modified``) says how old the copy
+is.
+
+Code that changes a public ticket calls ``changed()`` before committing.
+It enqueues the job keyed on the current ``PUBLIC_SNAPSHOT_DEBOUNCE``
+window and due at the window's end, so a burst of writes costs one
+render. Until the first snapshot exists visitors get the live page, and
+the job is queued for them.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import click
+import sqlalchemy as sa
+from flask import Blueprint, current_app, jsonify, render_template, request
+from flask.cli import with_appcontext
+from flask_login import login_required
+from sqlalchemy.orm import joinedload
+
+import jobs
+from models import db, Ticket
+from rbac import role_required
+
+public_board_bp = Blueprint('public_board', __name__)
+
+BOARD_FILE = 'board.html.gz'
+TICKETS_FILE = 'tickets.json.gz'
+STATUSES = ('To Do', 'In Progress', 'In Review', 'Done')
+
+_lock = threading.Lock()
+_files = {}
+
+
+def changed():
+    """From a request changing a public ticket, before it commits: refresh the snapshot soon."""
+    debounce = current_app.config['PUBLIC_SNAPSHOT_DEBOUNCE']
+    now = time.time()
+    window = int(now // debounce)
+    jobs.enqueue('public_snapshot', key=f'public-snapshot:{window}', delay=(window + 1) * debounce - now)
+
+def _public_tickets():
+    return (Ticket.query.options(joinedload(Ticket.parent))
+            .filter(Ticket.public == True)
+            .order_by(Ticket.id)
+            .all())
+
+def _by_status(tickets, status=lambda ticket: ticket.status):
+    grouped = {name: [] for name in STATUSES}
+    for ticket in tickets:
+        grouped.setdefault(status(ticket), []).append(ticket)
+    return grouped
+
+def _listing(tickets):
+    return [{
+        'id': ticket.id,
+        'title': ticket.title,
+        'type': ticket.type,
+        'priority': ticket.priority,
+        'status': ticket.status,
+        'assignee': ticket.assignee,
+        'project_id': ticket.project_id,
+        'parent_id': ticket.parent_id,
+        'start_date': ticket.start_date.isoformat() if ticket.start_date else None,
+        'end_date': ticket.end_date.isoformat() if ticket.end_date else None,
+    } for ticket in tickets]
+
+def _write(name, data):
+    directory = current_app.config['PUBLIC_SNAPSHOT_DIR']
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    scratch = f'{path}.{os.getpid()}'
+    with open(scratch, 'wb') as f:
+        f.write(gzip.compress(data, mtime=0))
+    # Readers see the old file or the new one, never half of one
+    os.replace(scratch, path)
+
+def write_snapshot():
+    """Render the public board and ticket list to PUBLIC_SNAPSHOT_DIR; returns the ticket count."""
+    from tickets import MAX_CHILDREN_PARENTS
+    tickets = _public_tickets()
+    # What child_counts() gives a visitor
+    child_counts = dict(db.session.query(Ticket.parent_id, sa.func.count(Ticket.id))
+                        .filter(Ticket.parent_id.isnot(None), Ticket.public == True)
+                        .group_by(Ticket.parent_id)
+                        .all())
+    board = render_template('board.html', tickets=_by_status(tickets), child_counts=child_counts,
+                            max_children_parents=MAX_CHILDREN_PARENTS)
+    listing = {'generated_at': datetime.now().isoformat(timespec='seconds'), 'tickets': _listing(tickets)}
+    _write(TICKETS_FILE, json.dumps(listing).encode())
+    _write(BOARD_FILE, board.encode())
+    return len(tickets)
+
+def discard():
+    """Remove the snapshots, e.g. after restoring another database; visitors get live pages until the next one."""
+    for name in (BOARD_FILE, TICKETS_FILE):
+        try:
+            os.remove(os.path.join(current_app.config['PUBLIC_SNAPSHOT_DIR'], name))
+        except FileNotFoundError:
+            pass
+
+def _load(name):
+    """``(mtime, compressed bytes, etag)`` of a snapshot file, cached per process until it changes."""
+    path = os.path.join(current_app.config['PUBLIC_SNAPSHOT_DIR'], name)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _lock:
+        cached = _files.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path, 'rb') as f:
+                data = f.read()
+            cached = _files[path] = (mtime, data, hashlib.md5(data).hexdigest())
+        return cached
+
+def _missing():
+    # First visitor since the snapshots were discarded; the live page serves meanwhile
+    changed()
+    db.session.commit()
+    return None
+
+def send(name, mimetype):
+    """A response with snapshot ``name``, or None when there is none yet."""
+    snapshot = _load(name)
+    if snapshot is None:
+        return _missing()
+    mtime, data, etag = snapshot
+    compressed = bool(request.accept_encodings['gzip'])
+    response = current_app.response_class(data if compressed else gzip.decompress(data), mimetype=mimetype)
+    if compressed:
+        # Already compressed; http_cache leaves responses with an encoding alone
+        response.headers['Content-Encoding'] = 'gzip'
+        etag = f'{etag}-gzip'
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.last_modified = mtime / 1e9
+    response.headers['X-Snapshot-Age'] = str(max(0, int(time.time() - mtime / 1e9)))
+    return response.make_conditional(request)
+
+def board_response():
+    return send(BOARD_FILE, 'text/html')
+
+def tickets_by_status():
+    """Public tickets from the snapshot, grouped by status as the board does, or None."""
+    snapshot = _load(TICKETS_FILE)
+    if snapshot is None:
+        return _missing()
+    with _lock:
+        cached = _files.get('by_status')
+        if cached is None or cached[0] != snapshot[0]:
+            tickets = json.loads(gzip.decompress(snapshot[1]))['tickets']
+            cached = _files['by_status'] = (snapshot[0], _by_status(tickets, lambda ticket: ticket['status']))
+        return cached[1]
+
+
+@jobs.task('public_snapshot')
+def _snapshot_job(payload):
+    write_snapshot()
+
+
+@click.command('public-snapshot')
+@with_appcontext
+def public_snapshot_command():
+    """Render the public board snapshot now."""
+    count = write_snapshot()
+    click.echo(f'Public board snapshot written with {count} tickets to {current_app.config["PUBLIC_SNAPSHOT_DIR"]}.')
+
+
+@public_board_bp.route('/api/tickets/public')
+@login_required
+@role_required('admin', 'manager', 'visitor')
+def api_public_tickets():
+    """Every public ticket, from the latest snapshot: {"generated_at": ..., "tickets": [...]}.
+
+    Developers only see public tickets of their own team's projects, so they are not offered the full list.
+    """
+    response = send(TICKETS_FILE, 'application/json')
+    if response is None:
+        return jsonify({'generated_at': None, 'tickets': _listing(_public_tickets())})
+    return response
@@ -0,0 +1,132 @@
+"""
+Per-request SQL statement counting and N+1 detection.
+
+Every statement executed while handling a request is counted and timed.
+Statements are grouped by shape (whitespace collapsed, literals and
+``IN (...)`` lists folded) and any shape repeated at least
+``SQL_N_PLUS_ONE_THRESHOLD`` times is flagged as a probable N+1 pattern.
+Totals are sent back in the ``X-SQL-Queries`` and ``X-SQL-Time-ms``
+headers and the most recent requests are kept for the admin debug panel.
+"""
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import templating
+
+_listeners_installed = False
+_recent = deque(maxlen=100)
+_recent_lock = threading.Lock()
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a view runs more statements than its budget allows."""
+
+
+def statement_shape(statement):
+    """Normalise a SQL statement so repeated queries compare equal."""
+    shape = _STRING_LITERAL.sub('?', statement)
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    shape = _IN_LIST.sub('(?)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class RequestStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.shape_time = Counter()
+
+    def record(self, statement, duration):
+        shape = statement_shape(statement)
+        self.count += 1
+        self.duration += duration
+        self.shapes[shape] += 1
+        self.shape_time[shape] += duration
+
+    def repeated(self, threshold):
+        """Statement shapes run at least ``threshold`` times, most frequent first."""
+        return [(shape, n, self.shape_time[shape]) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_stats' in g:
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_stats' in g:
+        started = conn.info['query_start_time'].pop()
+        g.sql_stats.record(statement, time.perf_counter() - started)
+
+def _handle_error(exception_context):
+    # after_cursor_execute does not fire for failed statements
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('query_start_time'):
+        conn.info['query_start_time'].pop()
+
+def _start_request():
+    if current_app.config.get('SQL_STATS_ENABLED', True):
+        g.sql_stats = RequestStats()
+
+def _finish_request(response):
+    stats = g.pop('sql_stats', None)
+    if stats is None:
+        return response
+    config = current_app.config
+    response.headers['X-SQL-Queries'] = str(stats.count)
+    response.headers['X-SQL-Time-ms'] = f'{stats.duration * 1000:.2f}'
+
+    repeated = stats.repeated(config.get('SQL_N_PLUS_ONE_THRESHOLD', 5))
+    if repeated:
+        current_app.logger.warning(
+            'Probable N+1 in %s: %s',
+            request.endpoint,
+            '; '.join(f'{n}x {shape[:120]}' for shape, n, _ in repeated),
+        )
+    with _recent_lock:
+        _recent.append({
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'count': stats.count,
+            'duration_ms': stats.duration * 1000,
+            'repeated': [(shape, n, t * 1000) for shape, n, t in repeated],
+            'templates': [(name, t * 1000, sql * 1000) for name, t, sql in templating.template_timings()],
+        })
+
+    budget = config.get('SQL_QUERY_BUDGETS', {}).get(request.endpoint)
+    if budget is not None and stats.count > budget:
+        message = f'{request.endpoint} ran {stats.count} SQL statements (budget {budget})'
+        if config.get('SQL_QUERY_BUDGET_RAISE'):
+            raise QueryBudgetExceeded(message)
+        current_app.logger.warning(message)
+    return response
+
+def recent_requests():
+    """Most recent request stats, newest first."""
+    with _recent_lock:
+        return list(reversed(_recent))
+
+def init_app(app):
+    global _listeners_installed, _recent
+    if not _listeners_installed:
+        # Listen on the Engine class so engines created lazily later are covered
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _listeners_installed = True
+    _recent = deque(maxlen=app.config.get('SQL_STATS_HISTORY', 100))
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -1,6 +1,9 @@
 from functools import wraps
 from flask import abort
 from flask_login import current_user
+from sqlalchemy import and_, false, or_, select, true
+
+from models import Project, Ticket
 
 def role_required(*roles):
     def decorator(f):
@@ -36,6 +39,42 @@ def can_see_ticket(ticket, user):
         return ticket.public  # Visitors can see all public tickets
     return False
 
+def can_see_project(project, user):
+    """Returns True if the user has access to view the project"""
+    if user.role in ('admin', 'visitor'):
+        return True  # Admins and visitors can see all projects
+    if user.role == 'manager':
+        # Managers can see projects they lead and projects of their team
+        return project.team_lead_id == user.id or (project.team_id is not None and project.team_id == user.team_id)
+    if user.role == 'developer':
+        return project.team_id is not None and project.team_id == user.team_id  # Projects of their team
+    return False
+
+def visible_projects_clause(user):
+    """SQL filter on Project equivalent to can_see_project"""
+    if user.role in ('admin', 'visitor'):
+        return true()
+    team_projects = Project.team_id == user.team_id if user.team_id is not None else false()
+    if user.role == 'manager':
+        return or_(Project.team_lead_id == user.id, team_projects)
+    if user.role == 'developer':
+        return team_projects
+    return false()
+
+def visible_tickets_clause(user, model=Ticket):
+    """SQL filter on Ticket (or TicketArchive) equivalent to can_see_ticket"""
+    if user.role == 'admin':
+        return true()
+    if user.role == 'manager':
+        own_projects = select(Project.id).where(or_(Project.team_lead_id == user.id, Project.team_id == user.team_id))
+        return or_(model.project_id.in_(own_projects), model.public == True)
+    if user.role == 'developer':
+        team_projects = select(Project.id).where(Project.team_id == user.team_id)
+        return or_(model.assignee == user.name, and_(model.public == True, model.project_id.in_(team_projects)))
+    if user.role == 'visitor':
+        return model.public == True
+    return false()
+
 def can_edit_ticket(ticket, user):
     """Returns True if the user has access to modify the ticket"""
     if user.role == 'admin':
@@ -0,0 +1,96 @@
+"""
+Cached reference data for form dropdowns.
+
+Teams, projects and approved users change far less often than the forms
+listing them are shown, so each kind is loaded with one query and kept
+per process as immutable tuples. As in rosters.py, each kind has a
+version file under the instance folder: code that changes a kind calls
+``invalidate(kind)`` after committing, and every Gunicorn worker reloads
+that kind on its next lookup. ``rosters.invalidate()`` also invalidates
+teams and users.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app
+
+from models import db, User, Team, Project
+
+KINDS = ('teams', 'projects', 'users')
+
+TeamRef = namedtuple('TeamRef', 'id name manager_id')
+ProjectRef = namedtuple('ProjectRef', 'id name team_id team_lead_id')
+UserRef = namedtuple('UserRef', 'id name email role team_id')
+
+_lock = threading.Lock()
+_cache = {kind: {'version': None, 'value': None} for kind in KINDS}
+
+
+def _version_path(kind):
+    return os.path.join(current_app.instance_path, f'refdata-{kind}.version')
+
+def _current_version(kind):
+    try:
+        return os.stat(_version_path(kind)).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+def _load_teams():
+    return tuple(TeamRef(*row) for row in db.session.query(Team.id, Team.name, Team.manager_id).order_by(Team.id))
+
+def _load_projects():
+    rows = db.session.query(Project.id, Project.name, Project.team_id, Project.team_lead_id).order_by(Project.id)
+    projects = tuple(ProjectRef(*row) for row in rows)
+    return projects, {project.id: project for project in projects}
+
+def _load_users():
+    rows = (db.session.query(User.id, User.name, User.email, User.role, User.team_id)
+            .filter(User.approved == True)
+            .order_by(User.id))
+    users = tuple(UserRef(*row) for row in rows)
+    by_team = {}
+    for user in users:
+        by_team.setdefault(user.team_id, []).append(user)
+    return users, {team_id: tuple(members) for team_id, members in by_team.items()}
+
+_LOADERS = {'teams': _load_teams, 'projects': _load_projects, 'users': _load_users}
+
+def _get(kind):
+    version = _current_version(kind)
+    with _lock:
+        entry = _cache[kind]
+        if entry['value'] is None or entry['version'] != version:
+            entry.update(version=version, value=_LOADERS[kind]())
+        return entry['value']
+
+def teams():
+    """Every team, by id."""
+    return _get('teams')
+
+def projects():
+    """Every project, by id."""
+    return _get('projects')[0]
+
+def project(project_id):
+    return _get('projects')[1].get(project_id)
+
+def users(team_id=None, role=None):
+    """Approved users by id, optionally only those in ``team_id`` and/or with ``role``."""
+    everyone, by_team = _get('users')
+    found = everyone if team_id is None else by_team.get(team_id, ())
+    return [user for user in found if user.role == role] if role else list(found)
+
+def invalidate(*kinds):
+    """Drop the cached ``kinds`` (default all of them) in every worker."""
+    for kind in kinds or KINDS:
+        path = _version_path(kind)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a'):
+            pass
+        # Bump the mtime explicitly: two writes in the same tick must still differ
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, max(stat.st_mtime_ns + 1, time.time_ns())))
+        with _lock:
+            _cache[kind].update(version=None, value=None)
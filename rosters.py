@@ -0,0 +1,72 @@
+"""
+Cached team rosters.
+
+Every team with its approved members is loaded with two queries (teams,
+then approved users grouped by team in Python) and kept per process.
+Routes that change membership, approval or roles call ``invalidate()``,
+which touches a version file under the instance folder so every Gunicorn
+worker reloads on its next lookup, and invalidates the teams and users
+kept by refdata.py.
+"""
+import os
+import threading
+import time
+
+from flask import current_app
+
+import refdata
+from models import db, User, Team
+
+VERSION_FILE = 'rosters.version'
+
+_lock = threading.Lock()
+_cache = {'version': None, 'rosters': None}
+
+
+def _version_path():
+    return os.path.join(current_app.instance_path, VERSION_FILE)
+
+def _current_version():
+    try:
+        return os.stat(_version_path()).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+def _load():
+    rosters = {}
+    for team in Team.query.order_by(Team.id):
+        rosters[team.id] = {'id': team.id, 'name': team.name, 'manager_id': team.manager_id, 'members': []}
+    members = (db.session.query(User.id, User.name, User.email, User.role, User.team_id)
+               .filter(User.approved == True, User.team_id.isnot(None))
+               .order_by(User.name))
+    for user_id, name, email, role, team_id in members:
+        if team_id in rosters:
+            rosters[team_id]['members'].append(
+                {'id': user_id, 'name': name, 'email': email, 'role': role, 'team_id': team_id})
+    return rosters
+
+def all_rosters():
+    """``{team_id: {'id', 'name', 'manager_id', 'members': [...]}}`` for every team."""
+    version = _current_version()
+    with _lock:
+        if _cache['rosters'] is None or _cache['version'] != version:
+            _cache.update(version=version, rosters=_load())
+        return _cache['rosters']
+
+def rosters_for(team_ids):
+    rosters = all_rosters()
+    return [rosters[team_id] for team_id in team_ids if team_id in rosters]
+
+def invalidate():
+    """Drop the cached rosters in every worker."""
+    path = _version_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a'):
+        pass
+    # Bump the mtime explicitly: two writes in the same tick must still differ
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, max(stat.st_mtime_ns + 1, time.time_ns())))
+    with _lock:
+        _cache.update(version=None, rosters=None)
+    # The form dropdowns list the same teams and people
+    refdata.invalidate('teams', 'users')
@@ -0,0 +1,183 @@
+"""
+Slow-query log.
+
+Statements slower than ``SLOW_QUERY_MS`` are written as one JSON object
+per line to a rotating log file, together with the calling view, the
+duration, the bound parameters (redacted to their type and size) and the
+query plan the database reports for them. Every Gunicorn worker writes
+to the same file; rotation happens under a file lock, and a worker whose
+file was rotated by another one reopens it before writing.
+"""
+import fcntl
+import glob
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from logging.handlers import RotatingFileHandler
+
+import click
+from flask import current_app, has_request_context, request
+from flask.cli import with_appcontext
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from query_stats import statement_shape
+
+logger = logging.getLogger('jira.slow_queries')
+logger.propagate = False
+
+_settings = {'threshold': None, 'explain': True}
+_listeners_installed = False
+
+
+def redact(parameters):
+    """Replace bound values with their type (and length for strings)."""
+    def describe(value):
+        if value is None:
+            return None
+        if isinstance(value, (str, bytes)):
+            return f'<{type(value).__name__}:{len(value)}>'
+        return f'<{type(value).__name__}>'
+
+    if isinstance(parameters, dict):
+        return {key: describe(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [describe(value) for value in parameters]
+    return describe(parameters)
+
+def explain(conn, cursor, statement, parameters):
+    """Ask the database for the plan of ``statement`` without running it."""
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    explain_cursor = cursor.connection.cursor()
+    try:
+        explain_cursor.execute(prefix + statement, parameters)
+        return [' | '.join(str(col) for col in row) for row in explain_cursor.fetchall()]
+    except Exception as e:
+        return [f'EXPLAIN failed: {e}']
+    finally:
+        explain_cursor.close()
+
+class _SharedRotatingFileHandler(RotatingFileHandler):
+    """A RotatingFileHandler that several processes can write to."""
+
+    def emit(self, record):
+        # A lock file opened per record: an flock on a descriptor inherited across a fork would be shared
+        with open(f'{self.baseFilename}.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if self.stream is not None and self._rotated():
+                self.stream.close()
+                self.stream = None  # reopened by emit()
+            super().emit(record)
+
+    def _rotated(self):
+        try:
+            return os.stat(self.baseFilename).st_ino != os.fstat(self.stream.fileno()).st_ino
+        except FileNotFoundError:
+            return True
+
+
+def _caller():
+    if has_request_context():
+        return request.endpoint or request.path
+    return 'cli'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('slow_query_start_time', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration_ms = (time.perf_counter() - conn.info['slow_query_start_time'].pop()) * 1000
+    threshold = _settings['threshold']
+    if threshold is None or duration_ms < threshold:
+        return
+    plan = None
+    if _settings['explain'] and not executemany and statement.lstrip()[:6].upper() in ('SELECT', 'UPDATE', 'DELETE'):
+        plan = explain(conn, cursor, statement, parameters)
+    logger.warning(json.dumps({
+        'ts': datetime.now().isoformat(timespec='milliseconds'),
+        'view': _caller(),
+        'duration_ms': round(duration_ms, 3),
+        'statement': statement,
+        'parameters': None if executemany else redact(parameters),
+        'executemany': executemany,
+        'plan': plan,
+    }))
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('slow_query_start_time'):
+        conn.info['slow_query_start_time'].pop()
+
+
+def read_entries(path, since=None):
+    """Yield logged entries from ``path`` and its rotated backups."""
+    for filename in sorted(glob.glob(f'{path}*')):
+        if filename.endswith('.lock'):
+            continue
+        with open(filename) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if since is None or entry['ts'] >= since.isoformat():
+                    yield entry
+
+def summarize(entries):
+    """Group entries by statement shape, worst total time first."""
+    shapes = defaultdict(lambda: {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'views': set(), 'plan': None})
+    for entry in entries:
+        summary = shapes[statement_shape(entry['statement'])]
+        summary['count'] += 1
+        summary['total_ms'] += entry['duration_ms']
+        if entry['duration_ms'] >= summary['max_ms']:
+            summary['max_ms'] = entry['duration_ms']
+            summary['plan'] = entry.get('plan')
+        summary['views'].add(entry['view'])
+    return sorted(shapes.items(), key=lambda item: item[1]['total_ms'], reverse=True)
+
+
+@click.command('slow-queries')
+@click.option('--hours', default=24.0, show_default=True, help='Only look at entries from the last N hours.')
+@click.option('--top', default=10, show_default=True, help='Number of statement shapes to show.')
+@with_appcontext
+def slow_queries_command(hours, top):
+    """Summarize the worst statement shapes in the slow-query log."""
+    since = datetime.now() - timedelta(hours=hours)
+    path = current_app.config['SLOW_QUERY_LOG']
+    worst = summarize(read_entries(path, since))
+    if not worst:
+        click.echo(f'No slow queries logged in the last {hours:g} hours.')
+        return
+    for shape, summary in worst[:top]:
+        click.echo(f"{summary['count']:>6}x  total {summary['total_ms']:.1f} ms  "
+                   f"max {summary['max_ms']:.1f} ms  views: {', '.join(sorted(summary['views']))}")
+        click.echo(f'        {shape[:300]}')
+        for line in summary['plan'] or []:
+            click.echo(f'        plan: {line}')
+        click.echo('')
+
+
+def init_app(app):
+    global _listeners_installed
+    threshold = app.config.get('SLOW_QUERY_MS')
+    if threshold is None:
+        return
+    _settings['threshold'] = threshold
+    _settings['explain'] = app.config.get('SLOW_QUERY_EXPLAIN', True)
+    path = app.config['SLOW_QUERY_LOG']
+    if not any(getattr(h, 'baseFilename', None) == os.path.abspath(path) for h in logger.handlers):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = _SharedRotatingFileHandler(path, maxBytes=app.config.get('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024),
+                                             backupCount=app.config.get('SLOW_QUERY_LOG_BACKUPS', 5))
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.WARNING)
+    if not _listeners_installed:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _listeners_installed = True
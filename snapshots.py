@@ -0,0 +1,142 @@
+"""
+Daily per-project ticket snapshots.
+
+``take_snapshot`` records, for every project and status, how many tickets
+are in that status and how long on average they have been there. Burndown,
+velocity and time-in-status charts are then drawn from at most
+``days x statuses`` rows per project instead of scanning live tickets.
+
+Run it nightly with ``flask snapshot-projects`` (e.g. from cron), or set
+``SNAPSHOT_HOUR`` to have one worker take it in-process.
+"""
+import fcntl
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import func, insert
+
+from models import db, Ticket, TicketArchive, ProjectSnapshot
+
+STATUSES = ['To Do', 'In Progress', 'In Review', 'Done']
+
+_scheduler_pid = None
+
+
+def _days_in_status(model=Ticket):
+    # status_changed_at is written with the database's CURRENT_TIMESTAMP,
+    # so the age is computed against the database clock as well
+    if db.engine.dialect.name == 'sqlite':
+        return func.julianday('now') - func.julianday(model.status_changed_at)
+    return func.extract('epoch', func.now() - model.status_changed_at) / 86400.0
+
+def _grouped(model):
+    status = func.coalesce(model.status, 'To Do')
+    return (db.session.query(model.project_id, status, func.count(model.id), func.avg(_days_in_status(model)))
+            .filter(model.project_id.isnot(None))
+            .group_by(model.project_id, status)
+            .all())
+
+def take_snapshot(day=None):
+    """Replace the snapshot rows for ``day`` (default today) with one grouped
+    query over live tickets and one over the archive."""
+    day = day or date.today()
+    # Archived tickets keep counting towards their project's Done history
+    totals = {}
+    for model in (Ticket, TicketArchive):
+        for project_id, status, count, avg_days in _grouped(model):
+            total = totals.setdefault((project_id, status), [0, 0.0, 0])
+            total[0] += count
+            if avg_days is not None:
+                total[1] += avg_days * count
+                total[2] += count
+    rows = [(project_id, status, count, days / dated if dated else None)
+            for (project_id, status), (count, days, dated) in totals.items()]
+    ProjectSnapshot.query.filter_by(day=day).delete()
+    if rows:
+        db.session.execute(insert(ProjectSnapshot), [
+            {'project_id': project_id, 'day': day, 'status': status, 'ticket_count': count,
+             'avg_days_in_status': round(avg_days, 3) if avg_days is not None else None}
+            for project_id, status, count, avg_days in rows
+        ])
+    db.session.commit()
+    return len(rows)
+
+def burndown(project_id, days=30):
+    """Chart series for the last ``days`` snapshots of a project."""
+    since = date.today() - timedelta(days=days - 1)
+    rows = (ProjectSnapshot.query
+            .filter(ProjectSnapshot.project_id == project_id, ProjectSnapshot.day >= since)
+            .order_by(ProjectSnapshot.day)
+            .all())
+    by_day = {}
+    for row in rows:
+        by_day.setdefault(row.day, {})[row.status] = row
+    labels = sorted(by_day)
+    counts = {status: [by_day[d][status].ticket_count if status in by_day[d] else 0 for d in labels]
+              for status in STATUSES}
+    remaining = [sum(counts[s][i] for s in STATUSES if s != 'Done') for i in range(len(labels))]
+    # Velocity: tickets that reached Done since the previous snapshot
+    velocity = [0] + [max(0, counts['Done'][i] - counts['Done'][i - 1]) for i in range(1, len(labels))]
+    latest = by_day[labels[-1]] if labels else {}
+    return {
+        'project_id': project_id,
+        'labels': [d.isoformat() for d in labels],
+        'by_status': counts,
+        'remaining': remaining,
+        'done': counts['Done'],
+        'velocity': velocity,
+        'avg_days_in_status': {status: row.avg_days_in_status for status, row in latest.items()},
+    }
+
+
+@click.command('snapshot-projects')
+@click.option('--day', type=click.DateTime(formats=['%Y-%m-%d']), help='Day to record (default today).')
+@with_appcontext
+def snapshot_command(day):
+    """Record today's per-project ticket counts by status."""
+    count = take_snapshot(day.date() if day else None)
+    click.echo(f'Recorded {count} project/status rows.')
+
+
+def _run_scheduled(app):
+    hour = app.config['SNAPSHOT_HOUR']
+    lock_path = os.path.join(app.instance_path, 'snapshot.lock')
+    while True:
+        now = datetime.now()
+        next_run = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        time.sleep((next_run - now).total_seconds())
+        os.makedirs(app.instance_path, exist_ok=True)
+        with open(lock_path, 'w') as lock:
+            try:
+                # Only one worker takes the snapshot
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue
+            try:
+                with app.app_context():
+                    if not ProjectSnapshot.query.filter_by(day=date.today()).first():
+                        take_snapshot()
+            except Exception:
+                app.logger.exception('Scheduled project snapshot failed')
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _ensure_scheduler():
+    global _scheduler_pid
+    # Started on the first request of each process: threads do not survive
+    # Gunicorn's fork when the app is preloaded
+    if _scheduler_pid != os.getpid():
+        _scheduler_pid = os.getpid()
+        app = current_app._get_current_object()
+        threading.Thread(target=_run_scheduled, args=(app,), daemon=True, name='project-snapshots').start()
+
+def init_app(app):
+    if app.config.get('SNAPSHOT_HOUR') is not None:
+        app.before_request(_ensure_scheduler)
@@ -0,0 +1,268 @@
+from datetime import date, timedelta
+
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
+from flask_login import login_required, current_user
+
+import refdata
+import rosters
+import workload
+from models import db, User, Team
+from notifications import notify, notify_team
+from rbac import can_approve_user
+
+teams_bp = Blueprint('teams', __name__)
+
+PEOPLE_PER_PAGE = 48
+
+@teams_bp.route('/teams')
+@login_required
+def teams_page():
+    # Query teams based on user role
+    if current_user.role == 'admin':
+        # Admin can see all teams
+        teams = rosters.all_rosters().values()
+    elif current_user.role == 'manager':
+        # Manager can only see teams they manage
+        teams = [team for team in rosters.all_rosters().values() if team['manager_id'] == current_user.id]
+    elif current_user.role == 'developer':
+        # Developers can only see their own team
+        teams = rosters.rosters_for([current_user.team_id]) if current_user.team_id else []
+    else:
+        # Visitors can see all teams
+        teams = rosters.all_rosters().values()
+    
+    # People you work with (all approved users), one page at a time
+    people = (User.query.filter_by(approved=True)
+              .order_by(User.name, User.id)
+              .paginate(page=request.args.get('page', 1, type=int), per_page=PEOPLE_PER_PAGE, error_out=False))
+    return render_template('teams.html', teams=list(teams), people=people)
+
+@teams_bp.route('/create_team', methods=['GET', 'POST'])
+@login_required
+def create_team():
+    
+    # Only admin can create teams
+    if current_user.role != 'admin':
+        abort(403)
+    
+    if request.method == 'POST':
+        name = request.form.get('name')
+        manager_id = request.form.get('manager_id')
+        member_ids = request.form.getlist('members[]')
+        
+        # Create new team
+        team = Team(name=name, manager_id=manager_id)
+        db.session.add(team)
+        db.session.commit()
+        
+        # Assign members to team
+        if member_ids:
+            for user in User.query.filter(User.id.in_([int(member_id) for member_id in member_ids])):
+                user.team_id = team.id
+            db.session.commit()
+        rosters.invalidate()
+        
+        flash(f'Team {name} created successfully!')
+        return redirect(url_for('teams.teams_page'))
+    
+    # Get managers and developers for form dropdowns
+    managers = refdata.users(role='manager')
+    developers = refdata.users(role='developer')
+    return render_template('create_team.html', managers=managers, developers=developers)
+
+@teams_bp.route('/team/<int:team_id>/pending_users')
+@login_required
+def team_pending_users(team_id):
+    
+    team = Team.query.get_or_404(team_id)
+    
+    # Check if user can approve for this team
+    if not can_approve_user(team_id, current_user):
+        abort(403)
+    
+    # Get pending users for this team
+    pending_users = User.query.filter_by(team_id=team_id, approved=False).all()
+    
+    # For managers, filter to only show developers (not other managers)
+    if current_user.role == 'manager':
+        pending_users = [user for user in pending_users if user.role == 'developer']
+    
+    # For managers, filter out visitors - they are approved by admin only
+    if current_user.role == 'manager':
+        pending_users = [user for user in pending_users if user.role != 'visitor']
+    
+    return render_template('pending_users.html', pending_users=pending_users, team=team)
+
+@teams_bp.route('/team/<int:team_id>/approve_user/<int:user_id>', methods=['POST'])
+@login_required
+def team_approve_user(team_id, user_id):
+    
+    if not can_approve_user(team_id, current_user):
+        abort(403)
+    
+    user = User.query.get_or_404(user_id)
+    if user.team_id != team_id:
+        abort(400)  # Bad request if user is not in this team
+    
+    user.approved = True
+    # Notify the approved user once, however often the form is submitted
+    notify([user.id], f'Your account has been approved for team {user.team.name}',
+           link=url_for('dashboard.dashboard'), key=f'user-approved:{user.id}')
+    db.session.commit()
+    rosters.invalidate()
+    
+    flash(f'User {user.name} has been approved.')
+    return redirect(url_for('teams.team_pending_users', team_id=team_id))
+
+@teams_bp.route('/team/<int:team_id>/disapprove_user/<int:user_id>', methods=['POST'])
+@login_required
+def team_disapprove_user(team_id, user_id):
+    
+    if not can_approve_user(team_id, current_user):
+        abort(403)
+    
+    user = User.query.get_or_404(user_id)
+    if user.team_id != team_id:
+        abort(400)  # Bad request if user is not in this team
+    
+    # Remove user from DB to hide request
+    db.session.delete(user)
+    db.session.commit()
+    rosters.invalidate()
+    flash(f'User {user.name} registration request has been disapproved and removed.')
+    return redirect(url_for('teams.team_pending_users', team_id=team_id))
+
+@teams_bp.route('/api/people', methods=['GET', 'POST'])
+def api_people():
+    if request.method == 'GET':
+        users = User.query.filter_by(approved=True).all()
+        people = []
+        for user in users:
+            people.append({
+                "name": user.name,
+                "role": user.role
+            })
+        return jsonify(people)
+    elif request.method == 'POST':
+        data = request.get_json()
+        email = data.get('email')
+        # Create new user with default role and pending approval
+        new_user = User(
+            name=email.split('@')[0].capitalize(),
+            email=email,
+            role='visitor',
+            approved=False,
+            password=''  # No password set yet
+        )
+        db.session.add(new_user)
+        db.session.commit()
+        return jsonify({"status": "success", "person": {"name": new_user.name, "role": new_user.role}}), 201
+
+@teams_bp.route('/api/teams', methods=['GET', 'POST'])
+def api_teams():
+    if request.method == 'GET':
+        teams_list = []
+        for team in rosters.all_rosters().values():
+            teams_list.append({
+                "name": team['name'],
+                "project": '',
+                "members": [{"name": m['name'], "role": m['role']} for m in team['members']]
+            })
+        return jsonify(teams_list)
+    elif request.method == 'POST':
+        data = request.get_json()
+        name = data.get('name')
+        project = data.get('project')
+        member_emails = data.get('members') or []
+        # Resolve every email in one query
+        members = User.query.filter(User.email.in_(member_emails)).all() if member_emails else []
+        new_team = Team(name=name)
+        db.session.add(new_team)
+        db.session.commit()
+        # Assign members to the new team
+        for member in members:
+            member.team_id = new_team.id
+        db.session.commit()
+        rosters.invalidate()
+        return jsonify({"status": "created", "team": {"name": new_team.name, "project": project, "members": member_emails}})
+
+@teams_bp.route('/api/team/<int:team_id>/members')
+@login_required
+def api_team_members(team_id):
+    
+    # Only admin can access this endpoint
+    if current_user.role != 'admin':
+        return jsonify({"error": "Unauthorized"}), 403
+    
+    team = rosters.rosters_for([team_id])
+    if not team:
+        abort(404)
+    team = team[0]
+    
+    members_list = []
+    for member in team['members']:
+        members_list.append({
+            "id": member['id'],
+            "name": member['name'],
+            "role": member['role'],
+            "is_manager": member['id'] == team['manager_id']
+        })
+    
+    return jsonify(members_list)
+
+@teams_bp.route('/team/<int:team_id>/workload')
+@login_required
+def team_workload(team_id):
+    team = rosters.rosters_for([team_id])
+    if not team:
+        abort(404)
+    team = team[0]
+    
+    # Admins, the team's manager and its members can see its workload
+    if current_user.role == 'visitor':
+        abort(403)
+    if current_user.role != 'admin' and current_user.team_id != team_id and team['manager_id'] != current_user.id:
+        abort(403)
+    
+    loads = workload.for_assignees([member['name'] for member in team['members']], weeks_ahead=8)
+    first_week = workload.week_of(date.today())
+    weeks = [first_week + timedelta(days=7 * i) for i in range(8)]
+    return render_template('team_workload.html', team=team, loads=loads, weeks=weeks)
+
+@teams_bp.route('/team/<int:team_id>/update_manager', methods=['POST'])
+@login_required
+def update_team_manager(team_id):
+    
+    # Only admin can update team manager
+    if current_user.role != 'admin':
+        abort(403)
+    
+    team = Team.query.get_or_404(team_id)
+    manager_id = request.form.get('manager_id')
+    
+    if not manager_id:
+        flash('No team member selected')
+        return redirect(url_for('teams.teams_page'))
+    
+    # Verify the user is part of the team
+    user = User.query.get(int(manager_id))
+    if not user or user.team_id != team_id:
+        flash('Invalid team member selected')
+        return redirect(url_for('teams.teams_page'))
+    
+    # Update the user's role to manager if not already
+    if user.role != 'manager':
+        user.role = 'manager'
+    
+    # Update the team's manager
+    team.manager_id = user.id
+    
+    # Notify the new team lead, and the rest of the team in the background
+    notify([user.id], f'You have been assigned as Team Lead for {team.name}', link=url_for('teams.teams_page'))
+    notify_team(team_id, f'{user.name} is now the Team Lead for {team.name}',
+                link=url_for('teams.teams_page'), exclude_user_id=user.id)
+    db.session.commit()
+    rosters.invalidate()
+    
+    flash(f'{user.name} has been set as the Team Lead for {team.name}')
+    return redirect(url_for('teams.teams_page'))
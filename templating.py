@@ -0,0 +1,68 @@
+"""
+Jinja bytecode cache and per-template render timing.
+
+Compiling the large templates (board.html, base.html, teams.html, ...)
+is a noticeable part of a new worker's first requests. With
+``TEMPLATE_CACHE_DIR`` set, compiled templates are kept there as Jinja
+bytecode, so restarts load them instead of compiling again; Jinja checks
+each entry against the template's source, so edited templates are never
+served stale. ``precompile()`` loads every template up front, which
+under Gunicorn's ``preload_app`` happens once in the master and is
+inherited by every worker.
+
+Every ``render_template`` call in a request is timed, together with the
+SQL it ran while rendering (lazy loads in template loops). The request's
+total goes out in the ``X-Template-Time-ms`` header, each template's
+share is listed on the admin SQL statistics page, and metrics.py exports
+them per template.
+"""
+import os
+import time
+
+from flask import before_render_template, g, has_request_context, template_rendered
+from jinja2 import FileSystemBytecodeCache
+
+
+def _sql_time():
+    stats = g.get('sql_stats')
+    return stats.duration if stats is not None else 0.0
+
+def _template_started(sender, template, context, **extra):
+    if has_request_context():
+        g.setdefault('template_stack', []).append((time.perf_counter(), _sql_time()))
+
+def _template_finished(sender, template, context, **extra):
+    stack = g.get('template_stack') if has_request_context() else None
+    if not stack:
+        return
+    started, sql_started = stack.pop()
+    elapsed = time.perf_counter() - started
+    g.setdefault('template_timings', []).append((template.name or '<string>', elapsed, _sql_time() - sql_started))
+    if not stack:
+        # Templates rendered from inside another one are already part of its time
+        g.template_time = g.get('template_time', 0.0) + elapsed
+
+def template_timings():
+    """``[(template name, seconds, SQL seconds within), ...]`` for the current request."""
+    return g.get('template_timings', [])
+
+def _add_header(response):
+    if 'template_time' in g:
+        response.headers['X-Template-Time-ms'] = f'{g.template_time * 1000:.2f}'
+    return response
+
+def precompile(app):
+    """Load every template now, from the bytecode cache where possible; returns how many."""
+    names = app.jinja_env.list_templates(extensions=['html'])
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+def init_app(app):
+    directory = app.config.get('TEMPLATE_CACHE_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
+    app.after_request(_add_header)
@@ -0,0 +1,674 @@
+from datetime import datetime
+
+import sqlalchemy as sa
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
+from flask_login import login_required, current_user
+from sqlalchemy import Table, MetaData, Column, Integer, String, Text, Boolean, Date, DateTime
+from sqlalchemy.orm import joinedload
+from sqlalchemy.sql import insert
+
+import autocomplete
+import public_board
+import refdata
+import workload
+import writer
+from models import db, Ticket, TicketArchive, Project, User
+from notifications import notify
+from rbac import can_see_ticket, can_edit_ticket, can_reassign_ticket, visible_tickets_clause
+
+tickets_bp = Blueprint('tickets', __name__)
+
+TICKET_STATUSES = ['To Do', 'In Progress', 'In Review', 'Done']
+TICKET_PRIORITIES = ['high', 'medium', 'low']
+# Most parents a single /api/tickets/children request may expand
+MAX_CHILDREN_PARENTS = 200
+# Longer assignee lists are offered as a typeahead (see autocomplete.py)
+ASSIGNEE_SELECT_MAX = 200
+# Times a status move re-reads a ticket that changed under it before answering 409
+STATUS_UPDATE_ATTEMPTS = 3
+
+@tickets_bp.route('/create_ticket', methods=['GET', 'POST'])
+@login_required
+def create_ticket():
+    # Use Flask-Login's current_user directly
+    team_members = []
+    if current_user.role not in ['admin', 'manager', 'developer'] or current_user.role == 'visitor':
+        abort(403)
+    if current_user.role == 'developer' and not current_user.team_id:
+        flash("You must be in a team to create a ticket.")
+        return redirect(url_for('dashboard.dashboard'))
+    # Dropdown contents come from the reference-data cache (see refdata.py)
+    if current_user.role == 'manager':
+        # Manager can assign to any member of their team
+        team_members = refdata.users(team_id=current_user.team_id)
+    elif current_user.role == 'admin':
+        # Admin can assign to anyone
+        team_members = refdata.users()
+    else:
+        # Developer can assign only to self
+        team_members = [current_user]
+    teams = refdata.teams()
+    projects = refdata.projects()
+    # Parent tickets are picked with a typeahead, not listed here
+    
+    if request.method == 'POST':
+        title = request.form['title']
+        description = request.form['description']
+        type_ = request.form['type']
+        priority = request.form['priority']
+        team_id = request.form.get('team')
+        assignee_id = request.form.get('assignee')
+        assignee_user = User.query.get(int(assignee_id)) if assignee_id else None
+        assignee_name = assignee_user.name if assignee_user else 'Unknown'
+        public_flag = 'public' in request.form
+        project_id = request.form.get('project')
+        parent_ticket_id = request.form.get('parent_ticket')
+        start_date_str = request.form.get('start_date')
+        end_date_str = request.form.get('end_date')
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else None
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else None
+        
+        # Validate required fields
+        if not team_id or not project_id:
+            flash('Team and Project are required fields.')
+            return redirect(url_for('tickets.create_ticket'))
+            
+        # Ensure project belongs to the selected team
+        project = Project.query.get(int(project_id))
+        if not project:
+            flash('Selected project does not exist.')
+            return redirect(url_for('tickets.create_ticket'))
+            
+        # Update project's team to ensure consistency
+        project_moved = project.team_id != int(team_id)
+        project.team_id = int(team_id)
+        db.session.commit()
+        if project_moved:
+            refdata.invalidate('projects')
+        
+        # Create ticket with basic attributes, excluding parent_id
+        # Use SQLAlchemy core to avoid ORM issues with missing columns
+        metadata = MetaData()
+        ticket_table = Table('ticket', metadata,
+            Column('id', Integer, primary_key=True),
+            Column('title', String),
+            Column('description', Text),
+            Column('type', String),
+            Column('priority', String),
+            Column('assignee', String),
+            Column('status', String),
+            Column('public', Boolean),
+            Column('project_id', Integer),
+            Column('start_date', Date),
+            Column('end_date', Date),
+            Column('status_changed_at', DateTime)
+        )
+        
+        # Insert using core API to avoid parent_id column
+        stmt = insert(ticket_table).values(
+            title=title,
+            description=description,
+            type=type_,
+            priority=priority,
+            assignee=assignee_name,
+            status='To Do',
+            public=public_flag,
+            project_id=project_id if project_id else None,
+            start_date=start_date,
+            end_date=end_date,
+            status_changed_at=sa.func.current_timestamp()
+        )
+        
+        db.session.execute(stmt)
+        workload.ticket_changed(None, {'assignee': assignee_name, 'status': 'To Do', 'priority': priority,
+                                       'start_date': start_date, 'end_date': end_date})
+        if public_flag:
+            public_board.changed()
+        db.session.commit()
+        flash('Ticket created successfully!')
+        return redirect(url_for('tickets.board_page'))
+    
+    assignee_typeahead = len(team_members) > ASSIGNEE_SELECT_MAX
+    if assignee_typeahead:
+        team_members = []
+    # Current load of each possible assignee, read from the workload index
+    loads = workload.for_assignees([member.name for member in team_members])
+    return render_template('create_ticket.html', team_members=team_members, projects=projects, teams=teams, loads=loads,
+                           assignee_typeahead=assignee_typeahead)
+
+@tickets_bp.route('/board')
+@login_required
+def board_page():
+    
+    user = current_user
+    if user.role == 'visitor':
+        # Every visitor sees the same board: serve the pre-rendered copy
+        snapshot = public_board.board_response()
+        if snapshot is not None:
+            return snapshot
+    
+    # Use a raw SQL query to avoid the parent_id column
+    try:
+        # Try to get all tickets with parent_id column
+        all_tickets = Ticket.query.all()
+    except Exception as e:
+        # If parent_id column doesn't exist, use a custom query
+        stmt = sa.text("SELECT id, title, description, type, priority, assignee, status, public, project_id, start_date, end_date FROM ticket")
+        result = db.session.execute(stmt)
+        all_tickets = []
+        for row in result:
+            ticket = Ticket(
+                id=row.id,
+                title=row.title,
+                description=row.description,
+                type=row.type,
+                priority=row.priority,
+                assignee=row.assignee,
+                status=row.status,
+                public=row.public,
+                project_id=row.project_id,
+                start_date=row.start_date,
+                end_date=row.end_date
+            )
+            all_tickets.append(ticket)
+    
+    # Filter tickets based on user role
+    if user.role == 'admin':
+        # Admin can see all tickets
+        visible_tickets = all_tickets
+    elif user.role == 'manager':
+        # Manager can see all tickets (public and private) from their team's projects
+        visible_tickets = []
+        for ticket in all_tickets:
+            # Check if ticket belongs to a project where the manager is team lead
+            if ticket.project and ticket.project.team_lead_id == user.id:
+                visible_tickets.append(ticket)
+            # Check if ticket belongs to a project in the manager's team
+            elif ticket.project and ticket.project.team_id == user.team_id:
+                visible_tickets.append(ticket)
+    elif user.role == 'visitor':
+        # Visitors can see all public tickets (until the snapshot exists)
+        visible_tickets = [ticket for ticket in all_tickets if ticket.public]
+    else:
+        # Developers can only see their own tickets and public tickets in their team's projects
+        visible_tickets = []
+        for ticket in all_tickets:
+            if ticket.assignee == user.name:  # Their own tickets
+                visible_tickets.append(ticket)
+            elif ticket.public and ticket.project and ticket.project.team_id == user.team_id:  # Public tickets in their team
+                visible_tickets.append(ticket)
+    
+    tickets = {'To Do': [], 'In Progress': [], 'In Review': [], 'Done': []}
+    for t in visible_tickets:
+        tickets.setdefault(t.status, []).append(t)
+    return render_template('board.html', tickets=tickets, child_counts=child_counts(user),
+                           max_children_parents=MAX_CHILDREN_PARENTS)
+
+@tickets_bp.route('/project/<int:project_id>/board')
+@login_required
+def project_board(project_id):
+    
+    project = Project.query.get_or_404(project_id)
+    
+    # Use a raw SQL query to avoid the parent_id column
+    try:
+        # Try to get project tickets with parent_id column
+        project_tickets = Ticket.query.filter_by(project_id=project_id).all()
+    except Exception as e:
+        # If parent_id column doesn't exist, use a custom query
+        stmt = sa.text("SELECT id, title, description, type, priority, assignee, status, public, project_id, start_date, end_date FROM ticket WHERE project_id = :project_id")
+        result = db.session.execute(stmt, {"project_id": project_id})
+        project_tickets = []
+        for row in result:
+            ticket = Ticket(
+                id=row.id,
+                title=row.title,
+                description=row.description,
+                type=row.type,
+                priority=row.priority,
+                assignee=row.assignee,
+                status=row.status,
+                public=row.public,
+                project_id=row.project_id,
+                start_date=row.start_date,
+                end_date=row.end_date
+            )
+            project_tickets.append(ticket)
+    
+    # Filter tickets based on user role
+    visible_tickets = []
+    if current_user.role == 'admin':
+        # Admin can see all tickets
+        visible_tickets = project_tickets
+    elif current_user.role == 'manager':
+        # Manager can see all tickets in their projects
+        visible_tickets = project_tickets
+    else:
+        # Developers can only see their own tickets and public tickets
+        for ticket in project_tickets:
+            if ticket.assignee == current_user.name:  # Their own tickets
+                visible_tickets.append(ticket)
+            elif ticket.public:  # Public tickets in the project
+                visible_tickets.append(ticket)
+    
+    tickets = {'To Do': [], 'In Progress': [], 'In Review': [], 'Done': []}
+    for ticket in visible_tickets:
+        tickets.setdefault(ticket.status, []).append(ticket)
+    return render_template('board.html', tickets=tickets, project=project, child_counts=child_counts(current_user),
+                           max_children_parents=MAX_CHILDREN_PARENTS)
+
+@tickets_bp.route('/all_tickets')
+@login_required
+def all_tickets():
+    
+    # Only admin can see all tickets
+    if current_user.role != 'admin':
+        abort(403)
+    
+    # Use a raw SQL query to avoid the parent_id column
+    try:
+        # Try to get all tickets with parent_id column
+        tickets = Ticket.query.all()
+    except Exception as e:
+        # If parent_id column doesn't exist, use a custom query
+        stmt = sa.text("SELECT id, title, description, type, priority, assignee, status, public, project_id, start_date, end_date FROM ticket")
+        result = db.session.execute(stmt)
+        tickets = []
+        for row in result:
+            ticket = Ticket(
+                id=row.id,
+                title=row.title,
+                description=row.description,
+                type=row.type,
+                priority=row.priority,
+                assignee=row.assignee,
+                status=row.status,
+                public=row.public,
+                project_id=row.project_id,
+                start_date=row.start_date,
+                end_date=row.end_date
+            )
+            tickets.append(ticket)
+    
+    # Archived tickets only on request
+    include_archived = request.args.get('archived') == '1'
+    if include_archived:
+        tickets += TicketArchive.query.options(joinedload(TicketArchive.project)).order_by(TicketArchive.id).all()
+    
+    return render_template('all_tickets.html', tickets=tickets, include_archived=include_archived)
+
+@tickets_bp.route('/api/ticket/<int:ticket_id>/status', methods=['POST'])
+@login_required
+def api_ticket_status(ticket_id):
+    
+    data = request.get_json()
+    new_status = data.get('status')
+    ticket = Ticket.query.get_or_404(ticket_id)
+    
+    # Check if user has permission to edit this ticket
+    if not can_edit_ticket(ticket, current_user):
+        return jsonify({"status": "error", "message": "Permission denied"}), 403
+    
+    if new_status and new_status in ['To Do', 'In Progress', 'In Review', 'Done']:
+        updated = writer.run(_set_ticket_status, ticket_id, new_status, url_for('tickets.board_page'))
+        if updated is None:
+            return _ticket_not_found()
+        if not updated:
+            db.session.rollback()
+            return _ticket_conflict(ticket_id)
+        return jsonify({"status": "success", "message": "Ticket status updated"})
+    else:
+        return jsonify({"status": "error", "message": "Invalid status"}), 400
+
+def _set_ticket_status(ticket_id, new_status, link):
+    # The writes of api_ticket_status, applied by writer.run(); None if the
+    # ticket is gone, False if it kept changing under us
+    ticket_table = Ticket.__table__
+    for attempt in range(STATUS_UPDATE_ATTEMPTS):
+        current = db.session.execute(
+            sa.select(ticket_table.c.title, ticket_table.c.assignee, ticket_table.c.status, ticket_table.c.priority,
+                      ticket_table.c.start_date, ticket_table.c.end_date, ticket_table.c.version,
+                      ticket_table.c.public)
+            .where(ticket_table.c.id == ticket_id)
+        ).first()
+        if current is None:
+            return None  # Archived meanwhile
+        if current.status == new_status:
+            break
+        # Only counted once the UPDATE matched the version the workload delta is based on
+        updated = db.session.execute(
+            sa.update(ticket_table)
+            .where(ticket_table.c.id == ticket_id,
+                   sa.func.coalesce(ticket_table.c.version, 0) == (current.version or 0))
+            .values(status=new_status, status_changed_at=sa.func.current_timestamp(),
+                    version=sa.func.coalesce(ticket_table.c.version, 0) + 1)
+        ).rowcount
+        if updated:
+            before = workload.snapshot(current)
+            workload.ticket_changed(before, dict(before, status=new_status))
+            if current.public:
+                public_board.changed()
+            break
+    else:
+        return False
+    
+    # Find the assignee user to send notification
+    assignee_user = db.session.query(User.id).filter_by(name=current.assignee).first()
+    if assignee_user:
+        # Queue notification for status change
+        notify([assignee_user.id], f'Ticket "{current.title}" status changed from {current.status} to {new_status}',
+               link=link)
+    return True
+
+@tickets_bp.route('/api/ticket/<int:ticket_id>', methods=['PATCH'])
+@login_required
+def api_patch_ticket(ticket_id):
+    """Apply status/priority/assignee changes if the client's version is still current.
+    
+    Body: {"version": n, "status"?: ..., "priority"?: ..., "assignee_id"?: ...}.
+    Returns the new version, or 409 with the ticket's current state.
+    """
+    data = request.get_json(silent=True) or {}
+    version = data.get('version')
+    if not isinstance(version, int):
+        return jsonify({"status": "error", "message": "version is required"}), 400
+    
+    changes = {}
+    if 'status' in data:
+        if data['status'] not in TICKET_STATUSES:
+            return jsonify({"status": "error", "message": "Invalid status"}), 400
+        changes['status'] = data['status']
+    if 'priority' in data:
+        if str(data['priority']).lower() not in TICKET_PRIORITIES:
+            return jsonify({"status": "error", "message": "Invalid priority"}), 400
+        changes['priority'] = str(data['priority']).lower()
+    new_assignee = None
+    if 'assignee_id' in data:
+        new_assignee = db.session.query(User.id, User.name).filter_by(id=data['assignee_id'], approved=True).first()
+        if new_assignee is None:
+            return jsonify({"status": "error", "message": "Invalid assignee"}), 400
+        changes['assignee'] = new_assignee.name
+    if not changes:
+        return jsonify({"status": "error", "message": "Nothing to change"}), 400
+    
+    # Core select of the few columns needed for permissions and the workload
+    # index; no ORM ticket is loaded
+    ticket_table = Ticket.__table__
+    current = db.session.execute(
+        sa.select(ticket_table.c.id, ticket_table.c.title, ticket_table.c.assignee, ticket_table.c.status,
+                  ticket_table.c.priority, ticket_table.c.start_date, ticket_table.c.end_date,
+                  ticket_table.c.version, ticket_table.c.public, Project.team_lead_id)
+        .outerjoin(Project.__table__, Project.id == ticket_table.c.project_id)
+        .where(ticket_table.c.id == ticket_id)
+    ).first()
+    if current is None:
+        return _ticket_not_found()
+    if not _may_edit(current, current_user):
+        return jsonify({"status": "error", "message": "Permission denied"}), 403
+    
+    # A ticket without a version (raw-SQL fallback, NULL column) is version 0, as the board renders it
+    if (current.version or 0) != version or not writer.run(_apply_patch, ticket_id, version, changes, current,
+                                                    new_assignee, url_for('tickets.board_page')):
+        db.session.rollback()
+        return _ticket_conflict(ticket_id)
+    if 'assignee' in changes and changes['assignee'] != current.assignee:
+        autocomplete.tickets_changed([ticket_id])
+    return jsonify({"status": "success", "id": ticket_id, "version": version + 1})
+
+def _apply_patch(ticket_id, version, changes, current, new_assignee, link):
+    # The writes of api_patch_ticket, applied by writer.run(); False if the version moved on
+    ticket_table = Ticket.__table__
+    values = dict(changes, version=sa.func.coalesce(ticket_table.c.version, 0) + 1)
+    if changes.get('status', current.status) != current.status:
+        values['status_changed_at'] = sa.func.current_timestamp()
+    updated = db.session.execute(
+        sa.update(ticket_table)
+        .where(ticket_table.c.id == ticket_id, sa.func.coalesce(ticket_table.c.version, 0) == version)
+        .values(**values)
+    ).rowcount
+    if not updated:
+        return False
+    
+    # The UPDATE matched the version we read, so `current` is the prior state
+    before = workload.snapshot(current)
+    workload.ticket_changed(before, dict(before, **{key: value for key, value in changes.items()
+                                                    if key in ('assignee', 'status', 'priority')}))
+    if new_assignee is not None and new_assignee.name != current.assignee:
+        notify([new_assignee.id], f'You have been assigned ticket: {current.title}', link=link)
+    if changes.get('status', current.status) != current.status:
+        assignee_user = db.session.query(User.id).filter_by(name=changes.get('assignee', current.assignee)).first()
+        if assignee_user:
+            notify([assignee_user.id], f'Ticket "{current.title}" status changed from {current.status} to {changes["status"]}',
+                   link=link)
+    if current.public:
+        public_board.changed()
+    return True
+
+def _may_edit(row, user):
+    # can_edit_ticket on a plain row
+    if user.role == 'admin':
+        return True
+    if user.role == 'manager' and row.team_lead_id == user.id:
+        return True
+    if user.role == 'developer' and row.assignee == user.name:
+        return True
+    return False
+
+def _ticket_not_found():
+    # abort(404) would reach handle_exception and come back as an HTML 500
+    return jsonify({"status": "error", "message": "Ticket not found"}), 404
+
+def _ticket_conflict(ticket_id):
+    ticket_table = Ticket.__table__
+    row = db.session.execute(
+        sa.select(ticket_table.c.id, ticket_table.c.status, ticket_table.c.priority,
+                  ticket_table.c.assignee, ticket_table.c.version)
+        .where(ticket_table.c.id == ticket_id)
+    ).first()
+    if row is None:
+        return _ticket_not_found()
+    return jsonify({"status": "conflict", "message": "Ticket was changed by someone else",
+                    "ticket": dict(row._mapping)}), 409
+
+def child_counts(user):
+    """Number of children ``user`` can see under each parent ticket, from one grouped query."""
+    rows = (db.session.query(Ticket.parent_id, sa.func.count(Ticket.id))
+            .filter(Ticket.parent_id.isnot(None), visible_tickets_clause(user))
+            .group_by(Ticket.parent_id))
+    return dict(rows.all())
+
+def _visible_children(parent_ids, user):
+    """``{parent_id: [child, ...]}`` of the children ``user`` can see, from one query."""
+    children = {parent_id: [] for parent_id in parent_ids}
+    if not children:
+        return children
+    rows = (db.session.query(Ticket.id, Ticket.parent_id, Ticket.title, Ticket.type, Ticket.priority,
+                             Ticket.status, Ticket.assignee)
+            .filter(Ticket.parent_id.in_(children), visible_tickets_clause(user))
+            .order_by(Ticket.parent_id, Ticket.id))
+    for row in rows:
+        children[row.parent_id].append({
+            "id": row.id,
+            "title": row.title,
+            "type": row.type,
+            "priority": row.priority,
+            "status": row.status,
+            "assignee": row.assignee
+        })
+    return children
+
+@tickets_bp.route('/api/ticket/<int:ticket_id>/children')
+@login_required
+def api_ticket_children(ticket_id):
+    
+    ticket = Ticket.query.get_or_404(ticket_id)
+    
+    # Check if user has permission to see this ticket
+    if not can_see_ticket(ticket, current_user):
+        return jsonify({"status": "error", "message": "Permission denied"}), 403
+    
+    return jsonify({
+        "parent": {
+            "id": ticket.id,
+            "title": ticket.title,
+            "type": ticket.type
+        },
+        "children": _visible_children([ticket.id], current_user)[ticket.id]
+    })
+
+@tickets_bp.route('/api/tickets/children')
+@login_required
+def api_tickets_children():
+    """Visible children of many parents at once: ``?ids=1,2,3``. Parents the
+    user cannot see (or that do not exist) are left out of the response."""
+    try:
+        ids = {int(part) for part in request.args.get('ids', '').split(',') if part.strip()}
+    except ValueError:
+        return jsonify({"status": "error", "message": "ids must be a comma-separated list of ticket ids"}), 400
+    if not ids:
+        return jsonify({"status": "error", "message": "ids is required"}), 400
+    if len(ids) > MAX_CHILDREN_PARENTS:
+        return jsonify({"status": "error", "message": f"At most {MAX_CHILDREN_PARENTS} ids per request"}), 400
+    
+    parents = (db.session.query(Ticket.id, Ticket.title, Ticket.type)
+               .filter(Ticket.id.in_(ids), visible_tickets_clause(current_user))
+               .order_by(Ticket.id).all())
+    children = _visible_children([parent.id for parent in parents], current_user)
+    return jsonify({
+        "parents": [
+            {"id": parent.id, "title": parent.title, "type": parent.type, "children": children[parent.id]}
+            for parent in parents
+        ]
+    })
+
+@tickets_bp.route('/hierarchy')
+@login_required
+def hierarchy_page():
+    # Visitors cannot access this page
+    if current_user.role == 'visitor':
+        abort(403)
+    
+    # Use raw SQL to avoid parent_id column issues
+    try:
+        # Get all tickets by type
+        stmt = sa.text("SELECT id, title, description, type, priority, assignee, status, public, project_id, start_date, end_date FROM ticket")
+        result = db.session.execute(stmt)
+        
+        # Organize tickets by type
+        epics = []
+        features = []
+        stories = []
+        
+        for row in result:
+            ticket = Ticket(
+                id=row.id,
+                title=row.title,
+                description=row.description,
+                type=row.type,
+                priority=row.priority,
+                assignee=row.assignee,
+                status=row.status,
+                public=row.public,
+                project_id=row.project_id,
+                start_date=row.start_date,
+                end_date=row.end_date
+            )
+            
+            if ticket.type == 'epic':
+                epics.append(ticket)
+            elif ticket.type == 'feature':
+                features.append(ticket)
+            else:  # story, task, bug
+                stories.append(ticket)
+        
+        return render_template('hierarchy.html', epics=epics, features=features, stories=stories)
+    except Exception as e:
+        # Log the error but don't show it to the user
+        print(f"Hierarchy error: {e}")
+        return render_template('hierarchy.html', epics=[], features=[], stories=[], error=True)
+
+@tickets_bp.route('/ticket/<int:ticket_id>/reassign', methods=['GET', 'POST'])
+@login_required
+def reassign_ticket(ticket_id):
+    
+    # Get ticket without using ORM to avoid parent_id column
+    stmt = sa.text("SELECT id, title, description, type, priority, assignee, status, public, project_id, start_date, end_date, version FROM ticket WHERE id = :ticket_id")
+    result = db.session.execute(stmt, {"ticket_id": ticket_id}).fetchone()
+    
+    if not result:
+        abort(404)
+    
+    # Create a ticket object manually
+    ticket = Ticket(
+        id=result.id,
+        title=result.title,
+        description=result.description,
+        type=result.type,
+        priority=result.priority,
+        assignee=result.assignee,
+        status=result.status,
+        public=result.public,
+        project_id=result.project_id,
+        start_date=result.start_date,
+        end_date=result.end_date
+    )
+    
+    # Check permissions
+    if not can_reassign_ticket(ticket, current_user):
+        abort(403)
+    
+    if request.method == 'POST':
+        new_assignee_id = request.form.get('assignee_id')
+        if not new_assignee_id:
+            flash('No assignee selected')
+            return redirect(url_for('tickets.board_page'))
+        
+        new_assignee = User.query.get(int(new_assignee_id))
+        if not new_assignee:
+            flash('Invalid assignee')
+            return redirect(url_for('tickets.board_page'))
+        
+        # Update assignee using raw SQL to avoid parent_id column
+        # Only applied if nobody changed the ticket since it was read above, which the workload delta is based on
+        update_stmt = sa.text("UPDATE ticket SET assignee = :assignee, version = COALESCE(version, 0) + 1 "
+                              "WHERE id = :ticket_id AND COALESCE(version, 0) = :version")
+        updated = db.session.execute(update_stmt, {"assignee": new_assignee.name, "ticket_id": ticket_id,
+                                                   "version": result.version or 0}).rowcount
+        if updated != 1:
+            db.session.rollback()
+            flash('The ticket was changed by someone else meanwhile; please try again')
+            return redirect(url_for('tickets.reassign_ticket', ticket_id=ticket_id))
+        before = workload.snapshot(result)
+        workload.ticket_changed(before, dict(before, assignee=new_assignee.name))
+        if result.public:
+            public_board.changed()
+        
+        # Queue notification for the new assignee
+        notify([new_assignee.id], f'You have been assigned ticket: {ticket.title}', link=url_for('tickets.board_page'))
+        db.session.commit()
+        autocomplete.tickets_changed([ticket_id])
+        
+        flash(f'Ticket reassigned to {new_assignee.name}')
+        return redirect(url_for('tickets.board_page'))
+    
+    # GET request - show reassign form
+    # Get team members who can be assigned
+    team_members = []
+    project = refdata.project(ticket.project_id) if ticket.project_id else None
+    if project and project.team_id:
+        team_members = refdata.users(team_id=project.team_id)
+    
+    # If no team members found or user is admin, show appropriate options
+    if current_user.role == 'admin':
+        # Admin can assign to anyone
+        team_members = refdata.users()
+    elif current_user.role == 'manager' and not team_members:
+        # Manager can assign to members of their team if no project team members found
+        team_members = refdata.users(team_id=current_user.team_id)
+    
+    assignee_typeahead = len(team_members) > ASSIGNEE_SELECT_MAX
+    if assignee_typeahead:
+        team_members = []
+    loads = workload.for_assignees([member.name for member in team_members])
+    return render_template('reassign_ticket.html', ticket=ticket, team_members=team_members, loads=loads,
+                           assignee_typeahead=assignee_typeahead)
@@ -2,10 +2,12 @@
 This script adds the parent_id column to the ticket table in the database.
 Run this script once to update the database schema.
 """
-from app import app, db
+from app import create_app
+from models import db
 import sqlalchemy as sa
 
 def add_parent_id_column():
+    app = create_app()
     with app.app_context():
         try:
             # Check if column exists
@@ -0,0 +1,146 @@
+"""
+Assignee workload index.
+
+``user_workload`` counts tickets per assignee, status and priority, and
+``user_week_load`` counts the open tickets whose start/end dates overlap
+each week. Both are updated in the same transaction as the ticket change
+(``ticket_changed``), so the assignee dropdowns and the team workload
+view read a handful of rows per person instead of scanning tickets.
+``flask rebuild-workload`` recomputes both tables from scratch.
+"""
+from collections import Counter
+from datetime import date, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Ticket, UserWorkload, UserWeekLoad
+
+DONE = 'Done'
+# A ticket spanning longer than this only loads its first weeks
+MAX_WEEKS = 52
+WEEKS_AHEAD = 4
+
+
+def week_of(day):
+    return day - timedelta(days=day.weekday())
+
+def _weeks(start_date, end_date):
+    """Mondays of the weeks a ticket's dates overlap; a single date counts as one day."""
+    start_date = start_date or end_date
+    end_date = end_date or start_date
+    if start_date is None or end_date < start_date:
+        return []
+    weeks = []
+    week = week_of(start_date)
+    while week <= end_date and len(weeks) < MAX_WEEKS:
+        weeks.append(week)
+        week += timedelta(days=7)
+    return weeks
+
+def _as_date(value):
+    # Raw text() queries return SQLite dates as strings
+    return date.fromisoformat(value[:10]) if isinstance(value, str) else value
+
+def snapshot(ticket):
+    """The fields of a ticket (ORM object or row) that the index depends on."""
+    return {'assignee': ticket.assignee, 'status': ticket.status or 'To Do', 'priority': ticket.priority,
+            'start_date': _as_date(ticket.start_date), 'end_date': _as_date(ticket.end_date)}
+
+def _counts(state):
+    if state is None:
+        return Counter(), Counter()
+    rows = Counter({(state['assignee'], state['status'], state['priority']): 1})
+    weeks = Counter()
+    if state['status'] != DONE:
+        weeks.update((state['assignee'], week) for week in _weeks(state['start_date'], state['end_date']))
+    return rows, weeks
+
+def _increment(model, keys, deltas):
+    if not deltas:
+        return
+    dialect = postgresql if db.session.get_bind().dialect.name == 'postgresql' else sqlite
+    table = model.__table__
+    stmt = dialect.insert(table)
+    stmt = stmt.on_conflict_do_update(index_elements=keys,
+                                      set_={'ticket_count': table.c.ticket_count + stmt.excluded.ticket_count})
+    db.session.execute(stmt, [dict(zip(keys, key), ticket_count=delta) for key, delta in deltas.items()])
+
+def ticket_changed(before, after):
+    """Apply a ticket change to the index; ``before``/``after`` are ``snapshot()``
+    dicts, or None for a created/removed ticket. Call before committing."""
+    tickets_changed([(before, after)])
+
+def tickets_changed(changes):
+    """Apply many ``(before, after)`` changes with one upsert per table."""
+    before_rows, before_weeks = Counter(), Counter()
+    after_rows, after_weeks = Counter(), Counter()
+    for before, after in changes:
+        rows, weeks = _counts(before)
+        before_rows.update(rows)
+        before_weeks.update(weeks)
+        rows, weeks = _counts(after)
+        after_rows.update(rows)
+        after_weeks.update(weeks)
+    row_deltas = {key: after_rows[key] - before_rows[key]
+                  for key in before_rows.keys() | after_rows.keys() if after_rows[key] != before_rows[key]}
+    week_deltas = {key: after_weeks[key] - before_weeks[key]
+                   for key in before_weeks.keys() | after_weeks.keys() if after_weeks[key] != before_weeks[key]}
+    _increment(UserWorkload, ['assignee', 'status', 'priority'], row_deltas)
+    _increment(UserWeekLoad, ['assignee', 'week'], week_deltas)
+    # Drop rows that reached zero so reads stay proportional to real load
+    emptied = {key[0] for deltas in (row_deltas, week_deltas) for key, delta in deltas.items() if delta < 0}
+    if emptied:
+        UserWorkload.query.filter(UserWorkload.assignee.in_(emptied), UserWorkload.ticket_count <= 0) \
+            .delete(synchronize_session=False)
+        UserWeekLoad.query.filter(UserWeekLoad.assignee.in_(emptied), UserWeekLoad.ticket_count <= 0) \
+            .delete(synchronize_session=False)
+
+def rebuild():
+    """Recompute both tables from the ticket table."""
+    UserWorkload.query.delete()
+    UserWeekLoad.query.delete()
+    status = func.coalesce(Ticket.status, 'To Do')
+    rows = (db.session.query(Ticket.assignee, status, Ticket.priority, func.count(Ticket.id))
+            .group_by(Ticket.assignee, status, Ticket.priority))
+    _increment(UserWorkload, ['assignee', 'status', 'priority'],
+               {(assignee, status, priority): count for assignee, status, priority, count in rows})
+    weeks = Counter()
+    open_tickets = (db.session.query(Ticket.assignee, Ticket.start_date, Ticket.end_date)
+                    .filter(status != DONE)
+                    .filter((Ticket.start_date.isnot(None)) | (Ticket.end_date.isnot(None))))
+    for assignee, start_date, end_date in open_tickets.yield_per(5000):
+        weeks.update((assignee, week) for week in _weeks(start_date, end_date))
+    _increment(UserWeekLoad, ['assignee', 'week'], weeks)
+    db.session.commit()
+
+def for_assignees(names, weeks_ahead=WEEKS_AHEAD):
+    """Workload of each name: open count, open tickets by status and priority,
+    and open tickets overlapping each of the next ``weeks_ahead`` weeks."""
+    names = list(set(names))
+    first_week = week_of(date.today())
+    week_starts = [first_week + timedelta(days=7 * i) for i in range(weeks_ahead)]
+    loads = {name: {'open': 0, 'by_status': {}, 'by_priority': {}, 'weeks': [0] * weeks_ahead}
+             for name in names}
+    if not names:
+        return loads
+    for row in UserWorkload.query.filter(UserWorkload.assignee.in_(names), UserWorkload.status != DONE):
+        load = loads[row.assignee]
+        load['open'] += row.ticket_count
+        load['by_status'][row.status] = load['by_status'].get(row.status, 0) + row.ticket_count
+        load['by_priority'][row.priority] = load['by_priority'].get(row.priority, 0) + row.ticket_count
+    for row in UserWeekLoad.query.filter(UserWeekLoad.assignee.in_(names),
+                                         UserWeekLoad.week >= week_starts[0], UserWeekLoad.week <= week_starts[-1]):
+        loads[row.assignee]['weeks'][(row.week - first_week).days // 7] = row.ticket_count
+    return loads
+
+
+@click.command('rebuild-workload')
+@with_appcontext
+def rebuild_workload_command():
+    """Recompute the assignee workload tables from the tickets."""
+    rebuild()
+    click.echo(f'Workload rebuilt: {UserWorkload.query.count()} status/priority rows, '
+               f'{UserWeekLoad.query.count()} week rows.')
@@ -0,0 +1,138 @@
+"""
+Optional group commit of short writes.
+
+SQLite lets one connection write at a time, so when many threads each
+commit a small transaction of their own they queue on the database lock,
+and under bursts some give up with "database is locked". With
+``WRITE_COALESCING`` on, short writes go through ``run()``, which hands
+them to one writer thread per process and app. The writer takes whatever
+has queued up, waiting at most ``WRITE_BATCH_WAIT`` seconds for more (up
+to ``WRITE_BATCH_MAX`` operations), applies them in its own session and
+commits them together, then gives every caller its own result or
+exception. If the batch fails, each operation is retried in a transaction
+of its own, so one bad write does not fail the others.
+
+The callers are the ticket status and patch APIs and the job worker
+(claiming jobs, recording their outcome, and running quick handlers such
+as notifications together with their ``done`` status). Batches only form
+from writes a process makes at the same time: the threads of a ``flask
+worker``, or of a Gunicorn worker, which is why gunicorn.conf.py runs
+``GUNICORN_THREADS`` threads per worker when coalescing is on. A caller
+waits at most ``WRITE_TIMEOUT`` seconds for its batch to start; after
+that its operation is withdrawn and ``WriteTimeout`` is raised, which the
+app answers with a 503, so a timed-out write is never applied later. With
+coalescing off, the default, ``run()`` applies the operation in the
+caller's own session and commits straight away.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from flask import current_app, jsonify
+
+from models import db
+
+_lock = threading.Lock()
+
+
+class WriteTimeout(Exception):
+    """The writer did not get to an operation within ``WRITE_TIMEOUT``; it was not applied."""
+
+
+def run(operation, *args):
+    """Apply ``operation(*args)``, commit, and return its result.
+
+    ``operation`` writes through ``db.session`` and must not commit. With
+    coalescing on it runs in the writer thread's session and app context,
+    so it takes ids and plain values (not loaded objects or anything
+    needing the request) and should return plain values.
+    """
+    app = current_app._get_current_object()
+    if not app.config.get('WRITE_COALESCING'):
+        result = operation(*args)
+        db.session.commit()
+        return result
+    future = Future()
+    _queue(app).put((operation, args, future))
+    try:
+        return future.result(timeout=app.config['WRITE_TIMEOUT'])
+    except TimeoutError:
+        if future.cancel():
+            raise WriteTimeout(f'No write slot within {app.config["WRITE_TIMEOUT"]} seconds') from None
+        # The writer started on it just now; its outcome is the caller's
+        return future.result()
+
+def _queue(app):
+    state = app.extensions['writer']
+    with _lock:
+        if state['pid'] != os.getpid():
+            # First write of this app in this process, or in a worker forked after it
+            pending = queue.SimpleQueue()
+            threading.Thread(target=_loop, args=(app, pending), name='db-writer', daemon=True).start()
+            state.update(pid=os.getpid(), queue=pending)
+        return state['queue']
+
+def _next_batch(pending, size, wait):
+    batch = [pending.get()]
+    deadline = time.monotonic() + wait
+    while len(batch) < size:
+        try:
+            batch.append(pending.get_nowait())
+            continue
+        except queue.Empty:
+            pass
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(pending.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+def _apply(batch):
+    results = []
+    try:
+        for operation, args, future in batch:
+            results.append(operation(*args))
+        db.session.commit()
+    except Exception as error:
+        db.session.rollback()
+        if len(batch) == 1:
+            batch[0][2].set_exception(error)
+            return
+        for item in batch:
+            _apply([item])
+        return
+    for (operation, args, future), result in zip(batch, results):
+        future.set_result(result)
+
+def _loop(app, pending):
+    size, wait = app.config['WRITE_BATCH_MAX'], app.config['WRITE_BATCH_WAIT']
+    with app.app_context():
+        while True:
+            # Skip operations whose caller gave up waiting
+            batch = [item for item in _next_batch(pending, size, wait) if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                _apply(batch)
+            except Exception as error:
+                # Only reachable if rollback itself failed; start the next batch on a fresh session
+                app.logger.exception('Write batch failed')
+                db.session.remove()
+                for operation, args, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+def _timed_out(error):
+    response = jsonify({"status": "error", "message": "The database is busy and nothing was saved; try again."})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+def init_app(app):
+    app.extensions['writer'] = {'pid': None, 'queue': None}
+    app.register_error_handler(WriteTimeout, _timed_out)
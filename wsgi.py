@@ -0,0 +1,16 @@
+from sqlalchemy.exc import OperationalError
+
+import autocomplete
+import templating
+from app import create_app
+
+app = create_app()
+# Under preload_app this runs once in the Gunicorn master, so workers fork with compiled templates
+templating.precompile(app)
+# Likewise the ticket typeahead index, so no worker's first lookup pays for the build
+with app.app_context():
+    try:
+        autocomplete.build()
+    except OperationalError:
+        # No schema yet ('flask seed' or 'flask db upgrade' not run); the first lookup builds it
+        pass